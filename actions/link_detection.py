@@ -0,0 +1,132 @@
+# actions/link_detection.py
+"""
+Blue-link detection on screenshots, used by screen_action to click search
+results without a vision model.
+
+Works on the full-resolution frame with NumPy: a boolean colour mask over
+the search-result area, a row projection that splits it into text lines
+(rows with link-coloured pixels, small gaps closed), and per line the
+column projection for the extent, mean x and pixel count. No per-pixel
+Python code runs, so a 1080p screenshot takes a few milliseconds.
+"""
+
+import numpy as np
+
+# Google result area and filters (full-resolution pixels)
+GOOGLE_REGION = (150, 800, 150, 800)   # y0, y1, x0, x1
+GOOGLE_MIN_PIXELS = 360                # link titles have many pixels, short labels few
+GOOGLE_MIN_WIDTH = 100                 # titles are 100-150+ px wide, labels < 80
+GOOGLE_MIN_X = 220                     # icons/labels sit further left
+GOOGLE_MIN_Y = 220                     # navigation bar (Immagini, Video, Notizie, ...)
+
+RESULT_REGION = (150, 700, 180, 650)
+RESULT_MIN_PIXELS = 250
+
+# Rows without link pixels tolerated inside one text line (accents, i-dots)
+ROW_GAP = 2
+
+
+def to_rgb_array(image) -> np.ndarray:
+    """H x W x 3 uint8 view of a PIL image or array (no copy when already RGB)."""
+    if hasattr(image, "mode") and image.mode != "RGB":
+        image = image.convert("RGB")
+    array = np.asarray(image)
+    if array.ndim == 3 and array.shape[2] > 3:
+        array = array[:, :, :3]
+    return array
+
+
+def google_link_mask(crop: np.ndarray) -> np.ndarray:
+    """Link blues, darker blues and slight variations: RGB(0-120, 0-150, 100-255), blue dominant."""
+    r, g, b = crop[:, :, 0], crop[:, :, 1], crop[:, :, 2]
+    return (r < 120) & (g < 150) & (b > 100) & (b > r) & (b > g)
+
+
+def result_link_mask(crop: np.ndarray) -> np.ndarray:
+    """Google's #1a0dab and similar: RGB(0-100, 0-80, 120-255)."""
+    r, g, b = crop[:, :, 0], crop[:, :, 1], crop[:, :, 2]
+    return (r < 100) & (g < 80) & (b > 120)
+
+
+def _line_bands(row_counts: np.ndarray, row_gap: int) -> list[tuple[int, int]]:
+    """(top, bottom) inclusive runs of rows with pixels, gaps up to row_gap closed."""
+    rows = np.flatnonzero(row_counts)
+    if not len(rows):
+        return []
+    breaks = np.flatnonzero(np.diff(rows) > row_gap + 1)
+    tops = np.concatenate(([rows[0]], rows[breaks + 1]))
+    bottoms = np.concatenate((rows[breaks], [rows[-1]]))
+    return list(zip(tops.tolist(), bottoms.tolist()))
+
+
+def find_clusters(rgb: np.ndarray, region: tuple, mask_fn, row_gap: int = ROW_GAP) -> list[dict]:
+    """
+    One record per text line of mask pixels inside region, in frame
+    coordinates: top, bottom, min_x, max_x, width, pixels, mean_x,
+    mean_y, median_y and color (RGB of the first pixel in raster order).
+    """
+    y0, y1, x0, x1 = region
+    crop = rgb[y0:y1, x0:x1]
+    if crop.size == 0:
+        return []
+
+    mask = mask_fn(crop)
+    row_counts = np.count_nonzero(mask, axis=1)
+
+    clusters = []
+    for top, bottom in _line_bands(row_counts, row_gap):
+        band = mask[top:bottom + 1]
+        rows = row_counts[top:bottom + 1]
+        cols = np.count_nonzero(band, axis=0)
+        pixels = int(rows.sum())
+
+        xs = np.flatnonzero(cols)
+        min_x, max_x = int(xs[0]), int(xs[-1])
+        mean_x = int((cols * np.arange(len(cols))).sum() // pixels)
+        mean_y = int((rows * np.arange(len(rows))).sum() // pixels)
+        median_y = int(np.searchsorted(np.cumsum(rows), pixels // 2, side="right"))
+
+        first_y, first_x = divmod(int(np.argmax(band)), band.shape[1])
+        color = tuple(int(c) for c in crop[top + first_y, first_x, :3])
+
+        clusters.append({
+            "top": y0 + top,
+            "bottom": y0 + bottom,
+            "min_x": x0 + min_x,
+            "max_x": x0 + max_x,
+            "width": max_x - min_x,
+            "pixels": pixels,
+            "mean_x": x0 + mean_x,
+            "mean_y": y0 + top + mean_y,
+            "median_y": y0 + top + median_y,
+            "color": color,
+        })
+    return clusters
+
+
+def google_links(image) -> list[dict]:
+    """Result titles as {x, y, color, width, pixels}, top to bottom."""
+    clusters = find_clusters(to_rgb_array(image), GOOGLE_REGION, google_link_mask)
+    links = [
+        {"x": c["mean_x"], "y": c["median_y"], "color": c["color"],
+         "width": c["width"], "pixels": c["pixels"]}
+        for c in clusters
+        if c["pixels"] >= GOOGLE_MIN_PIXELS
+        and c["width"] >= GOOGLE_MIN_WIDTH
+        and c["mean_x"] >= GOOGLE_MIN_X
+        and c["median_y"] >= GOOGLE_MIN_Y
+    ]
+    links.sort(key=lambda link: link["y"])
+    return links
+
+
+def result_links(image) -> list[dict]:
+    """Blue link areas as {x, y, text}, top to bottom."""
+    clusters = find_clusters(to_rgb_array(image), RESULT_REGION, result_link_mask)
+    links = [
+        {"x": c["mean_x"], "y": c["mean_y"], "text": f"Link at y={c['mean_y']}"}
+        for c in clusters
+        if c["pixels"] >= RESULT_MIN_PIXELS
+    ]
+    links.sort(key=lambda link: link["y"])
+    return links
@@ -0,0 +1,351 @@
+# actions/ocr_service.py
+"""
+Process-wide EasyOCR service.
+
+The reader (detection + recognition models) is loaded once, lazily or in
+the background at startup via prewarm(), instead of on every screen
+command. Results are cached by a perceptual hash (dHash) of the image
+region: repeating a command on a page that has not changed skips OCR.
+
+Large images are read in parallel: split into overlapping horizontal
+bands, OCR'd by a pool of worker processes that each keep a loaded
+reader, and merged back with duplicates from the overlaps removed. The
+pixels reach the workers through shared memory, not pickled copies.
+The pool is started in the background by the first large OCR (the single
+reader covers until it is ready), never at launch: every worker is a
+full torch + EasyOCR process.
+"""
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from PIL import Image
+
+try:
+    import easyocr
+    HAS_EASYOCR = True
+except ImportError:
+    HAS_EASYOCR = False
+
+OCR_LANGUAGES = [lang.strip() for lang in os.getenv("OCR_LANGUAGES", "en,it").split(",") if lang.strip()]
+OCR_GPU = os.getenv("OCR_GPU", "0") == "1"
+OCR_PREWARM = os.getenv("OCR_PREWARM", "1") == "1"
+
+OCR_CACHE_ENTRIES = 16
+HASH_SIZE = 64            # 64x64 difference hash = 4096 bits
+HASH_MAX_DISTANCE = 2     # differing bits still treated as the same image
+
+# Tiled OCR: images at least TILED_MIN_HEIGHT tall are split across OCR_WORKERS
+# processes (each loads its own reader, so RAM grows with the count: larger
+# pools are opt-in, 1 turns tiling off)
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "2"))
+TILED_MIN_HEIGHT = 600
+BAND_OVERLAP = 64         # px shared by adjacent bands: lines up to ~30 px are seen whole
+EDGE_MARGIN = 2           # a box this close to an inner band edge was cut by it
+DUPLICATE_IOU = 0.5
+
+
+def perceptual_hash(image: Image.Image, size: int = HASH_SIZE) -> int:
+    """Difference hash: one bit per horizontally adjacent pixel pair of the downscaled image."""
+    # reducing_gap: cheap integer pre-shrink first, ~3 ms on a 1080p screenshot
+    small = image.resize((size + 1, size), Image.BILINEAR, reducing_gap=2.0).convert("L")
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+# --- Worker processes ---
+
+_worker_reader = None
+
+
+def _init_worker(languages: list[str], gpu: bool, threads: int):
+    """Pool initializer: load the reader once per worker process."""
+    global _worker_reader
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except Exception:
+        pass
+    _worker_reader = easyocr.Reader(languages, gpu=gpu)
+
+
+def _worker_ready() -> bool:
+    return _worker_reader is not None
+
+
+def _ocr_band(shm_name: str, shape: tuple, top: int, bottom: int) -> list:
+    """OCR rows [top, bottom) of the shared image; boxes in full-image coordinates."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        band = np.array(np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)[top:bottom])
+    finally:
+        shm.close()
+    results = _worker_reader.readtext(band)
+    return [
+        ([[float(x), float(y) + top] for x, y in bbox], text, float(confidence))
+        for bbox, text, confidence in results
+    ]
+
+
+def plan_bands(height: int, count: int, overlap: int = BAND_OVERLAP) -> list[tuple[int, int, int, int]]:
+    """
+    (top, bottom, own_top, own_bottom) per band. Bands overlap by `overlap`
+    rows; each owns the rows up to the middle of its overlaps, so a box is
+    kept only by the band owning its centre.
+    """
+    count = max(1, min(count, height // max(overlap * 2, 1) or 1))
+    step = math.ceil(height / count)
+    bands = []
+    for i in range(count):
+        own_top = i * step
+        own_bottom = min(height, (i + 1) * step)
+        top = max(0, own_top - overlap // 2)
+        bottom = min(height, own_bottom + overlap - overlap // 2)
+        bands.append((top, bottom, own_top, own_bottom))
+    return bands
+
+
+def _box_bounds(bbox) -> tuple[float, float, float, float]:
+    xs = [p[0] for p in bbox]
+    ys = [p[1] for p in bbox]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _iou(a, b) -> float:
+    ax0, ay0, ax1, ay1 = a
+    bx0, by0, bx1, by1 = b
+    w = min(ax1, bx1) - max(ax0, bx0)
+    h = min(ay1, by1) - max(ay0, by0)
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    return inter / ((ax1 - ax0) * (ay1 - ay0) + (bx1 - bx0) * (by1 - by0) - inter)
+
+
+def merge_bands(band_results: list, bands: list, height: int) -> list:
+    """Join per-band results: drop boxes cut by an inner band edge or outside the band's own rows, then duplicates."""
+    merged = []
+    for results, (top, bottom, own_top, own_bottom) in zip(band_results, bands):
+        for bbox, text, confidence in results:
+            x0, y0, x1, y1 = _box_bounds(bbox)
+            if top > 0 and y0 <= top + EDGE_MARGIN:
+                continue
+            if bottom < height and y1 >= bottom - EDGE_MARGIN:
+                continue
+            if not own_top <= (y0 + y1) / 2 < own_bottom:
+                continue
+            merged.append((bbox, text, confidence))
+
+    # Safety net for boxes both bands saw whole but centred differently
+    merged.sort(key=lambda r: r[2], reverse=True)
+    kept = []
+    for result in merged:
+        bounds = _box_bounds(result[0])
+        if all(_iou(bounds, _box_bounds(k[0])) < DUPLICATE_IOU for k in kept):
+            kept.append(result)
+    kept.sort(key=lambda r: (_box_bounds(r[0])[1], _box_bounds(r[0])[0]))
+    return kept
+
+
+class OcrService:
+    """Shared EasyOCR reader with a perceptual-hash result cache."""
+
+    def __init__(self, languages: list[str] = OCR_LANGUAGES, gpu: bool = OCR_GPU,
+                 cache_entries: int = OCR_CACHE_ENTRIES, workers: int = OCR_WORKERS):
+        self.languages = list(languages)
+        self.gpu = gpu
+        self.cache_entries = cache_entries
+        self.workers = workers
+
+        self._pool = None
+        self._pool_ready = False
+        self._pool_starting = False
+        self._pool_lock = threading.Lock()
+
+        self._reader = None
+        self._load_failed = False
+        self._reader_lock = threading.Lock()
+        self._cache = OrderedDict()      # (size, hash) -> results
+        self._cache_lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def available(self) -> bool:
+        return HAS_EASYOCR and not self._load_failed
+
+    def reader(self):
+        """The EasyOCR reader, loaded on first use. None if EasyOCR is unavailable."""
+        if self._reader is not None or not self.available:
+            return self._reader
+        with self._reader_lock:
+            if self._reader is None and not self._load_failed:
+                start = time.perf_counter()
+                try:
+                    self._reader = easyocr.Reader(self.languages, gpu=self.gpu)
+                    print(f"🔎 OCR reader ready ({', '.join(self.languages)}) in {time.perf_counter() - start:.1f}s")
+                except Exception as e:
+                    self._load_failed = True
+                    print(f"⚠️ OCR reader failed to load: {e}")
+        return self._reader
+
+    def prewarm(self):
+        """Load the single reader in a background thread (the worker pool waits for the first large OCR)."""
+        if not self.available:
+            return
+        threading.Thread(target=self.reader, daemon=True).start()
+
+    def _tiling(self) -> bool:
+        return self.workers >= 2 and not self.gpu and self.available
+
+    def pool(self) -> ProcessPoolExecutor | None:
+        """
+        The worker pool if it is ready, else None. The first call starts it
+        in a background thread, so that OCR runs on the single reader.
+        """
+        if self._pool_ready:
+            return self._pool
+        if self._pool_starting or not self._tiling():
+            return None     # never wait here for start_pool(), it holds the lock for seconds
+        with self._pool_lock:
+            if not self._pool_starting:
+                self._pool_starting = True
+                threading.Thread(target=self.start_pool, daemon=True).start()
+        return None
+
+    def start_pool(self) -> ProcessPoolExecutor | None:
+        """Start the worker processes and wait for their readers; None when tiling is off (1 worker, GPU or no EasyOCR)."""
+        if not self._tiling():
+            return None
+        with self._pool_lock:
+            self._pool_starting = True
+            if self._pool is None:
+                start = time.perf_counter()
+                threads = max(1, (os.cpu_count() or 2) // self.workers)
+                if os.name == "posix":
+                    # Workers must share the parent's tracker, or each would
+                    # "clean up" the segments it attached to when it exits
+                    from multiprocessing import resource_tracker
+                    resource_tracker.ensure_running()
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_init_worker,
+                    initargs=(self.languages, self.gpu, threads)
+                )
+                # Start every worker now so none loads its reader during a command
+                ready = [self._pool.submit(_worker_ready) for _ in range(self.workers)]
+                try:
+                    if all(f.result() for f in ready):
+                        print(f"🔎 OCR pool ready: {self.workers} workers in {time.perf_counter() - start:.1f}s")
+                        self._pool_ready = True
+                except Exception as e:
+                    print(f"⚠️ OCR pool failed, using one reader: {e}")
+                    self._pool.shutdown(cancel_futures=True)
+                    self._pool = None
+                    self.workers = 1
+        return self._pool
+
+    def shutdown(self):
+        with self._pool_lock:
+            self._pool_ready = False
+            self._pool_starting = False
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+    def _readtext_tiled(self, pool: ProcessPoolExecutor, rgb: np.ndarray) -> list:
+        height = rgb.shape[0]
+        bands = plan_bands(height, self.workers)
+        shm = shared_memory.SharedMemory(create=True, size=rgb.nbytes)
+        try:
+            shared = np.ndarray(rgb.shape, dtype=np.uint8, buffer=shm.buf)
+            shared[:] = rgb
+            del shared        # no view may outlive shm.close()
+            futures = [
+                pool.submit(_ocr_band, shm.name, rgb.shape, top, bottom)
+                for top, bottom, _, _ in bands
+            ]
+            band_results = [f.result() for f in futures]
+        finally:
+            shm.close()
+            shm.unlink()
+        return merge_bands(band_results, bands, height)
+
+    def _lookup(self, size: tuple, phash: int):
+        with self._cache_lock:
+            for key in reversed(self._cache):
+                if key[0] == size and (key[1] ^ phash).bit_count() <= HASH_MAX_DISTANCE:
+                    self._cache.move_to_end(key)
+                    return self._cache[key]
+        return None
+
+    def _store(self, size: tuple, phash: int, results: list):
+        with self._cache_lock:
+            self._cache[(size, phash)] = results
+            self._cache.move_to_end((size, phash))
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+
+    def readtext(self, image: Image.Image, region: tuple | None = None) -> list:
+        """
+        EasyOCR results [(bbox, text, confidence), ...] for the image, or for
+        region=(left, top, right, bottom) with boxes in full-image coordinates.
+        Cached: an unchanged region returns the previous results without OCR.
+        """
+        if region is not None:
+            image = image.crop(region)
+            offset_x, offset_y = region[0], region[1]
+        else:
+            offset_x = offset_y = 0
+
+        size = image.size
+        phash = perceptual_hash(image)
+        cached = self._lookup(size, phash)
+        if cached is not None:
+            self.hits += 1
+        else:
+            rgb = np.asarray(image.convert("RGB"))
+            pool = self.pool() if size[1] >= TILED_MIN_HEIGHT else None
+            if pool is not None:
+                self.misses += 1
+                cached = self._readtext_tiled(pool, rgb)
+            else:
+                reader = self.reader()
+                if reader is None:
+                    return []
+                self.misses += 1
+                cached = [
+                    ([[float(x), float(y)] for x, y in bbox], text, float(confidence))
+                    for bbox, text, confidence in reader.readtext(rgb)
+                ]
+            self._store(size, phash, cached)
+
+        return [
+            ([[x + offset_x, y + offset_y] for x, y in bbox], text, confidence)
+            for bbox, text, confidence in cached
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "languages": self.languages,
+            "loaded": self._reader is not None,
+            "workers": self.workers if self._pool is not None else 1,
+            "cache_entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+ocr_service = OcrService()
@@ -5,17 +5,21 @@ import pyautogui
 import base64
 import io
 import os
-import requests
 import re
+import http_client
 from PIL import Image
 from dotenv import load_dotenv
 from tts import edge_speak
+from local_intent import SCROLL_KEYWORDS_DOWN, SCROLL_KEYWORDS_UP
+from actions import link_detection
 
 load_dotenv()
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+OPENROUTER_URL = os.getenv("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
 VISION_MODEL = "google/gemma-3-12b-it:free"
+# Conversation context sent with the screenshot (see TemporaryMemory.get_context)
+CONTEXT_BUDGET_TOKENS = 150
 
 
 # Try to import OCR libraries
@@ -26,11 +30,8 @@ except ImportError:
     HAS_PYTESSERACT = False
     print("Warning: pytesseract not installed. Install with: pip install pytesseract")
 
-try:
-    import easyocr
-    HAS_EASYOCR = True
-except ImportError:
-    HAS_EASYOCR = False
+# EasyOCR is optional too: one shared reader, loaded once (see ocr_service.py)
+from actions.ocr_service import ocr_service
 
 
 def capture_screen() -> Image.Image:
@@ -66,94 +67,17 @@ def save_screenshot_debug(image: Image.Image, command: str):
 
 def find_google_links_by_color(image: Image.Image) -> list:
     """
-    NEW: Find Google search links using color detection.
+    Find Google search links using color detection.
     Google uses specific blue color (#1a0dab) for links.
     More reliable than vision model for coordinates.
+    Full-resolution NumPy masks, see actions/link_detection.py.
     """
-    import numpy as np
-    from collections import defaultdict
-    
-    img_array = np.array(image)
-    height, width = img_array.shape[:2]
-    
-    blue_pixels = []
-    color_samples = []  # DEBUG: collect color samples
-    
-    # Scan left-center area where Google results appear
-    # Expanded area to catch more links
-    for y in range(150, min(height, 800), 6):
-        for x in range(150, min(width, 800), 4):
-            try:
-                pixel = img_array[y, x]
-                # PIL/numpy uses RGB order
-                r, g, b = int(pixel[0]), int(pixel[1]), int(pixel[2])
-                
-                # DEBUG: Sample some colors
-                if len(color_samples) < 20 and y % 50 == 0 and x % 100 == 0:
-                    color_samples.append(f"({r},{g},{b})")
-                
-                # More flexible blue detection for links
-                # Allow darker blues and slight variations
-                # Typical link blues: RGB(0-80, 0-120, 150-255)
-                if r < 120 and g < 150 and b > 100 and b > r and b > g:
-                    blue_pixels.append({'x': x, 'y': y, 'color': (r, g, b)})
-            except:
-                continue
-    
-    print(f"DEBUG: Color samples from page: {color_samples[:10]}")
-    
-    if not blue_pixels:
-        return []
-    
-    # Cluster by Y coordinate (same line = same link)
-    clusters = defaultdict(list)
-    for point in blue_pixels:
-        cluster_y = (point['y'] // 25) * 25
-        clusters[cluster_y].append(point)
-    
-    # Get center of each cluster - FILTER for actual links
-    links = []
-    for cluster_y, points in clusters.items():
-        # Real Google links are LONG (many pixels) - filter out short blue text
-        if len(points) < 15:  # Increased from 5 - links have many more pixels
-            continue
-        
-        # Check cluster width (X range) - real links span wide
-        x_coords = [p['x'] for p in points]
-        y_coords = [p['y'] for p in points]
-        min_x = min(x_coords)
-        max_x = max(x_coords)
-        width = max_x - min_x
-        
-        # Real links are at least 100-150px wide, short labels are <80px
-        if width < 100:
-            continue
-        
-        # Real links are not too far left (icons/labels are around x<200)
-        avg_x = sum(x_coords) // len(x_coords)
-        if avg_x < 220:  # Too far left, probably not a link
-            continue
-        
-        # Use median Y for more accurate positioning (avg can be skewed by outliers)
-        y_coords_sorted = sorted(y_coords)
-        median_y = y_coords_sorted[len(y_coords_sorted) // 2]
-        
-        # Skip navigation bar completely (Immagini, Video, Notizie, etc.) - Y < 220
-        if median_y < 220:
-            continue
-        
-        # Get most common color in cluster
-        if points:
-            sample_color = points[0]['color']
-            links.append({'x': avg_x, 'y': median_y, 'color': sample_color, 'width': width, 'pixels': len(points)})
-    
-    # Sort top to bottom
-    links.sort(key=lambda l: l['y'])
-    
-    print(f"DEBUG Color Detection: Found {len(blue_pixels)} blue pixels in {len(links)} valid link clusters")
+    links = link_detection.google_links(image)
+
+    print(f"DEBUG Color Detection: Found {sum(l['pixels'] for l in links)} blue pixels in {len(links)} valid link clusters")
     for i, link in enumerate(links[:5], 1):
         print(f"  Link {i}: ({link['x']}, {link['y']}) RGB{link['color']} - width:{link['width']}px, pixels:{link['pixels']}")
-    
+
     return links
 
 
@@ -164,16 +88,10 @@ def extract_links_with_ocr(image: Image.Image) -> list:
     """
     links = []
     
-    if HAS_EASYOCR:
+    if ocr_service.available:
         try:
-            import numpy as np
-            reader = easyocr.Reader(['en', 'it'], gpu=False)
-            
-            # Convert PIL to numpy array
-            img_array = np.array(image)
-            
-            # Extract text with bounding boxes
-            results = reader.readtext(img_array)
+            # Extract text with bounding boxes (cached while the screen is unchanged)
+            results = ocr_service.readtext(image)
             
             # Look for patterns that indicate links
             for (bbox, text, confidence) in results:
@@ -215,63 +133,15 @@ def extract_links_with_ocr(image: Image.Image) -> list:
 
 def find_search_result_links(image: Image.Image) -> list:
     """
-    Find Google search result links using color detection + OCR.
+    Find Google search result links using color detection.
     Returns list of {text, x, y} sorted from top to bottom.
     """
-    import numpy as np
-    from collections import defaultdict
-    
-    img_array = np.array(image)
-    height, width = img_array.shape[:2]
-    
-    # Google search results are typically blue links (#1a0dab is Google's blue)
-    # Look for blue-ish pixels in the typical search result area
-    blue_links = []
-    
-    # Scan the left-center area where search results appear
-    for y in range(150, min(height, 700), 10):  # Every 10 pixels
-        for x in range(180, min(width, 650), 5):  # Left side where results are
-            pixel = img_array[y, x]
-            b, g, r = pixel[0], pixel[1], pixel[2]
-            
-            # Check if this is Google's blue color (or similar)
-            # Google blue is around RGB(26, 13, 171)
-            if r < 100 and g < 80 and b > 120:  # Blue-ish
-                blue_links.append({'x': x, 'y': y})
-    
-    # Group nearby blue pixels (likely same link)
-    if not blue_links:
-        return []
-    
-    # Cluster blue pixels by Y coordinate (same line = same link)
-    clusters = defaultdict(list)
-    for point in blue_links:
-        # Round Y to nearest 20 pixels for clustering
-        cluster_y = (point['y'] // 20) * 20
-        clusters[cluster_y].append(point)
-    
-    # Get the center of each cluster
-    result_links = []
-    for cluster_y, points in clusters.items():
-        if len(points) < 5:  # Too few points, probably not a link
-            continue
-        
-        avg_x = sum(p['x'] for p in points) // len(points)
-        avg_y = sum(p['y'] for p in points) // len(points)
-        
-        result_links.append({
-            'x': avg_x,
-            'y': avg_y,
-            'text': f'Link at y={avg_y}'
-        })
-    
-    # Sort from top to bottom
-    result_links.sort(key=lambda l: l['y'])
-    
+    result_links = link_detection.result_links(image)
+
     print(f"DEBUG: Found {len(result_links)} blue link areas")
     for i, link in enumerate(result_links[:5]):
         print(f"  Link {i+1}: ({link['x']}, {link['y']})")
-    
+
     return result_links
 
 
@@ -294,11 +164,8 @@ def analyze_screen_with_vision(image: Image.Image, user_command: str, conversati
     command_lower = user_command.lower()
     
     # SCROLL: Direct detection (no vision model needed!)
-    # Use only specific phrases to avoid false positives with "su" (on) or "ci" (us/there)
-    scroll_keywords_down = ['scorri giù', 'scendi', 'scroll down', 'scorri verso il basso', 'vai giù', 'pagina giù']
-    scroll_keywords_up = ['scorri su', 'sali', 'scroll up', 'scorri verso l\'alto', 'vai su', 'pagina su']
-    
-    if any(keyword in command_lower for keyword in scroll_keywords_down):
+    # Keyword lists are shared with the local intent fast path
+    if any(keyword in command_lower for keyword in SCROLL_KEYWORDS_DOWN):
         print("DEBUG: SCROLL DOWN detected - no vision model needed")
         return {
             "action": "scroll",
@@ -307,7 +174,7 @@ def analyze_screen_with_vision(image: Image.Image, user_command: str, conversati
             "message": "Scorro verso il basso"
         }
     
-    if any(keyword in command_lower for keyword in scroll_keywords_up):
+    if any(keyword in command_lower for keyword in SCROLL_KEYWORDS_UP):
         print("DEBUG: SCROLL UP detected - no vision model needed")
         return {
             "action": "scroll",
@@ -434,7 +301,7 @@ Be concise and precise."""
         print(f"DEBUG: Calling OpenRouter Vision API...")
         print(f"DEBUG: Model: {VISION_MODEL}")
         
-        response = requests.post(
+        response = http_client.post(
             OPENROUTER_URL,
             headers=headers,
             json=payload,
@@ -601,12 +468,10 @@ def screen_action(
     # Get conversation context from memory if available
     conversation_context = ""
     if session_memory:
-        history = session_memory.get_history_for_prompt()
-        if history:
-            # Get last few exchanges
-            lines = history.split('\n')[-6:]
-            conversation_context = '\n'.join(lines)
-            print(f"Conversation context provided: {len(lines)} lines")
+        # Last exchanges that fit the budget, older ones summarized
+        conversation_context = session_memory.get_context(CONTEXT_BUDGET_TOKENS)
+        if conversation_context:
+            print(f"Conversation context provided: {len(conversation_context.splitlines())} lines")
     
     # Analyze with vision model
     print(f"Analyzing screen with vision model...")
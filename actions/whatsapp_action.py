@@ -22,6 +22,59 @@ def load_contacts():
 
 CONTACTS = load_contacts()
 
+# Command phrases (also fed to the speech grammar, see main.command_vocabulary)
+OPEN_WHATSAPP_COMMANDS = [
+    "apri whatsapp",
+    "apri whatsapp web",
+    "avvia whatsapp",
+    "open whatsapp",
+    "open whatsapp web",
+    "launch whatsapp"
+]
+
+LIST_CONTACTS_COMMANDS = [
+    "lista contatti",
+    "mostra contatti",
+    "contatti whatsapp",
+    "a chi posso scrivere",
+    "list contacts",
+    "show contacts",
+    "whatsapp contacts",
+    "who can i message"
+]
+
+OPEN_CHAT_COMMANDS = [
+    "apri chat",
+    "apri chat whatsapp",
+    "apri whatsapp chat",
+    "mostra chat",
+    "chat whatsapp con",
+    "open chat",
+    "open whatsapp chat",
+    "show chat",
+    "whatsapp chat with"
+]
+
+SEND_MESSAGE_COMMANDS = [
+    "invia whatsapp",
+    "invia messaggio",
+    "invia un messaggio",
+    "messaggio whatsapp",
+    "invia messaggio su whatsapp",
+    "messaggio su whatsapp",
+    "manda whatsapp",
+    "manda messaggio",
+    "manda un messaggio",
+    "scrivi su whatsapp",
+    "scrivi a",
+    "scrivi un messaggio",
+    "send whatsapp",
+    "whatsapp message",
+    "send message on whatsapp",
+    "message on whatsapp",
+    "send a whatsapp"
+]
+
 # State management for 2-step message sending
 whatsapp_state = {
     "waiting_for_message": False,
@@ -319,14 +372,7 @@ def handle_whatsapp_command(user_text, player, temp_memory=None):
         return True
     
     # Command: Open WhatsApp Web
-    if match_commands(user_text, [
-        "apri whatsapp",
-        "apri whatsapp web",
-        "avvia whatsapp",
-        "open whatsapp",
-        "open whatsapp web",
-        "launch whatsapp"
-    ]):
+    if match_commands(user_text, OPEN_WHATSAPP_COMMANDS):
         webbrowser.open("https://web.whatsapp.com")
         text = "Apro WhatsApp Web."
         if player:
@@ -335,16 +381,7 @@ def handle_whatsapp_command(user_text, player, temp_memory=None):
         return True
     
     # Command: List contacts
-    if match_commands(user_text, [
-        "lista contatti",
-        "mostra contatti",
-        "contatti whatsapp",
-        "a chi posso scrivere",
-        "list contacts",
-        "show contacts",
-        "whatsapp contacts",
-        "who can i message"
-    ]):
+    if match_commands(user_text, LIST_CONTACTS_COMMANDS):
         text = list_available_contacts()
         if player:
             player.write_log(text)
@@ -353,17 +390,7 @@ def handle_whatsapp_command(user_text, player, temp_memory=None):
     
     # Command: Open chat with specific contact
     # IMPORTANT: Solo se contiene "chat" o "whatsapp" nel comando
-    if match_commands(user_text, [
-        "apri chat",
-        "apri chat whatsapp",
-        "apri whatsapp chat",
-        "mostra chat",
-        "chat whatsapp con",
-        "open chat",
-        "open whatsapp chat",
-        "show chat",
-        "whatsapp chat with"
-    ]) and ("chat" in user_text.lower() or "whatsapp" in user_text.lower()):
+    if match_commands(user_text, OPEN_CHAT_COMMANDS) and ("chat" in user_text.lower() or "whatsapp" in user_text.lower()):
         contact_name = extract_contact_name(user_text)
         if contact_name:
             open_whatsapp_chat(contact_name, player)
@@ -375,25 +402,7 @@ def handle_whatsapp_command(user_text, player, temp_memory=None):
         return True
     
     # Command: Send WhatsApp message
-    if match_commands(user_text, [
-        "invia whatsapp",
-        "invia messaggio",
-        "invia un messaggio",
-        "messaggio whatsapp",
-        "invia messaggio su whatsapp",
-        "messaggio su whatsapp",
-        "manda whatsapp",
-        "manda messaggio",
-        "manda un messaggio",
-        "scrivi su whatsapp",
-        "scrivi a",
-        "scrivi un messaggio",
-        "send whatsapp",
-        "whatsapp message",
-        "send message on whatsapp",
-        "message on whatsapp",
-        "send a whatsapp"
-    ]):
+    if match_commands(user_text, SEND_MESSAGE_COMMANDS):
         contact_name = extract_contact_name(user_text)
         message = extract_message(user_text)
         
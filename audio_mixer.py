@@ -0,0 +1,155 @@
+# audio_mixer.py
+"""
+One persistent output stream for everything Kira plays.
+
+The voice (tts.py) is a queued PCM channel with back-pressure; short cues
+(feedback_sound.py) are one-shot buffers mixed on top of it in the stream
+callback, so a ding can overlap speech without opening a second device.
+The mixer also keeps the PlaybackReference used for barge-in echo
+suppression, since the callback knows when samples actually leave.
+"""
+
+import threading
+import time
+from collections import deque
+import numpy as np
+import sounddevice as sd
+
+SAMPLE_RATE = 24000        # matches the TTS output (edge-tts 24 kHz mono)
+BLOCK_SIZE = 512           # frames per callback (~21 ms)
+VOICE_QUEUE_SECONDS = 0.5  # write_voice blocks when this much voice is waiting
+
+
+class PlaybackReference:
+    """
+    Level of every block sent to the speakers, with the time it was played.
+    speech_to_text.BargeInMonitor uses it as the echo reference: while Kira
+    talks, mic audio only counts as the user if it is clearly louder than
+    what the playback alone would produce.
+    """
+
+    def __init__(self, seconds: float = 3.0):
+        self.playing = threading.Event()
+        self.last_end = 0.0     # perf_counter time the last voice block finishes playing
+        self._levels = deque(maxlen=int(seconds * SAMPLE_RATE / BLOCK_SIZE) + 1)
+        self._lock = threading.Lock()
+
+    def add(self, samples: np.ndarray):
+        rms = float(np.sqrt(np.mean(np.square(samples, dtype=np.float32)))) if len(samples) else 0.0
+        level = 20 * np.log10(max(rms, 1e-6))
+        now = time.perf_counter()
+        with self._lock:
+            self._levels.append((now, level))
+            self.last_end = now + len(samples) / SAMPLE_RATE
+
+    def level_db(self, start: float, end: float) -> float:
+        """Loudest block played in [start, end] (perf_counter time), -120 if none."""
+        with self._lock:
+            levels = [level for t, level in self._levels if start <= t <= end]
+        return max(levels, default=-120.0)
+
+
+playback_reference = PlaybackReference()
+
+
+class AudioMixer:
+    """Callback-driven output stream mixing the voice channel with one-shot cues."""
+
+    def __init__(self, samplerate: int = SAMPLE_RATE, blocksize: int = BLOCK_SIZE):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.max_voice_frames = int(VOICE_QUEUE_SECONDS * samplerate)
+
+        self._voice = deque()
+        self._voice_frames = 0
+        self._cues = []             # [samples, position]
+        self._cond = threading.Condition()
+        self._stream = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._stream is None:
+                self._stream = sd.OutputStream(
+                    samplerate=self.samplerate,
+                    blocksize=self.blocksize,
+                    channels=1,
+                    dtype="float32",
+                    latency="low",
+                    callback=self._callback
+                )
+                self._stream.start()
+
+    def _callback(self, outdata, frames, time_info, status):
+        out = np.zeros(frames, dtype=np.float32)
+        voice_frames = 0
+
+        with self._cond:
+            while voice_frames < frames and self._voice:
+                chunk = self._voice[0]
+                take = min(len(chunk), frames - voice_frames)
+                out[voice_frames:voice_frames + take] = chunk[:take]
+                voice_frames += take
+                if take == len(chunk):
+                    self._voice.popleft()
+                else:
+                    self._voice[0] = chunk[take:]
+            self._voice_frames -= voice_frames
+            if not self._voice:
+                playback_reference.playing.clear()
+
+            for cue in self._cues:
+                samples, position = cue
+                take = min(frames, len(samples) - position)
+                out[:take] += samples[position:position + take]
+                cue[1] += take
+            self._cues = [cue for cue in self._cues if cue[1] < len(cue[0])]
+
+            self._cond.notify_all()
+
+        if voice_frames:
+            playback_reference.add(out[:voice_frames])
+        np.clip(out, -1.0, 1.0, out=out)
+        outdata[:, 0] = out
+
+    def write_voice(self, samples: np.ndarray, abort: threading.Event = None) -> bool:
+        """Queue voice samples, waiting while the queue is full. False if aborted."""
+        self.start()
+        samples = np.ascontiguousarray(samples, dtype=np.float32)
+        with self._cond:
+            while self._voice_frames >= self.max_voice_frames:
+                if abort is not None and abort.is_set():
+                    return False
+                self._cond.wait(0.05)
+            if abort is not None and abort.is_set():
+                return False
+            self._voice.append(samples)
+            self._voice_frames += len(samples)
+            playback_reference.playing.set()
+        return True
+
+    def wait_voice_drained(self, abort: threading.Event = None) -> bool:
+        """Wait until the queued voice has been played. False if aborted."""
+        with self._cond:
+            while self._voice:
+                if abort is not None and abort.is_set():
+                    return False
+                self._cond.wait(0.05)
+        return True
+
+    def clear_voice(self):
+        """Drop queued voice at once (stop speaking)."""
+        with self._cond:
+            self._voice.clear()
+            self._voice_frames = 0
+            playback_reference.playing.clear()
+            self._cond.notify_all()
+
+    def play(self, samples: np.ndarray):
+        """Mix a one-shot cue on top of whatever is playing."""
+        self.start()
+        with self._cond:
+            self._cues.append([np.asarray(samples, dtype=np.float32), 0])
+
+
+mixer = AudioMixer()
@@ -1,35 +1,51 @@
 # feedback_sound.py
 import numpy as np
-import sounddevice as sd
-import os
+from audio_mixer import mixer, SAMPLE_RATE
+
+
+def _make_ding(sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    # Generate a pleasant notification sound (C5 note)
+    duration = 0.15  # seconds
+    frequency = 523.25  # C5 (Do)
+
+    t = np.linspace(0, duration, int(sample_rate * duration), False)
+
+    # Create a note with harmonics for richer sound
+    note = np.sin(frequency * 2 * np.pi * t)  # fundamental
+    note += 0.3 * np.sin(frequency * 4 * np.pi * t)  # 2nd harmonic
+    note += 0.15 * np.sin(frequency * 6 * np.pi * t)  # 3rd harmonic
+
+    # Apply envelope (fade in/out) for smooth sound
+    envelope = np.ones_like(t)
+    fade_samples = int(0.01 * sample_rate)
+    envelope[:fade_samples] = np.linspace(0, 1, fade_samples)
+    envelope[-fade_samples:] = np.linspace(1, 0, fade_samples)
+
+    return (note * envelope * 0.2).astype(np.float32)  # Volume 20%
+
+
+def _make_error_tone(sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    duration = 0.2
+    frequency = 220  # A3 (La basso)
+
+    t = np.linspace(0, duration, int(sample_rate * duration), False)
+    note = np.sin(frequency * 2 * np.pi * t) * 0.15
+
+    # Quick fade out
+    envelope = np.linspace(1, 0, len(t))
+    return (note * envelope).astype(np.float32)
+
+
+# Synthesized once, at the mixer rate
+DING = _make_ding()
+ERROR_TONE = _make_error_tone()
 
 
 def play_ding():
     """Play a quick 'ding' sound for immediate feedback."""
     try:
-        # Generate a pleasant notification sound (C5 note)
-        duration = 0.15  # seconds
-        frequency = 523.25  # C5 (Do)
-        sample_rate = 44100
-        
-        t = np.linspace(0, duration, int(sample_rate * duration), False)
-        
-        # Create a note with harmonics for richer sound
-        note = np.sin(frequency * 2 * np.pi * t)  # fundamental
-        note += 0.3 * np.sin(frequency * 4 * np.pi * t)  # 2nd harmonic
-        note += 0.15 * np.sin(frequency * 6 * np.pi * t)  # 3rd harmonic
-        
-        # Apply envelope (fade in/out) for smooth sound
-        envelope = np.ones_like(t)
-        fade_samples = int(0.01 * sample_rate)
-        envelope[:fade_samples] = np.linspace(0, 1, fade_samples)
-        envelope[-fade_samples:] = np.linspace(1, 0, fade_samples)
-        
-        note = note * envelope * 0.2  # Volume 20%
-        
-        # Play asynchronously
-        sd.play(note, sample_rate, blocking=False)
-        
+        # Mixed into the shared output stream, on top of any speech
+        mixer.play(DING)
     except Exception as e:
         print(f"Ding sound error: {e}")
 
@@ -37,18 +53,6 @@ def play_ding():
 def play_error_sound():
     """Play a low tone for errors."""
     try:
-        duration = 0.2
-        frequency = 220  # A3 (La basso)
-        sample_rate = 44100
-        
-        t = np.linspace(0, duration, int(sample_rate * duration), False)
-        note = np.sin(frequency * 2 * np.pi * t) * 0.15
-        
-        # Quick fade out
-        envelope = np.linspace(1, 0, len(t))
-        note = note * envelope
-        
-        sd.play(note, sample_rate, blocking=False)
-        
+        mixer.play(ERROR_TONE)
     except Exception as e:
         print(f"Error sound error: {e}")
@@ -0,0 +1,256 @@
+# http_client.py
+"""
+Shared, persistent HTTP client for every OpenRouter call.
+
+- one pooled session, keep-alive connections reused across turns
+- HTTP/2 through httpx when installed (pip install "httpx[http2]"),
+  otherwise a pooled requests.Session (HTTP/1.1 keep-alive)
+- warm_up_async() opens the connection in the background at startup
+- every request records connect / TTFB / total timings (see TIMINGS)
+"""
+
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+try:
+    import httpx
+    import h2  # noqa: F401  (required by httpx for HTTP/2)
+    HAS_HTTP2 = True
+except ImportError:
+    HAS_HTTP2 = False
+
+USE_HTTP2 = True
+POOL_SIZE = 8                 # parallel connections per host
+KEEPALIVE_INTERVAL = 45       # seconds; re-ping an idle pool before the server drops it
+LOG_TIMING = True
+
+# Most recent request timings, newest last
+TIMINGS = deque(maxlen=50)
+
+TIMEOUT_ERRORS = (requests.exceptions.Timeout,)
+if HAS_HTTP2:
+    TIMEOUT_ERRORS += (httpx.TimeoutException,)
+
+_local = threading.local()
+_client = None
+_client_lock = threading.Lock()
+_last_used = 0.0
+_keepalive_thread = None
+
+
+# --- requests backend: connection classes that time connect() (TCP + TLS) ---
+
+def _add_connect_time(seconds: float):
+    _local.connect_time = getattr(_local, "connect_time", 0.0) + seconds
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _add_connect_time(time.perf_counter() - start)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _add_connect_time(time.perf_counter() - start)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+# --- httpx backend: connect time from the httpcore trace hooks ---
+
+def _httpx_trace(event_name: str, info: dict):
+    if event_name == "connection.connect_tcp.started":
+        _local.connect_started = time.perf_counter()
+    elif event_name in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+        started = getattr(_local, "connect_started", None)
+        if started is not None:
+            now = time.perf_counter()
+            _add_connect_time(now - started)
+            _local.connect_started = now
+
+
+def _get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            if USE_HTTP2 and HAS_HTTP2:
+                _client = httpx.Client(
+                    http2=True,
+                    limits=httpx.Limits(
+                        max_connections=POOL_SIZE,
+                        max_keepalive_connections=POOL_SIZE,
+                        keepalive_expiry=120
+                    )
+                )
+            else:
+                session = requests.Session()
+                adapter = _TimedAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _client = session
+        return _client
+
+
+class PooledResponse:
+    """Same small interface for requests and httpx responses, plus timing."""
+
+    def __init__(self, raw, timing: dict, start: float):
+        self.raw = raw
+        self.timing = timing
+        self._start = start
+        self._closed = False
+
+    @property
+    def status_code(self) -> int:
+        return self.raw.status_code
+
+    @property
+    def text(self) -> str:
+        if HAS_HTTP2 and isinstance(self.raw, httpx.Response):
+            self.raw.read()
+        return self.raw.text
+
+    def json(self):
+        if HAS_HTTP2 and isinstance(self.raw, httpx.Response):
+            self.raw.read()
+        return self.raw.json()
+
+    def iter_lines(self):
+        if HAS_HTTP2 and isinstance(self.raw, httpx.Response):
+            yield from self.raw.iter_lines()
+        else:
+            # Bytes, decoded here: requests would read a text/event-stream
+            # without charset as ISO-8859-1 and mangle every accent
+            for line in self.raw.iter_lines():
+                yield line.decode("utf-8", errors="replace")
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.raw.close()
+        _finish_timing(self.timing, self._start)
+
+
+def _finish_timing(timing: dict, start: float):
+    global _last_used
+    timing["total"] = time.perf_counter() - start
+    _last_used = time.monotonic()
+    if LOG_TIMING:
+        print(
+            f"⏱️ HTTP {timing['http_version']} {timing['host']}: "
+            f"connect {timing['connect'] * 1000:.0f}ms{' (reused)' if timing['reused'] else ''}, "
+            f"TTFB {timing['ttfb'] * 1000:.0f}ms, total {timing['total'] * 1000:.0f}ms"
+        )
+
+
+def post(url: str, headers: dict = None, json: dict = None, timeout: float = 30,
+         stream: bool = False) -> PooledResponse:
+    """
+    POST through the shared pool.
+    With stream=True the body is read lazily: call close() when done
+    (that is also when the total time is recorded).
+    """
+    client = _get_client()
+    _local.connect_time = 0.0
+    start = time.perf_counter()
+
+    if HAS_HTTP2 and isinstance(client, httpx.Client):
+        request = client.build_request(
+            "POST", url, headers=headers, json=json, timeout=timeout,
+            extensions={"trace": _httpx_trace}
+        )
+        raw = client.send(request, stream=True)
+        ttfb = time.perf_counter() - start
+        version = raw.http_version
+    else:
+        raw = client.post(url, headers=headers, json=json, timeout=timeout, stream=True)
+        ttfb = time.perf_counter() - start
+        version = "HTTP/1.1"
+
+    connect = getattr(_local, "connect_time", 0.0)
+    timing = {
+        "host": urlsplit(url).netloc,
+        "http_version": version,
+        "connect": connect,
+        "reused": connect == 0.0,
+        "ttfb": ttfb,
+        "total": None,
+    }
+    TIMINGS.append(timing)
+
+    response = PooledResponse(raw, timing, start)
+    if not stream:
+        try:
+            response.text  # read the whole body now
+        finally:
+            response.close()
+    return response
+
+
+def last_timing() -> dict | None:
+    return TIMINGS[-1] if TIMINGS else None
+
+
+def warm_up(url: str, timeout: float = 5, verbose: bool = True):
+    """Open (DNS + TCP + TLS) a pooled connection to the host of url."""
+    global _last_used
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}/"
+    client = _get_client()
+    _local.connect_time = 0.0
+    start = time.perf_counter()
+    try:
+        if HAS_HTTP2 and isinstance(client, httpx.Client):
+            client.head(origin, timeout=timeout, extensions={"trace": _httpx_trace})
+        else:
+            client.head(origin, timeout=timeout)
+        _last_used = time.monotonic()
+        if verbose:
+            print(f"🔌 Connection to {parts.netloc} ready "
+                  f"(connect {getattr(_local, 'connect_time', 0.0) * 1000:.0f}ms, "
+                  f"total {(time.perf_counter() - start) * 1000:.0f}ms)")
+    except Exception as e:
+        print(f"⚠️ Warm-up of {parts.netloc} failed: {e}")
+
+
+def warm_up_async(url: str):
+    """Warm the connection in a background thread and keep it alive while idle."""
+    global _keepalive_thread
+
+    def _keepalive():
+        warm_up(url)
+        while True:
+            time.sleep(5)
+            if time.monotonic() - _last_used > KEEPALIVE_INTERVAL:
+                warm_up(url, verbose=False)
+
+    if _keepalive_thread is None:
+        _keepalive_thread = threading.Thread(target=_keepalive, daemon=True)
+        _keepalive_thread.start()
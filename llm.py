@@ -1,21 +1,58 @@
 # llm.py
 
 import os
+import re
 import json
-import requests
+import time
+import queue
+import hashlib
+import threading
+import http_client
+from local_intent import normalize_utterance
+from collections import OrderedDict, deque
 from dotenv import load_dotenv
 
 load_dotenv()
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+# Override with a local URL (e.g. tools/fake_openrouter.py) to test without the real API
+OPENROUTER_URL = os.getenv("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
 
 # Fast models for intent classification (free):
 # - arcee-ai/trinity-large-preview:free (RELIABLE, works consistently)
 # - google/gemini-flash-1.5:free (Not available)
 # - upstage/solar-pro-3:free (Returns empty responses)
 # - stepfun/step-3.5-flash:free (Returns empty responses - DO NOT USE)
-MODEL = "arcee-ai/trinity-large-preview:free"
+#
+# Ordered fallback chain. The next model is tried when the current one fails
+# (HTTP error, timeout, empty or non-JSON reply) or, as a hedge, when it has
+# not sent its first token within HEDGE_DELAY. The first valid JSON wins.
+# Override with OPENROUTER_MODELS="model_a,model_b" (e.g. for the fake server).
+MODELS = [
+    m.strip() for m in os.getenv(
+        "OPENROUTER_MODELS",
+        "arcee-ai/trinity-large-preview:free,"
+        "meta-llama/llama-3.3-70b-instruct:free,"
+        "mistralai/mistral-small-3.2-24b-instruct:free"
+    ).split(",") if m.strip()
+]
+HEDGE_DELAY = 2.0        # seconds without a first token before hedging on the next model
+REQUEST_TIMEOUT = 30     # per model request
+
+# Streaming (SSE): intent/parameters and the sentences of "text" are delivered
+# through callbacks while the completion is still being generated.
+STREAM = True
+
+# Fixed replies (also synthesized ahead into the TTS cache, see main.PREWARM_PHRASES)
+REPLY_NOT_HEARD = "Sir, I didn't catch that."
+REPLY_NO_API_KEY = "API key is missing, Sir."
+REPLY_TIMEOUT = "Sir, the connection timed out."
+REPLY_NOT_UNDERSTOOD = "Scusa, non ho capito bene. Puoi ripetere?"
+REPLY_SYSTEM_ERROR = "Sir, I encountered a system error."
+FIXED_REPLIES = [REPLY_NOT_HEARD, REPLY_NO_API_KEY, REPLY_TIMEOUT, REPLY_NOT_UNDERSTOOD, REPLY_SYSTEM_ERROR]
+
+# A sentence ends on . ! ? … followed by whitespace (avoids splitting "3.5")
+SENTENCE_END_RE = re.compile(r"[.!?…]+[\"')\]]*\s")
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 PROMPT_PATH = os.path.join(current_dir, "core", "prompt.txt")
@@ -33,8 +70,27 @@ def load_system_prompt() -> str:
 
 SYSTEM_PROMPT = load_system_prompt()
 
+# Response cache for repeated commands ("che tempo fa a Milano", "apri Spotify")
+CACHE_PATH = os.path.join(current_dir, "core", "llm_cache.json")
+CACHE_MAX_ENTRIES = 256
+CACHE_TTL = 7 * 24 * 3600          # seconds
+CACHE_SIMILARITY = 0.6             # trigram Jaccard for near-duplicates (None = exact only)
+# The parameters of every cacheable intent come from the text, so a near-hit
+# also needs the same words, in order, once these are removed: "mi apri
+# spotify" may reuse "apri spotify", "meteo a Milano 2023" never reuses "... 2022"
+CACHE_FILLER_WORDS = {
+    "il", "lo", "la", "i", "gli", "le", "l", "un", "uno", "una", "mi", "ti", "ci", "me",
+    "puoi", "potresti", "vorrei", "voglio", "ora", "adesso", "subito", "pure", "dai", "ok",
+    "the", "a", "an", "can", "you", "could", "please", "now",
+}
+# Chat replies depend on the conversation, only these intents are cached
+CACHEABLE_INTENTS = {"open_app", "weather_report", "search", "screen_action"}
+# memory_block fields that do not change the answer to a command
+CACHE_IGNORED_FIELDS = {"recent_conversation"}
 
-def safe_json_parse(text: str) -> dict | None:
+
+def safe_json_parse(text: str, fallback: bool = True) -> dict | None:
+    """Extract the JSON object from the model text. fallback=False returns None on failure."""
     if not text:
         return None
 
@@ -63,7 +119,10 @@ def safe_json_parse(text: str) -> dict | None:
     except Exception as e:
         print(f"⚠️ JSON parse error: {e}")
         print(f"The error text: {text[:400]}")
-        
+
+        if not fallback:
+            return None
+
         # Fallback: Return a valid chat response when JSON parsing fails
         return {
             "intent": "chat",
@@ -74,39 +133,466 @@ def safe_json_parse(text: str) -> dict | None:
         }
 
 
-def get_llm_output(user_text: str, memory_block: dict = None) -> dict:
+class StreamingJSONParser:
+    """
+    Incremental parser for the JSON object streamed by the LLM.
 
-    if not user_text or not user_text.strip():
-        return {
-            "intent": "chat",
-            "parameters": {},
-            "needs_clarification": False,
-            "text": "Sir, I didn't catch that.",
-            "memory_update": None
+    - on_field(key, value) fires as soon as a top-level field is closed
+    - on_text(chunk) receives the decoded characters of the "text" field
+      while it is still being written
+    Anything before the first "{" (e.g. ```json fences) is ignored.
+    """
+
+    _ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+    def __init__(self, on_field=None, on_text=None, text_key: str = "text"):
+        self.on_field = on_field
+        self.on_text = on_text
+        self.text_key = text_key
+        self.fields = {}
+
+        self._buf = []
+        self._started = False
+        self._done = False
+        self._state = "key"      # key | key_string | colon | value | in_value
+        self._key_chars = []
+        self._key = None
+        self._value_start = None
+        self._depth = 0          # nesting inside the current value
+        self._in_string = False
+        self._escape = False
+        self._unicode = None     # pending \uXXXX digits for the text stream
+
+    def feed(self, chunk: str):
+        for ch in chunk:
+            if self._done:
+                return
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                continue
+            self._buf.append(ch)
+            self._step(ch, len(self._buf) - 1)
+
+    def _step(self, ch: str, pos: int):
+        state = self._state
+
+        if state == "key":
+            if ch == '"':
+                self._state = "key_string"
+                self._key_chars = []
+            elif ch == "}":
+                self._done = True
+            return
+
+        if state == "key_string":
+            if self._escape:
+                self._key_chars.append(self._ESCAPES.get(ch, ch))
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._key = "".join(self._key_chars)
+                self._state = "colon"
+            else:
+                self._key_chars.append(ch)
+            return
+
+        if state == "colon":
+            if ch == ":":
+                self._state = "value"
+            return
+
+        if state == "value":
+            if ch.isspace():
+                return
+            self._value_start = pos
+            self._depth = 0
+            self._state = "in_value"
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth = 1
+            return
+
+        # in_value
+        if self._in_string:
+            if self._key == self.text_key and self._depth == 0:
+                self._stream_text_char(ch)
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if self._depth == 0:
+                    self._close_value(pos + 1)
+            return
+
+        if ch == '"':
+            self._in_string = True
+        elif ch in "{[":
+            self._depth += 1
+        elif ch in "}]":
+            if self._depth == 0:
+                # "}" closing the top-level object right after a scalar
+                self._close_value(pos)
+                self._done = True
+                return
+            self._depth -= 1
+            if self._depth == 0:
+                self._close_value(pos + 1)
+        elif ch == "," and self._depth == 0:
+            self._close_value(pos)
+
+    def _stream_text_char(self, ch: str):
+        if not self.on_text:
+            return
+        if self._unicode is not None:
+            self._unicode += ch
+            if len(self._unicode) == 4:
+                try:
+                    self.on_text(chr(int(self._unicode, 16)))
+                except ValueError:
+                    pass
+                self._unicode = None
+            return
+        if self._escape:
+            if ch == "u":
+                self._unicode = ""
+            else:
+                self.on_text(self._ESCAPES.get(ch, ch))
+        elif ch not in ('\\', '"'):
+            self.on_text(ch)
+
+    def _close_value(self, end: int):
+        raw = "".join(self._buf[self._value_start:end]).strip()
+        key = self._key
+        self._state = "key"
+        self._key = None
+        self._value_start = None
+        try:
+            value = json.loads(raw)
+        except Exception:
+            return
+        self.fields[key] = value
+        if self.on_field:
+            try:
+                self.on_field(key, value)
+            except Exception as e:
+                print(f"⚠️ Stream callback error: {e}")
+
+
+class SentenceSplitter:
+    """Collects streamed text and emits it one complete sentence at a time."""
+
+    def __init__(self, on_sentence):
+        self.on_sentence = on_sentence
+        self._pending = ""
+
+    def feed(self, chunk: str):
+        self._pending += chunk
+        while True:
+            match = SENTENCE_END_RE.search(self._pending)
+            if not match:
+                return
+            sentence = self._pending[:match.end()].strip()
+            self._pending = self._pending[match.end():]
+            if sentence:
+                self.on_sentence(sentence)
+
+    def flush(self):
+        sentence = self._pending.strip()
+        self._pending = ""
+        if sentence:
+            self.on_sentence(sentence)
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of LLM outputs, persisted to CACHE_PATH.
+
+    Key: normalized user text + the memory_block fields that matter.
+    Near-duplicates ("apri spotify" / "mi apri spotify") can hit through
+    character-trigram similarity within the same memory context, only when
+    the words left after CACHE_FILLER_WORDS are identical.
+    Replies with a memory_update, clarifications and errors are never stored.
+    """
+
+    def __init__(self, path: str, max_entries: int, ttl: float, similarity: float | None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+        self._entries = OrderedDict()   # key -> {"text", "context", "output", "created"}
+        self._grams = {}                # key -> trigram set of the text
+        self._llm_latency = deque(maxlen=20)
+        self._lock = threading.Lock()
+        self._version = hashlib.sha1((",".join(MODELS) + SYSTEM_PROMPT).encode("utf-8")).hexdigest()[:12]
+        self._load()
+
+    @staticmethod
+    def _normalize(user_text: str) -> str:
+        return normalize_utterance(user_text)
+
+    @staticmethod
+    def _context(memory_block: dict | None) -> str:
+        relevant = {
+            k: v for k, v in (memory_block or {}).items()
+            if k not in CACHE_IGNORED_FIELDS
         }
+        return json.dumps(relevant, sort_keys=True, ensure_ascii=False, default=str)
 
-    if not OPENROUTER_API_KEY:
-        print("❌ OPENROUTER_API_KEY couldn't found!")
+    @staticmethod
+    def _content_words(text: str) -> list[str]:
+        return [word for word in re.findall(r"\w+", text) if word not in CACHE_FILLER_WORDS]
+
+    @staticmethod
+    def _trigrams(text: str) -> set:
+        padded = f"  {text} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def get(self, user_text: str, memory_block: dict | None) -> dict | None:
+        if memory_block and "_pending_intent" in memory_block:
+            return None
+
+        text = self._normalize(user_text)
+        context = self._context(memory_block)
+        key = f"{context}|{text}"
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            near = False
+
+            if entry is None and self.similarity:
+                grams = self._trigrams(text)
+                words = self._content_words(text)
+                best_score = 0.0
+                for other_key, other in self._entries.items():
+                    if other["context"] != context or self._content_words(other["text"]) != words:
+                        continue
+                    other_grams = self._grams[other_key]
+                    score = len(grams & other_grams) / max(len(grams | other_grams), 1)
+                    if score > best_score:
+                        best_score, key, entry = score, other_key, other
+                if best_score < self.similarity:
+                    entry = None
+                near = entry is not None
+
+            if entry is not None and now - entry["created"] > self.ttl:
+                self._remove(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if near:
+                self.near_hits += 1
+            if self._llm_latency:
+                self.saved_seconds += sum(self._llm_latency) / len(self._llm_latency)
+            return json.loads(json.dumps(entry["output"]))
+
+    def put(self, user_text: str, memory_block: dict | None, output: dict):
+        if memory_block and "_pending_intent" in memory_block:
+            return
+        if output.get("memory_update") or output.get("needs_clarification"):
+            return
+        if output.get("intent") not in CACHEABLE_INTENTS:
+            return
+
+        text = self._normalize(user_text)
+        context = self._context(memory_block)
+        key = f"{context}|{text}"
+
+        with self._lock:
+            self._entries[key] = {
+                "text": text,
+                "context": context,
+                "output": output,
+                "created": time.time()
+            }
+            self._grams[key] = self._trigrams(text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+            self._save()
+
+    def record_llm_latency(self, seconds: float):
+        self._llm_latency.append(seconds)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
         return {
-            "intent": "chat",
-            "parameters": {},
-            "text": "API key is missing, Sir.",
-            "needs_clarification": False,
-            "memory_update": None
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 2),
         }
 
-    # Memory'yi string'e çevir
-    memory_str = ""
-    if memory_block:
-        memory_str = "\n".join(f"{k}: {v}" for k, v in memory_block.items())
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._grams.clear()
+            self._save()
 
-    user_prompt = f"""User message: "{user_text}"
+    def _remove(self, key: str):
+        self._entries.pop(key, None)
+        self._grams.pop(key, None)
 
-Known user memory:
-{memory_str if memory_str else "No memory available"}"""
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"⚠️ LLM cache cannot be loaded: {e}")
+            return
+
+        # A different model or prompt invalidates every stored answer
+        if data.get("version") != self._version:
+            return
+
+        self._llm_latency.extend(data.get("llm_latency", []))
+        now = time.time()
+        for key, entry in data.get("entries", []):
+            if now - entry.get("created", 0) <= self.ttl:
+                self._entries[key] = entry
+                self._grams[key] = self._trigrams(entry["text"])
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "version": self._version,
+                        "llm_latency": list(self._llm_latency),
+                        "entries": list(self._entries.items())
+                    },
+                    f, ensure_ascii=False
+                )
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"⚠️ LLM cache cannot be saved: {e}")
+
+
+response_cache = ResponseCache(CACHE_PATH, CACHE_MAX_ENTRIES, CACHE_TTL, CACHE_SIMILARITY)
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters of the response cache (and the LLM time it saved)."""
+    return response_cache.stats()
+
+
+def _chat_reply(text: str) -> dict:
+    return {
+        "intent": "chat",
+        "parameters": {},
+        "needs_clarification": False,
+        "text": text,
+        "memory_update": None
+    }
+
+
+def _build_output(content: str) -> dict | None:
+    """Turn the raw model content into the get_llm_output dict (None if empty/not JSON)."""
+    if not content or not content.strip():
+        return None
+
+    # JSON parse et
+    parsed = safe_json_parse(content, fallback=False)
+    if not isinstance(parsed, dict):
+        return None
+
+    # Verifica che il testo non sia vuoto
+    response_text = parsed.get("text")
+    if not response_text or not str(response_text).strip():
+        response_text = "Sono qui per aiutarti, cosa ti serve?"
+
+    parameters = parsed.get("parameters")
+    return {
+        "intent": parsed.get("intent") or "chat",
+        "parameters": parameters if isinstance(parameters, dict) else {},
+        "needs_clarification": parsed.get("needs_clarification", False),
+        "text": response_text,
+        "memory_update": parsed.get("memory_update")
+    }
 
+
+def _read_sse_content(response, parser: StreamingJSONParser, on_first_delta=None, cancel=None) -> str:
+    """Read an OpenRouter SSE stream, feeding each delta to the parser."""
+    content = []
+    for line in response.iter_lines():
+        if cancel is not None and cancel.is_set():
+            break
+        # Keep-alive comments (": OPENROUTER PROCESSING") and blank separators
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            # Keep reading to the end of the body so the connection goes back to the pool
+            continue
+        try:
+            event = json.loads(data)
+        except ValueError:
+            continue
+        if "error" in event:
+            print(f"❌ Stream error: {event['error']}")
+            break
+        choices = event.get("choices") or []
+        if not choices:
+            continue
+        delta = (choices[0].get("delta") or {}).get("content")
+        if delta:
+            if not content and on_first_delta:
+                on_first_delta()
+            content.append(delta)
+            parser.feed(delta)
+    return "".join(content)
+
+
+class _Attempt:
+    """One model request inside a hedged get_llm_output call."""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.started = time.perf_counter()
+        self.first_token = None     # seconds until the first content token
+        self.output = None          # valid dict, or None
+        self.error = None           # "http 429" / "timeout" / "empty" / "invalid" / ...
+        self.done = False
+        self.cancel = threading.Event()
+
+
+# Details of the last get_llm_output call (winner model, per-attempt errors).
+# Speculative and hedged calls finish on different threads: read it through
+# get_last_call_info().
+last_call_info = {}
+_call_info_lock = threading.Lock()
+
+
+def get_last_call_info() -> dict:
+    """A consistent copy of last_call_info."""
+    with _call_info_lock:
+        return dict(last_call_info)
+
+
+def _run_attempt(attempt: _Attempt, user_prompt: str, events: queue.Queue, callbacks):
     payload = {
-        "model": MODEL,
+        "model": attempt.model,
         "response_format": {"type": "json_object"},  # Re-enabled for models that support it (Gemini Flash does)
         "messages": [
             {"role": "system", "content": SYSTEM_PROMPT},
@@ -115,6 +601,8 @@ Known user memory:
         "temperature": 0.1,  # Ridotto per risposte più deterministiche/veloci
         "max_tokens": 220  # Aumentato per evitare troncamenti JSON con memory_update
     }
+    if STREAM:
+        payload["stream"] = True
 
     headers = {
         "Authorization": f"Bearer {OPENROUTER_API_KEY}",
@@ -123,79 +611,307 @@ Known user memory:
         "X-Title": "Jarvis-Assistant"
     }
 
+    def _first_delta():
+        attempt.first_token = time.perf_counter() - attempt.started
+        events.put(("first_token", attempt))
+
+    parser = callbacks.parser_for(attempt)
+
     try:
-        
-        response = requests.post(
+        response = http_client.post(
             OPENROUTER_URL,
             headers=headers,
             json=payload,
-            timeout=30
+            timeout=REQUEST_TIMEOUT,
+            stream=STREAM
         )
 
         if response.status_code != 200:
-            print(f"❌ API Hatası: {response.text}")
-            return {
-                "intent": "chat",
-                "parameters": {},
-                "text": f"Sir, API error: {response.status_code}",
-                "needs_clarification": False,
-                "memory_update": None
-            }
+            print(f"❌ API Hatası ({attempt.model}): {response.text[:300]}")
+            response.close()
+            attempt.error = f"http {response.status_code}"
+            return
 
-        data = response.json()
-        content = data["choices"][0]["message"]["content"]
-
-        # Fallback per risposte vuote
-        if not content or not content.strip():
-            return {
-                "intent": "chat",
-                "parameters": {},
-                "needs_clarification": False,
-                "text": "Scusa, non ho capito bene. Puoi ripetere?",
-                "memory_update": None
-            }
+        if STREAM:
+            try:
+                content = _read_sse_content(response, parser, _first_delta, attempt.cancel)
+            finally:
+                response.close()
+        else:
+            data = response.json()
+            content = data["choices"][0]["message"]["content"]
+            _first_delta()
 
-        # JSON parse et
-        parsed = safe_json_parse(content)
-
-        if parsed:
-            # Verifica che il testo non sia vuoto
-            response_text = parsed.get("text")
-            if not response_text or not response_text.strip():
-                response_text = "Sono qui per aiutarti, cosa ti serve?"
-            
-            return {
-                "intent": parsed.get("intent", "chat"),
-                "parameters": parsed.get("parameters", {}),
-                "needs_clarification": parsed.get("needs_clarification", False),
-                "text": response_text,
-                "memory_update": parsed.get("memory_update")
-            }
+        if attempt.cancel.is_set():
+            attempt.error = "cancelled"
+            return
 
-        return {
-            "intent": "chat",
-            "parameters": {},
-            "needs_clarification": False,
-            "text": content if content else "Come posso aiutarti?",
-            "memory_update": None
-        }
+        attempt.output = _build_output(content)
+        if attempt.output is None:
+            attempt.error = "empty" if not content or not content.strip() else "invalid"
+            print(f"⚠️ {attempt.model}: {attempt.error} reply, failing over")
+
+    except http_client.TIMEOUT_ERRORS:
+        print(f"❌ API timeout ({attempt.model})!")
+        attempt.error = "timeout"
 
-    except requests.exceptions.Timeout:
-        print("❌ API timeout!")
-        return {
-            "intent": "chat",
-            "text": "Sir, the connection timed out.",
-            "parameters": {},
-            "needs_clarification": False,
-            "memory_update": None
-        }
-    
     except Exception as e:
-        print(f"❌ LLM ERROR: {e}")
-        return {
-            "intent": "chat",
-            "text": "Sir, I encountered a system error.",
-            "parameters": {},
-            "needs_clarification": False,
-            "memory_update": None
-        }
\ No newline at end of file
+        print(f"❌ LLM ERROR ({attempt.model}): {e}")
+        attempt.error = "error"
+
+    finally:
+        if attempt.output is None:
+            callbacks.release(attempt)
+        attempt.done = True
+        events.put(("done", attempt))
+
+
+class _StreamCallbacks:
+    """
+    Per-attempt parsers that forward to the caller's callbacks.
+    Only the owner - the first attempt to produce a field or sentence -
+    talks to the caller, so hedged requests never speak twice. Every attempt
+    records what it produced: when the owner fails, the caller is told to
+    drop what it got so far (on_discard) and the next attempt with output
+    takes over, its events replayed from the start.
+    """
+
+    def __init__(self, on_intent=None, on_sentence=None, on_discard=None):
+        self.on_intent = on_intent
+        self.on_sentence = on_sentence
+        self.on_discard = on_discard
+        self.owner = None
+        self._attempts = []     # every attempt started, in order
+        self._events = {}       # attempt -> [(callback, args), ...] in order
+        self._lock = threading.Lock()
+
+    def _call(self, attempt, callback, args):
+        if callback is self.on_intent:
+            # Settled: no other attempt is still running, so nothing can
+            # take this one's place unless it fails itself
+            settled = all(a.done for a in self._attempts if a is not attempt)
+            callback(*args, settled)
+        else:
+            callback(*args)
+
+    def _emit(self, attempt, callback, *args):
+        # Under the lock, so a handover replay never interleaves with new events
+        with self._lock:
+            self._events.setdefault(attempt, []).append((callback, args))
+            if self.owner is None:
+                self.owner = attempt
+            if self.owner is attempt:
+                self._call(attempt, callback, args)
+
+    def release(self, attempt):
+        """The attempt ended without a reply: forget it and hand over its place."""
+        with self._lock:
+            self._events.pop(attempt, None)
+            if attempt in self._attempts:
+                self._attempts.remove(attempt)
+            if self.owner is not attempt:
+                return
+            self.owner = None
+            if self.on_discard:
+                self.on_discard()
+            # A finished reply first, then the attempt furthest along
+            candidates = sorted(
+                self._events.items(),
+                key=lambda item: (item[0].output is None, -len(item[1]))
+            )
+            if candidates:
+                self.owner, events = candidates[0]
+                for callback, args in events:
+                    self._call(self.owner, callback, args)
+
+    def parser_for(self, attempt: _Attempt) -> StreamingJSONParser:
+        with self._lock:
+            self._attempts.append(attempt)
+        splitter = None
+        if self.on_sentence:
+            splitter = SentenceSplitter(
+                lambda sentence: self._emit(attempt, self.on_sentence, sentence)
+            )
+        intent_fired = False
+
+        def _on_field(key, value):
+            nonlocal intent_fired
+            if key == "text" and splitter:
+                splitter.flush()
+            if intent_fired or not self.on_intent:
+                return
+            fields = parser.fields
+            if "intent" in fields and "parameters" in fields:
+                intent_fired = True
+                params = fields["parameters"] if isinstance(fields["parameters"], dict) else {}
+                self._emit(attempt, self.on_intent, fields["intent"] or "chat", params)
+
+        parser = StreamingJSONParser(
+            on_field=_on_field,
+            on_text=splitter.feed if splitter else None
+        )
+        return parser
+
+
+def _failure_reply(attempts: list) -> dict:
+    errors = [a.error for a in attempts]
+    if errors and all(e == "timeout" for e in errors):
+        return _chat_reply(REPLY_TIMEOUT)
+    http_errors = [e for e in errors if e and e.startswith("http")]
+    if http_errors and len(http_errors) == len(errors):
+        return _chat_reply(f"Sir, API error: {http_errors[-1][5:]}")
+    if any(e in ("empty", "invalid") for e in errors):
+        return _chat_reply(REPLY_NOT_UNDERSTOOD)
+    return _chat_reply(REPLY_SYSTEM_ERROR)
+
+
+def _hedged_completion(user_prompt: str, callbacks: _StreamCallbacks,
+                       cancel_event: threading.Event = None) -> tuple[_Attempt | None, list]:
+    """
+    Race the MODELS chain: start the first model, add the next one when the
+    newest attempt fails or has no first token after HEDGE_DELAY.
+    Returns (winner or None, all attempts). cancel_event aborts everything.
+    """
+    events = queue.Queue()
+    attempts = []
+    backup = None
+
+    def _launch():
+        attempt = _Attempt(MODELS[len(attempts)])
+        attempts.append(attempt)
+        threading.Thread(
+            target=_run_attempt,
+            args=(attempt, user_prompt, events, callbacks),
+            daemon=True
+        ).start()
+
+    def _finish(winner):
+        for other in attempts:
+            if other is not winner:
+                other.cancel.set()
+        return winner, attempts
+
+    _launch()
+
+    while True:
+        newest = attempts[-1]
+        can_hedge = len(attempts) < len(MODELS) and newest.first_token is None and not newest.done
+        timeout = None
+        if can_hedge:
+            timeout = max(0.0, newest.started + HEDGE_DELAY - time.perf_counter())
+        if cancel_event is not None:
+            timeout = 0.05 if timeout is None else min(timeout, 0.05)
+
+        try:
+            kind, attempt = events.get(timeout=timeout)
+        except queue.Empty:
+            if cancel_event is not None and cancel_event.is_set():
+                _finish(None)
+                return None, attempts
+            if can_hedge and time.perf_counter() >= newest.started + HEDGE_DELAY:
+                print(f"⏳ {newest.model}: no first token after {HEDGE_DELAY}s, hedging")
+                _launch()
+            continue
+
+        if kind != "done":
+            continue
+
+        owner = callbacks.owner
+        if attempt.output is not None:
+            # The attempt already talking to the caller keeps priority
+            if owner is None or owner is attempt or owner.done:
+                return _finish(attempt)
+            backup = backup or attempt
+            continue
+
+        # release() already handed the failed owner's place over
+        if backup is not None and (owner is None or owner is backup or owner.done):
+            return _finish(backup)
+
+        # Fail over immediately instead of waiting for the hedge timer
+        if len(attempts) < len(MODELS):
+            _launch()
+        elif all(a.done for a in attempts):
+            if backup is not None:
+                return _finish(backup)
+            return None, attempts
+
+
+def get_llm_output(
+    user_text: str,
+    memory_block: dict = None,
+    on_intent=None,
+    on_sentence=None,
+    cancel_event: threading.Event = None,
+    on_discard=None
+) -> dict:
+    """
+    Ask the LLM for intent + reply, racing the MODELS chain (see HEDGE_DELAY).
+
+    When STREAM is enabled:
+      - on_intent(intent, parameters, settled) fires as soon as both fields
+        are closed; settled is True when no other model is still racing, so
+        the reply can only be replaced if this model fails before the end
+      - on_sentence(sentence) receives the "text" field one sentence at a time
+      - on_discard() means the model streaming so far failed: drop what it
+        sent, another one starts over with on_intent/on_sentence
+    Only the returned dict is final: an action started from a settled
+    on_intent must be checked against it.
+    The full dict is returned at the end in both modes.
+    Setting cancel_event abandons the call (the result is then not cached).
+    """
+
+    if not user_text or not user_text.strip():
+        return _chat_reply(REPLY_NOT_HEARD)
+
+    cached = response_cache.get(user_text, memory_block)
+    if cached is not None:
+        stats = response_cache.stats()
+        print(f"💾 LLM cache hit ({stats['hits']} hits / {stats['misses']} misses, "
+              f"~{stats['saved_seconds']}s saved)")
+        return cached
+
+    if not OPENROUTER_API_KEY:
+        print("❌ OPENROUTER_API_KEY couldn't found!")
+        return _chat_reply(REPLY_NO_API_KEY)
+
+    # Memory'yi string'e çevir
+    memory_str = ""
+    if memory_block:
+        memory_str = "\n".join(f"{k}: {v}" for k, v in memory_block.items())
+
+    user_prompt = f"""User message: "{user_text}"
+
+Known user memory:
+{memory_str if memory_str else "No memory available"}"""
+
+    started = time.perf_counter()
+    winner, attempts = _hedged_completion(
+        user_prompt, _StreamCallbacks(on_intent, on_sentence, on_discard), cancel_event
+    )
+    elapsed = time.perf_counter() - started
+
+    if cancel_event is not None and cancel_event.is_set():
+        return _chat_reply("")
+
+    info = {
+        "model": winner.model if winner else None,
+        "elapsed": elapsed,
+        "attempts": [
+            {"model": a.model, "first_token": a.first_token, "error": a.error}
+            for a in attempts
+        ]
+    }
+    with _call_info_lock:
+        last_call_info.clear()
+        last_call_info.update(info)
+
+    if winner is None:
+        return _failure_reply(attempts)
+
+    if winner is not attempts[0]:
+        print(f"🔀 Answer from fallback model {winner.model} ({elapsed:.2f}s)")
+
+    response_cache.record_llm_latency(elapsed)
+    response_cache.put(user_text, memory_block, winner.output)
+    return winner.output
@@ -0,0 +1,255 @@
+# local_intent.py
+"""
+Local rule-based intent classifier (fast path in front of the LLM).
+
+Obvious commands - scroll, open an app, weather for a city - are recognised
+with precompiled keyword/regex patterns and a fuzzy app-name lexicon, and
+answered with the same dict shape get_llm_output returns. Anything the rules
+are not confident about returns None and goes to the LLM as before.
+"""
+
+import re
+from difflib import SequenceMatcher
+
+# Minimum confidence to answer locally instead of asking the LLM
+MIN_CONFIDENCE = 0.8
+
+# Shared with actions/screen_action.py.
+# Use only specific phrases to avoid false positives with "su" (on) or "ci" (us/there)
+SCROLL_KEYWORDS_DOWN = ['scorri giù', 'scendi', 'scroll down', 'scorri verso il basso', 'vai giù', 'pagina giù']
+SCROLL_KEYWORDS_UP = ['scorri su', 'sali', 'scroll up', 'scorri verso l\'alto', 'vai su', 'pagina su']
+
+# Scroll keywords count only as the whole command, with optional filler around
+# them: "sali" must not fire on "Salisburgo", "vai su" on "vai su youtube"
+_SCROLL_LEAD = r"(?:(?:puoi|potresti|ora|adesso|ancora|can you)\s+)*"
+_SCROLL_TAIL = r"(?:\s+(?:un\s+po'?|un\s+pochino|ancora|di\s+più|la\s+pagina|a\s+bit|a\s+little|more))*"
+
+
+def _scroll_re(keywords: list[str]) -> re.Pattern:
+    alternatives = "|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+    return re.compile(rf"^{_SCROLL_LEAD}(?:{alternatives}){_SCROLL_TAIL}$")
+
+
+_SCROLL_DOWN_RE = _scroll_re(SCROLL_KEYWORDS_DOWN)
+_SCROLL_UP_RE = _scroll_re(SCROLL_KEYWORDS_UP)
+
+# Canonical app name → spoken variants (lowercase)
+APP_LEXICON = {
+    "Chrome": ["chrome", "google chrome", "crome"],
+    "Firefox": ["firefox", "mozilla firefox"],
+    "Edge": ["edge", "microsoft edge"],
+    "Opera GX": ["opera gx", "opera"],
+    "Brave": ["brave"],
+    "Spotify": ["spotify", "spotifai"],
+    "Discord": ["discord"],
+    "Telegram": ["telegram"],
+    "Steam": ["steam"],
+    "Visual Studio Code": ["visual studio code", "vs code", "vscode", "visual studio"],
+    "Word": ["word", "microsoft word"],
+    "Excel": ["excel", "microsoft excel"],
+    "PowerPoint": ["powerpoint", "power point"],
+    "Outlook": ["outlook"],
+    "Teams": ["teams", "microsoft teams"],
+    "Zoom": ["zoom"],
+    "Notepad": ["notepad", "blocco note", "blocco note di windows"],
+    "Calcolatrice": ["calcolatrice", "calculator"],
+    "Esplora file": ["esplora file", "esplora risorse", "file explorer"],
+    "Impostazioni": ["impostazioni", "settings"],
+    "Paint": ["paint"],
+    "Task Manager": ["task manager", "gestione attività"],
+    "YouTube": ["youtube", "you tube"],
+    "WhatsApp": ["whatsapp", "what's up", "whats app", "whatsup"],
+}
+
+BROWSERS = {"Chrome", "Firefox", "Edge", "Opera GX", "Brave"}
+
+# Weather "time" words, kept in the user's words like the LLM does
+TIME_WORDS = [
+    "oggi", "domani", "dopodomani", "stasera", "stanotte", "stamattina", "pomeriggio",
+    "adesso", "ora", "in questo momento", "momento",
+    "questo weekend", "nel weekend", "weekend", "fine settimana",
+    "questa settimana", "prossima settimana", "settimana",
+    "lunedì", "martedì", "mercoledì", "giovedì", "venerdì", "sabato", "domenica",
+    "today", "tomorrow", "tonight", "this weekend", "this week", "next week", "now",
+]
+
+# A weather "city" starting with one of these, or containing one of the
+# others, is not a place name ("il weekend", "casa mia"): such matches get
+# NOT_A_PLACE_CONFIDENCE and go to the LLM
+_NOT_CITY_LEADS = {
+    "il", "lo", "la", "i", "gli", "le", "l'", "un", "uno", "una", "questo", "questa", "quel",
+    "quella", "mio", "mia", "tuo", "tua", "suo", "sua", "the", "a", "an", "this", "that", "my", "your",
+}
+_NOT_PLACE_WORDS = {
+    "casa", "mio", "mia", "tuo", "tua", "qui", "qua", "lì", "là", "fuori", "ufficio", "lavoro",
+    "home", "here", "there", "outside", "office", "work",
+}
+NOT_A_PLACE_CONFIDENCE = 0.4
+
+_WAKE_WORDS_RE = re.compile(r"^(?:(?:hey|ehi|ok|okay)\s+)?(?:kira|jarvis)\b[\s,]*")
+_POLITE_RE = re.compile(r"\b(?:per favore|per piacere|please|grazie)\b")
+_CLEAN_RE = re.compile(r"[^\w\s'’]")
+
+_OPEN_APP_RE = re.compile(
+    r"^(?:puoi\s+|potresti\s+|can you\s+)?"
+    r"(?:apri|aprimi|aprire|avvia|avviami|avviare|lancia|lanciare|esegui|open|launch|start)\s+"
+    r"(?:l'|l’|il\s+|la\s+|lo\s+|the\s+|app\s+|programma\s+|applicazione\s+)?"
+    r"(?P<app>.+?)"
+    r"(?:\s+(?:e|and)\s+(?:cerca|cercami|search(?:\s+for)?|look\s+up)\s+(?P<query>.+))?$"
+)
+
+# "apri il primo link" / "open the second result" are screen actions, not apps
+_SCREEN_WORDS_RE = re.compile(
+    r"\b(?:link|risultato|risultati|result|pulsante|bottone|button|primo|secondo|terzo|quarto|first|second|third)\b"
+)
+# "apri chat con Marco" belongs to the WhatsApp handler
+_CHAT_WORDS_RE = re.compile(r"\b(?:chat|messaggio|message|contatti|contacts)\b")
+
+_TIME_RE = re.compile(r"\b(?:" + "|".join(re.escape(t) for t in sorted(TIME_WORDS, key=len, reverse=True)) + r")\b")
+_WEATHER_RES = [
+    re.compile(r"^(?:che|come)\s+tempo\s+fa(?:rà)?\s+(?:a|ad|in|su)\s+(?P<city>.+)$"),
+    re.compile(r"^(?:che|come)\s+tempo\s+fa(?:rà)?\s+(?P<time>\w+)\s+(?:a|ad|in)\s+(?P<city>.+)$"),
+    re.compile(r"^(?:il\s+)?(?:meteo|previsioni(?:\s+(?:del\s+tempo|meteo))?)\s+(?:a|ad|di|per|in|su)\s+(?P<city>.+)$"),
+    re.compile(r"^(?:com'è|com’è|come\s+è)\s+il\s+(?:tempo|meteo)\s+(?:a|ad|in)\s+(?P<city>.+)$"),
+    re.compile(r"^(?:what's|what\s+is|how's|how\s+is)\s+the\s+weather\s+(?:like\s+)?(?:in|at)\s+(?P<city>.+)$"),
+    re.compile(r"^(?:the\s+)?weather\s+(?:forecast\s+)?(?:in|for|at)\s+(?P<city>.+)$"),
+]
+_CITY_TAIL_RE = re.compile(r"\s+(?:e|and|per|for|oggi|domani)$")
+
+# Flat list of (variant, canonical) sorted longest first, built once
+_APP_VARIANTS = sorted(
+    ((variant, name) for name, variants in APP_LEXICON.items() for variant in variants),
+    key=lambda item: len(item[0]),
+    reverse=True
+)
+
+
+def normalize_utterance(text: str) -> str:
+    """Lowercase, drop wake words, courtesy words and punctuation."""
+    text = (text or "").lower().strip()
+    text = _WAKE_WORDS_RE.sub("", text)
+    text = _POLITE_RE.sub("", text)
+    text = _CLEAN_RE.sub(" ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _reply(intent: str, parameters: dict, text: str) -> dict:
+    return {
+        "intent": intent,
+        "parameters": parameters,
+        "needs_clarification": False,
+        "text": text,
+        "memory_update": None
+    }
+
+
+def match_app_name(spoken: str) -> tuple[str | None, float]:
+    """Fuzzy-match a spoken app name against APP_LEXICON. Returns (name, score)."""
+    spoken = spoken.strip()
+    if not spoken:
+        return None, 0.0
+
+    for variant, name in _APP_VARIANTS:
+        if spoken == variant:
+            return name, 1.0
+
+    best_name, best_score = None, 0.0
+    matcher = SequenceMatcher(None, b=spoken)  # b is the cached side
+    for variant, name in _APP_VARIANTS:
+        matcher.set_seq1(variant)
+        # Cheap upper bounds first, full ratio only for real candidates
+        if matcher.real_quick_ratio() <= best_score or matcher.quick_ratio() <= best_score:
+            continue
+        score = matcher.ratio()
+        if score > best_score:
+            best_name, best_score = name, score
+    return best_name, best_score
+
+
+def _match_scroll(text: str):
+    if _SCROLL_DOWN_RE.match(text):
+        return _reply("screen_action", {"command": text}, "Scorro verso il basso"), 1.0
+    if _SCROLL_UP_RE.match(text):
+        return _reply("screen_action", {"command": text}, "Scorro verso l'alto"), 1.0
+    return None
+
+
+def _match_open_app(text: str):
+    match = _OPEN_APP_RE.match(text)
+    if not match:
+        return None
+
+    spoken_app = match.group("app").strip()
+    query = (match.group("query") or "").strip() or None
+
+    if _SCREEN_WORDS_RE.search(spoken_app) or _CHAT_WORDS_RE.search(spoken_app):
+        return None
+
+    name, score = match_app_name(spoken_app)
+    if not name:
+        return None
+    if query and name not in BROWSERS:
+        # "apri Spotify e cerca..." needs the LLM to decide what to do
+        score = min(score, 0.5)
+
+    text_reply = f"Apro {name}, Sir." if not query else f"Apro {name} e cerco {query}, Sir."
+    return _reply("open_app", {"app_name": name, "search_query": query}, text_reply), score
+
+
+def _match_weather(text: str):
+    for pattern in _WEATHER_RES:
+        match = pattern.match(text)
+        if not match:
+            continue
+
+        city = match.group("city")
+        time_word = match.groupdict().get("time")
+        found_time = _TIME_RE.search(city)
+        if found_time:
+            time_word = time_word or found_time.group(0)
+            city = _TIME_RE.sub("", city)
+        city = _CITY_TAIL_RE.sub("", city.strip()).strip()
+
+        words = city.replace("'", "' ").split()
+        if not city or len(words) > 3:
+            return None
+        confidence = 0.95
+        if words[0] in _NOT_CITY_LEADS or any(word in _NOT_PLACE_WORDS for word in words):
+            confidence = NOT_A_PLACE_CONFIDENCE
+
+        time_word = time_word if time_word and _TIME_RE.fullmatch(time_word) else "oggi"
+        city = city.title()
+        return _reply(
+            "weather_report",
+            {"city": city, "time": time_word},
+            f"Ecco il meteo per {city}, {time_word}."
+        ), confidence
+
+    return None
+
+
+_MATCHERS = (_match_scroll, _match_weather, _match_open_app)
+
+
+def match_intent(user_text: str) -> tuple[dict | None, float]:
+    """Best local match and its confidence (0.0 when nothing matched)."""
+    text = normalize_utterance(user_text)
+    if not text:
+        return None, 0.0
+
+    best, best_score = None, 0.0
+    for matcher in _MATCHERS:
+        result = matcher(text)
+        if result and result[1] > best_score:
+            best, best_score = result
+            if best_score >= 1.0:
+                break
+    return best, best_score
+
+
+def classify(user_text: str) -> dict | None:
+    """LLM-shaped output for obvious commands, None when the LLM should decide."""
+    output, confidence = match_intent(user_text)
+    if output and confidence >= MIN_CONFIDENCE:
+        return output
+    return None
@@ -1,32 +1,423 @@
 import asyncio
 import threading
+import time
 import os
+from concurrent.futures import CancelledError, ThreadPoolExecutor, wait as wait_futures
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from speech_to_text import record_voice, stop_listening_flag
-from llm import get_llm_output
-from tts import edge_speak, stop_speaking
+from speech_to_text import record_voice, stop_listening_flag, set_command_vocabulary, BargeInMonitor
+from llm import get_llm_output, OPENROUTER_URL, FIXED_REPLIES
+from local_intent import classify as classify_local, normalize_utterance, SCROLL_KEYWORDS_DOWN, SCROLL_KEYWORDS_UP
+import http_client
+from tts import edge_speak, route, speak_stream, speech_worker, stop_speaking, stop_speaking_flag, playback_reference, prewarm as prewarm_tts
 from ui import JarvisUI
 from feedback_sound import play_ding  # NEW: Feedback immediato
 
 from actions.open_app import open_app
 from actions.web_search import web_search
 from actions.weather_report import weather_action
-from actions.whatsapp_action import handle_whatsapp_command
+from actions.whatsapp_action import (
+    handle_whatsapp_command, CONTACTS, whatsapp_state,
+    OPEN_WHATSAPP_COMMANDS, LIST_CONTACTS_COMMANDS, OPEN_CHAT_COMMANDS, SEND_MESSAGE_COMMANDS
+)
 from actions.screen_action import screen_action  
+from actions.ocr_service import ocr_service, OCR_PREWARM
 
-from memory.memory_manager import load_memory, update_memory
+from memory.memory_manager import update_memory
+from memory.retrieval import relevant_facts
 from memory.temporary_memory import TemporaryMemory
 
-interrupt_commands = ["mute", "quit", "exit", "stop"]
-
-
-temp_memory = TemporaryMemory()
+interrupt_commands = ["mute", "quit", "exit", "stop", "basta"]
+# Words that may surround an interrupt command ("ok basta", "stop it")
+INTERRUPT_FILLERS = {"ok", "okay", "dai", "ora", "adesso", "così", "now", "it", "that"}
+
+# Fixed sentences synthesized into the TTS cache at startup
+PREWARM_PHRASES = FIXED_REPLIES + [
+    "Apro WhatsApp Web.",
+    "Scorro verso il basso",
+    "Scorro verso l'alto",
+    "Non ho capito cosa vuoi che faccia sullo schermo.",
+    "Sir, the city is missing for the weather report.",
+    "Sir, I couldn't open the browser for the weather report.",
+]
+
+# Start the LLM call on a stable Vosk partial, before end of speech
+SPECULATE = True
+SPECULATE_MIN_WORDS = 2
+
+# Prompt share of the recent conversation (older turns are summarized)
+HISTORY_BUDGET_TOKENS = 200
+
+
+# Session state (pending intents, WhatsApp two-step flow, history) survives restarts
+SESSION_SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "memory", "session.pkl")
+
+temp_memory = TemporaryMemory(snapshot_path=SESSION_SNAPSHOT_PATH)
+temp_memory.attach_external_state("whatsapp_state", whatsapp_state)
+
+
+def is_interrupt(text: str) -> bool:
+    """
+    The whole utterance is an interrupt command: "basta", "ok basta così",
+    "stop stop". Not "abbastanza" or "basta che mi dici il meteo".
+    """
+    words = normalize_utterance(text).split()
+    return (
+        any(word in interrupt_commands for word in words)
+        and all(word in interrupt_commands or word in INTERRUPT_FILLERS for word in words)
+    )
+
+
+def command_vocabulary() -> list[str]:
+    """Phrases for the command grammar recognizer in speech_to_text."""
+    phrases = list(interrupt_commands) + SCROLL_KEYWORDS_DOWN + SCROLL_KEYWORDS_UP
+    phrases += OPEN_WHATSAPP_COMMANDS + LIST_CONTACTS_COMMANDS + OPEN_CHAT_COMMANDS + SEND_MESSAGE_COMMANDS
+
+    for contact in CONTACTS:
+        # Bare names answer "a chi?" in the two-step WhatsApp flow
+        phrases += [
+            contact,
+            f"scrivi a {contact}",
+            f"apri chat con {contact}",
+            f"apri chat whatsapp con {contact}",
+            f"manda un messaggio a {contact}",
+            f"invia un messaggio a {contact}",
+            f"open chat with {contact}",
+            f"send a message to {contact}",
+        ]
+    return phrases
+
+
+def build_memory_for_prompt(pending_user_text: str = None) -> dict:
+    """
+    Relevant long-term facts + recent conversation + pending intent for the LLM prompt.
+    pending_user_text is a user line not yet in temp_memory (speculative calls),
+    so the prompt matches the one built after set_last_user_text.
+    """
+    query = pending_user_text or temp_memory.get_last_user_text()
+    memory_for_prompt = relevant_facts(query)
+
+    recent_history = temp_memory.get_context(HISTORY_BUDGET_TOKENS, pending_user_text=pending_user_text)
+    if recent_history:
+        memory_for_prompt["recent_conversation"] = recent_history
+
+    if temp_memory.has_pending_intent():
+        memory_for_prompt["_pending_intent"] = temp_memory.pending_intent
+        memory_for_prompt["_collected_params"] = str(temp_memory.get_parameters())
+
+    return memory_for_prompt
+
+
+# Intent → required parameter. With it present the action runs on its own.
+ACTION_INTENTS = {
+    "open_app": "app_name",
+    "weather_report": "city",
+    "search": "query",
+    "screen_action": "command",
+}
+
+# These actions speak for themselves: the LLM text is only logged
+SELF_SPEAKING_INTENTS = {"weather_report", "search", "screen_action"}
+
+
+def has_action(intent: str, parameters: dict) -> bool:
+    required = ACTION_INTENTS.get(intent)
+    return bool(required and (parameters or {}).get(required))
+
+
+async def run_intent(intent: str, parameters: dict, response: str | None, ui: JarvisUI):
+    """Run the action for an intent, or just say the reply."""
+    parameters = parameters or {}
+
+    if intent == "open_app" and has_action(intent, parameters):
+        await asyncio.to_thread(
+            open_app,
+            parameters=parameters,
+            response=response,
+            player=ui,
+            session_memory=temp_memory
+        )
+
+    elif intent == "weather_report" and has_action(intent, parameters):
+        await asyncio.to_thread(
+            weather_action,
+            parameters=parameters,
+            player=ui,
+            session_memory=temp_memory
+        )
+
+    elif intent == "search" and has_action(intent, parameters):
+        await asyncio.to_thread(
+            web_search,
+            parameters=parameters,
+            player=ui,
+            session_memory=temp_memory,
+            api_key=os.getenv("SERPAPI_API_KEY")
+        )
+
+    elif intent == "screen_action" and has_action(intent, parameters):
+        await asyncio.to_thread(
+            screen_action,
+            parameters=parameters,
+            player=ui,
+            session_memory=temp_memory
+        )
+
+    elif response:
+        ui.write_log(f"AI: {response}")
+        await asyncio.to_thread(edge_speak, response, ui)
+
+
+class StreamedTurn:
+    """
+    Consumes the streaming callbacks of get_llm_output for one turn.
+
+    - the intent, known early, decides whether the reply text is spoken
+    - reply sentences are spoken while the rest is still generating, as one
+      streamed utterance (the next sentence synthesizes while the current
+      one plays), with the TTS backend routed for the first one
+    - the action starts from on_intent when the call is settled (no other
+      model racing); otherwise, or if the final reply differs (the streaming
+      model failed after its intent), it runs in finish()
+    Callbacks arrive on the LLM worker thread.
+    """
+
+    def __init__(self, ui: JarvisUI, loop: asyncio.AbstractEventLoop):
+        self.ui = ui
+        self.loop = loop
+        self.speak_text = None          # None = not decided yet
+        self.spoken_any = False
+        self._held = []                 # sentences received before the intent
+        self._lock = threading.Lock()
+        self._stream = None             # SpeechStream of the reply being spoken
+        self._backend = None            # one voice for the whole reply
+        self._action = None             # (intent, parameters, future) started early
+
+    def on_intent(self, intent: str, parameters: dict, settled: bool = False):
+        self.ui.stop_thinking()
+        self.speak_text = not (intent in SELF_SPEAKING_INTENTS and has_action(intent, parameters))
+        if settled and self._action is None and has_action(intent, parameters):
+            future = asyncio.run_coroutine_threadsafe(
+                run_intent(intent, parameters, None, self.ui), self.loop
+            )
+            self._action = (intent, parameters, future)
+        for sentence in self._held:
+            self._queue_sentence(sentence)
+        self._held = []
+
+    def on_sentence(self, sentence: str):
+        if self.speak_text is None:
+            self._held.append(sentence)
+        elif self.speak_text:
+            self._queue_sentence(sentence)
+
+    def on_discard(self):
+        """The streaming model failed: forget its reply and cut off what is being said."""
+        with self._lock:
+            self.speak_text = None
+            self.spoken_any = False
+            self._held = []
+            self._backend = None
+            stream, self._stream = self._stream, None
+        if stream is None:
+            return
+        speech_worker.cancel(stream.future)
+        try:
+            stream.future.result(timeout=1.0)
+        except (CancelledError, Exception):
+            pass    # cancelled while queued, or reported by the worker
+        # Cut off by on_discard, not by the user
+        stop_speaking_flag.clear()
+
+    def _queue_sentence(self, sentence: str):
+        with self._lock:
+            self.spoken_any = True
+            if self._stream is None:
+                if stop_speaking_flag.is_set():
+                    return      # the user stopped the speech
+                if self._backend is None:
+                    self._backend = route(sentence)
+                self._stream = speak_stream(self.ui, backend=self._backend)
+            self._stream.add(sentence)
+
+    async def finish(self, llm_output: dict | None):
+        """Run the action of the final reply, then wait for the speech."""
+        if llm_output:
+            intent = llm_output.get("intent", "chat")
+            parameters = llm_output.get("parameters", {})
+            response = llm_output.get("text")
+
+            if self.spoken_any:
+                self.ui.write_log(f"AI: {response}")
+                response = None
+
+            started = self._action
+            if started is not None:
+                await asyncio.wrap_future(started[2])
+            if started is None or started[:2] != (intent, parameters):
+                await run_intent(intent, parameters, response, self.ui)
+
+        with self._lock:
+            stream = self._stream
+        if stream is not None:
+            stream.close()
+            # Played, stopped or failed (reported by the worker): never raises
+            await asyncio.to_thread(wait_futures, [stream.future])
+
+
+class _CallbackRelay:
+    """
+    Streaming callbacks of a speculative call. They are buffered until the
+    turn that uses the result attaches, then replayed and forwarded.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = []
+        self._turn = None
+
+    def on_intent(self, intent: str, parameters: dict, settled: bool = False):
+        self._dispatch("on_intent", intent, parameters, settled)
+
+    def on_sentence(self, sentence: str):
+        self._dispatch("on_sentence", sentence)
+
+    def on_discard(self):
+        self._dispatch("on_discard")
+
+    def _dispatch(self, name: str, *args):
+        with self._lock:
+            if self._turn is None:
+                self._events.append((name, args))
+                return
+            turn = self._turn
+        getattr(turn, name)(*args)
+
+    def attach(self, turn: StreamedTurn):
+        with self._lock:
+            # Replay under the lock so later events keep their order
+            for name, args in self._events:
+                getattr(turn, name)(*args)
+            self._events = []
+            self._turn = turn
+
+
+class Speculation:
+    """
+    Speculative LLM calls on stable partial transcripts.
+
+    start() is called from the recognizer thread with a partial that stopped
+    changing; take() is called with the final transcript and returns the
+    in-flight call when the texts match, cancelling it otherwise.
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="speculate")
+        self._lock = threading.Lock()
+        self._current = None    # dict(text, key, future, cancel, relay, started, finished)
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def start(self, partial: str):
+        key = normalize_utterance(partial)
+        if len(key.split()) < SPECULATE_MIN_WORDS:
+            return
+        # Multi-step flows and local commands never reach the normal LLM call
+        if temp_memory.has_pending_intent() or temp_memory.get_current_question():
+            return
+        if is_interrupt(partial):
+            return
+        if classify_local(partial) is not None:
+            return
+
+        with self._lock:
+            if self._current and self._current["key"] == key:
+                return
+            self._cancel_locked()
+
+            spec = {
+                "text": partial,
+                "key": key,
+                "cancel": threading.Event(),
+                "relay": _CallbackRelay(),
+                "started": time.perf_counter(),
+                "finished": None,
+            }
+            spec["future"] = self._executor.submit(self._run, spec)
+            self._current = spec
+            self.started += 1
+        print(f"🔮 Speculating on: {partial}")
+
+    def _run(self, spec: dict) -> dict:
+        try:
+            return get_llm_output(
+                user_text=spec["text"],
+                memory_block=build_memory_for_prompt(pending_user_text=spec["text"]),
+                on_intent=spec["relay"].on_intent,
+                on_sentence=spec["relay"].on_sentence,
+                on_discard=spec["relay"].on_discard,
+                cancel_event=spec["cancel"]
+            )
+        finally:
+            spec["finished"] = time.perf_counter()
+
+    def take(self, final_text: str):
+        """(future, relay) of a matching speculative call, or None."""
+        with self._lock:
+            spec, self._current = self._current, None
+        if spec is None:
+            return None
+
+        if spec["key"] != normalize_utterance(final_text) or spec["cancel"].is_set():
+            spec["cancel"].set()
+            self.misses += 1
+            self._report("miss")
+            return None
+
+        now = time.perf_counter()
+        # LLM time already spent when the final transcript arrived
+        self.saved_seconds += min(spec["finished"] or now, now) - spec["started"]
+        self.hits += 1
+        self._report("hit")
+        return spec["future"], spec["relay"]
+
+    def discard(self):
+        """Cancel whatever is in flight (the turn will not call the LLM)."""
+        with self._lock:
+            self._cancel_locked()
+
+    def _cancel_locked(self):
+        if self._current is not None:
+            self._current["cancel"].set()
+            self._current = None
+
+    def stats(self) -> dict:
+        decided = self.hits + self.misses
+        return {
+            "started": self.started,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / decided, 3) if decided else 0.0,
+            "saved_seconds": round(self.saved_seconds, 2),
+            "saved_per_turn": round(self.saved_seconds / decided, 2) if decided else 0.0,
+        }
+
+    def _report(self, outcome: str):
+        stats = self.stats()
+        print(f"🔮 Speculation {outcome} ({stats['hits']}/{stats['hits'] + stats['misses']} hits, "
+              f"{stats['saved_per_turn']}s saved per turn)")
+
+
+speculation = Speculation()
 
 
 async def get_voice_input():
+    if SPECULATE:
+        return await asyncio.to_thread(record_voice, on_stable_partial=speculation.start)
     return await asyncio.to_thread(record_voice)
 
 
@@ -36,22 +427,26 @@ async def ai_loop(ui: JarvisUI):
     
     while True:
         stop_listening_flag.clear()
-        from tts import stop_speaking_flag
         stop_speaking_flag.clear()  # Reset TTS flag for new cycle
         
         user_text = await get_voice_input()
 
         if not user_text:
+            speculation.discard()
             continue
 
 
-        if any(cmd in user_text.lower() for cmd in interrupt_commands):
+        if is_interrupt(user_text):
+            speculation.discard()
             stop_speaking()
             temp_memory.reset()
             continue
 
         # Check for WhatsApp commands (direct handling, bypasses LLM)
         if handle_whatsapp_command(user_text, ui, temp_memory):
+            speculation.discard()
+            # whatsapp_state may have changed outside temp_memory
+            temp_memory.save_snapshot()
             continue
 
         ui.write_log(f"You: {user_text}")
@@ -69,132 +464,71 @@ async def ai_loop(ui: JarvisUI):
         
         temp_memory.set_last_user_text(user_text)
 
-        long_term_memory = load_memory()
-
-        def minimal_memory_for_prompt(memory: dict) -> dict:
-            result = {}
-            identity = memory.get("identity", {})
-            preferences = memory.get("preferences", {})
-            relationships = memory.get("relationships", {})
-            emotional_state = memory.get("emotional_state", {})
-
-            if "name" in identity:
-                result["user_name"] = identity["name"].get("value")
-
-            for k in ["favorite_color", "favorite_food", "favorite_music"]:
-                if k in preferences:
-                    val = preferences[k].get("value")
-                    if isinstance(val, dict) and "value" in val:
-                        val = val["value"]
-                    result[k] = val
-
-            for rel, info in relationships.items():
-                if isinstance(info, dict) and "name" in info and "value" in info["name"]:
-                    result[f"{rel}_name"] = info["name"]["value"]
+        # Obvious commands skip the LLM (not while a multi-step flow is open)
+        llm_output = None
+        if not temp_memory.has_pending_intent():
+            llm_output = classify_local(user_text)
 
-            for event, info in emotional_state.items():
-                if "value" in info:
-                    result[f"emotion_{event}"] = info["value"]
+        turn = StreamedTurn(ui, asyncio.get_running_loop())
 
-            return {k: v for k, v in result.items() if v}
-
-        memory_for_prompt = minimal_memory_for_prompt(long_term_memory)
-        
-        history_lines = temp_memory.get_history_for_prompt()
-        recent_history = "\n".join(history_lines.split("\n")[-5:])
-        if recent_history:
-            memory_for_prompt["recent_conversation"] = recent_history
+        if llm_output is not None:
+            speculation.discard()
+            print(f"⚡ Local intent: {llm_output['intent']} {llm_output['parameters']}")
+            ui.stop_thinking()
+            temp_memory.set_last_ai_response(llm_output.get("text"))
+            await turn.finish(llm_output)
+            await asyncio.sleep(0.01)
+            continue
 
-        if temp_memory.has_pending_intent():
-            memory_for_prompt["_pending_intent"] = temp_memory.pending_intent
-            memory_for_prompt["_collected_params"] = str(temp_memory.get_parameters())
+        speculative = speculation.take(user_text)
 
         try:
-            llm_output = get_llm_output(
-                user_text=user_text, 
-                memory_block=memory_for_prompt
-            )
+            if speculative is not None:
+                # Already in flight since the partial transcript
+                future, relay = speculative
+                relay.attach(turn)
+                llm_output = await asyncio.wrap_future(future)
+            else:
+                llm_output = await asyncio.to_thread(
+                    get_llm_output,
+                    user_text=user_text,
+                    memory_block=build_memory_for_prompt(),
+                    on_intent=turn.on_intent,
+                    on_sentence=turn.on_sentence,
+                    on_discard=turn.on_discard
+                )
         except Exception as e:
             ui.stop_thinking()  # Stop thinking animation on error
             ui.write_log(f"AI ERROR: {e}")
+            await turn.finish(None)
             continue
 
         ui.stop_thinking()  # Stop thinking animation when LLM responds
 
-        intent = llm_output.get("intent", "chat")
-        parameters = llm_output.get("parameters", {})
-        response = llm_output.get("text")
         memory_update = llm_output.get("memory_update")
 
         if memory_update and isinstance(memory_update, dict):
             update_memory(memory_update)
 
-        temp_memory.set_last_ai_response(response)
-
-        if intent == "open_app":
-            app_name = parameters.get("app_name")
-            if app_name:
-                await asyncio.to_thread(
-                    open_app,
-                    parameters=parameters,
-                    response=response,
-                    player=ui,
-                    session_memory=temp_memory
-                )
-            elif response:
-                ui.write_log(f"AI: {response}")
-                edge_speak(response, ui)
-
-        elif intent == "weather_report":
-            city = parameters.get("city")
-            time = parameters.get("time")
-            if city:
-                await asyncio.to_thread(
-                    weather_action,
-                    parameters=parameters,
-                    player=ui,
-                    session_memory=temp_memory
-                )
-            elif response:
-                ui.write_log(f"AI: {response}")
-                edge_speak(response, ui)
-
-        elif intent == "search":
-            query = parameters.get("query")
-            if query:
-                await asyncio.to_thread(
-                    web_search,
-                    parameters=parameters,
-                    player=ui,
-                    session_memory=temp_memory,
-                    api_key=os.getenv("SERPAPI_API_KEY")
-                )
-            elif response:
-                ui.write_log(f"AI: {response}")
-                edge_speak(response, ui)
-
-        elif intent == "screen_action":
-            command = parameters.get("command")
-            if command:
-                await asyncio.to_thread(
-                    screen_action,
-                    parameters=parameters,
-                    player=ui,
-                    session_memory=temp_memory
-                )
-            elif response:
-                ui.write_log(f"AI: {response}")
-                edge_speak(response, ui)
+        temp_memory.set_last_ai_response(llm_output.get("text"))
 
-        else:
-            if response:
-                ui.write_log(f"AI: {response}")
-                edge_speak(response, ui)
+        await turn.finish(llm_output)
 
         await asyncio.sleep(0.01)
 
 
 def main():
+    # Resume an interrupted multi-step flow where it was left
+    temp_memory.restore_snapshot()
+    # Open the OpenRouter connection while the UI is being built
+    http_client.warm_up_async(OPENROUTER_URL)
+    set_command_vocabulary(command_vocabulary())
+    prewarm_tts(PREWARM_PHRASES)
+    if OCR_PREWARM:
+        ocr_service.prewarm()
+    # Full duplex: talking over Kira (or "stop"/"basta") cuts the reply short
+    BargeInMonitor(playback_reference, on_barge_in=stop_speaking).start()
+
     base_dir = os.path.dirname(os.path.abspath(__file__))
     face_path = os.path.join(base_dir, "face.png")
     ui = JarvisUI(face_path, size=(900, 900))
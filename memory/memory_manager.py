@@ -1,14 +1,43 @@
 # memory/memory_manager.py
+import atexit
+import copy
 import json
 import os
+import sqlite3
+import threading
+import time
 from threading import Lock
 from datetime import datetime
 
+from memory.sqlite_store import SqliteMemoryStore, flatten
+
 # Calculate absolute path to memory.json in the same directory as this script
 current_dir = os.path.dirname(os.path.abspath(__file__))
 MEMORY_PATH = os.path.join(current_dir, "memory.json")
 _lock = Lock()
 
+# "json" keeps everything in memory.json; "sqlite" stores one row per entry in
+# memory.db (see sqlite_store.py), migrating memory.json on first use.
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "json").lower()
+DB_PATH = os.path.join(current_dir, "memory.db")
+
+# Memory is loaded once and served from RAM. A cheap stat (at most every
+# STAT_INTERVAL seconds) picks up external edits; changes are written back
+# FLUSH_DELAY seconds after the last update, atomically (temp file + rename,
+# or one SQLite transaction carrying only the changed entries).
+STAT_INTERVAL = 1.0
+FLUSH_DELAY = 1.0
+
+_cache = None             # the parsed memory, owned by this module
+_file_signature = None    # (mtime_ns, size) of memory.json when _cache was loaded/written
+_last_stat = 0.0
+_dirty = False
+_flush_timer = None
+_pending = []             # sqlite: updates not yet written
+_replace = False          # sqlite: save_memory replaced the whole memory
+_store = None
+_listeners = []
+
 
 def _empty_memory() -> dict:
     """Return an empty memory structure."""
@@ -20,32 +49,162 @@ def _empty_memory() -> dict:
     }
 
 
-def load_memory() -> dict:
-    """Load memory from disk, return empty if not exists or invalid."""
-    if not os.path.exists(MEMORY_PATH):
-        return _empty_memory()
+def add_change_listener(listener) -> None:
+    """
+    Call listener(memory, changes) whenever the memory changes.
+    changes is a list of (path, entry) leaves as produced by
+    sqlite_store.flatten, or None when the whole memory was replaced or
+    reloaded. Listeners run with the memory lock held: they must not call
+    back into this module and must not keep `memory` (it is the live cache).
+    """
+    _listeners.append(listener)
+
+
+def _notify(changes):
+    for listener in _listeners:
+        try:
+            listener(_cache, changes)
+        except Exception as e:
+            print(f"⚠️ Memory listener error: {e}")
+
+
+def _get_store():
+    global _store
+    if _store is None:
+        _store = SqliteMemoryStore(DB_PATH)
+        _store.migrate_from_json(MEMORY_PATH)
+    return _store
+
+
+def _signature():
+    if MEMORY_BACKEND == "sqlite":
+        return _get_store().data_version()
+    try:
+        stat = os.stat(MEMORY_PATH)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+def _read_file() -> dict:
+    if MEMORY_BACKEND == "sqlite":
+        data = _get_store().load()
+        return {**_empty_memory(), **data}
+    try:
+        with open(MEMORY_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+            if isinstance(data, dict):
+                return data
+    except Exception:
+        pass
+    return _empty_memory()
+
+
+def _current() -> dict:
+    """The cached memory, reloaded if memory.json changed on disk. Call with _lock held."""
+    global _cache, _file_signature, _last_stat
+
+    now = time.monotonic()
+    if _cache is not None and (_dirty or now - _last_stat < STAT_INTERVAL):
+        return _cache
+
+    _last_stat = now
+    signature = _signature()
+    if _cache is None or signature != _file_signature:
+        _cache = _read_file() if signature is not None else _empty_memory()
+        _file_signature = signature
+        _notify(None)
+    return _cache
+
+
+def check_for_changes() -> None:
+    """Reload if the file changed on disk (listeners are notified); no copy is made."""
+    with _lock:
+        _current()
+
 
+def load_memory(category: str | None = None) -> dict:
+    """
+    Memory from RAM (a copy, safe to modify); reloaded only when the file
+    changed. With a category only that subtree is copied ({} if missing).
+    """
     with _lock:
+        memory = _current()
+        if category is not None:
+            return copy.deepcopy(memory.get(category, {}))
+        return copy.deepcopy(memory)
+
+
+def _write_file(memory: dict):
+    """Atomic write: a crash leaves either the old or the new file, never a truncated one."""
+    global _file_signature
+    os.makedirs(os.path.dirname(MEMORY_PATH), exist_ok=True)
+    tmp_path = MEMORY_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(memory, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, MEMORY_PATH)
+    _file_signature = _signature()
+
+
+def _write_store():
+    global _replace
+    store = _get_store()
+    if _replace:
+        store.replace_all(_cache)
+        _replace = False
+    else:
+        for update in _pending:
+            store.upsert(update)
+    _pending.clear()
+
+
+def flush_memory() -> None:
+    """Write pending changes now (also runs at exit)."""
+    global _dirty, _flush_timer
+    with _lock:
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+            _flush_timer = None
+        if not _dirty:
+            return
         try:
-            with open(MEMORY_PATH, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                if isinstance(data, dict):
-                    return data
-                return _empty_memory()
-        except Exception:
-            return _empty_memory()
+            if MEMORY_BACKEND == "sqlite":
+                _write_store()
+            else:
+                _write_file(_cache)
+            _dirty = False
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️ Memory save failed: {e}")
+
+
+def _schedule_flush():
+    """Debounce: one write FLUSH_DELAY after the last change. Call with _lock held."""
+    global _dirty, _flush_timer
+    _dirty = True
+    if _flush_timer is not None:
+        _flush_timer.cancel()
+    _flush_timer = threading.Timer(FLUSH_DELAY, flush_memory)
+    _flush_timer.daemon = True
+    _flush_timer.start()
+
+
+atexit.register(flush_memory)
 
 
 def save_memory(memory: dict) -> None:
-    """Save memory to disk safely."""
+    """Replace the memory; written to disk shortly after (see FLUSH_DELAY)."""
+    global _cache, _replace
     if not isinstance(memory, dict):
         return
 
-    os.makedirs(os.path.dirname(MEMORY_PATH), exist_ok=True)
-
     with _lock:
-        with open(MEMORY_PATH, "w", encoding="utf-8") as f:
-            json.dump(memory, f, indent=2, ensure_ascii=False)
+        _cache = copy.deepcopy(memory)
+        _replace = True
+        _pending.clear()
+        _schedule_flush()
+        _notify(None)
 
 
 def _recursive_update(target: dict, updates: dict) -> bool:
@@ -73,13 +232,21 @@ def _recursive_update(target: dict, updates: dict) -> bool:
     return changed
 
 
-def update_memory(memory_update: dict) -> dict:
-    """Merge LLM memory update into global memory and save."""
+def update_memory(memory_update: dict) -> bool:
+    """
+    Merge LLM memory update into global memory and save. Returns True if
+    anything changed; the cost does not grow with the memory (no copy of
+    it is made, use load_memory() to read it).
+    """
     if not isinstance(memory_update, dict):
-        return load_memory()
+        return False
 
-    memory = load_memory()
-    if _recursive_update(memory, memory_update):
-        save_memory(memory)
-
-    return memory
+    with _lock:
+        memory = _current()
+        if not _recursive_update(memory, memory_update):
+            return False
+        if not _replace:
+            _pending.append(copy.deepcopy(memory_update))
+        _schedule_flush()
+        _notify(flatten(memory_update))
+        return True
@@ -0,0 +1,240 @@
+# memory/retrieval.py
+"""
+Relevance-ranked long-term memory for the LLM prompt.
+
+Every memory entry ("relationships/partner_name" -> {"value": "Diana"}) is
+a small BM25 document made of its path words and its value. For each
+utterance the best-scoring entries are put in the prompt, pinned ones
+first, until FACTS_BUDGET_TOKENS is used up. The index follows
+memory_manager through a change listener, so an update re-tokenizes only
+the entries it touched.
+"""
+
+import heapq
+import math
+import re
+import threading
+
+from memory import memory_manager
+from memory.sqlite_store import SEPARATOR, flatten
+from memory.tokens import estimate_tokens
+
+FACTS_TOP_K = 8
+FACTS_BUDGET_TOKENS = 120
+# Always in the prompt when present (who the user is). Not "identity/name":
+# in this memory it holds the assistant's name, not the user's
+PINNED_PATHS = ["user_name"]
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Light stemming: an English plural "s", then one of STEM_ENDINGS or a final
+# vowel, so "preferito"/"preferita" -> "preferit" and "colori"/"color" ->
+# "color", while "preferenze"/"preference" stay apart from them
+STEM_ENDINGS = ("ando", "endo", "are", "ere", "ire", "ing")
+STEM_VOWELS = "aeiouàèéìòù"
+MIN_STEM = 3
+# Terms in more than this share of the entries (e.g. a category name) score
+# ~0 anyway; skipping them keeps queries off the longest postings lists
+MAX_DF_FRACTION = 0.5
+
+# Memory keys are written by the LLM in English while the user speaks
+# Italian: query words are expanded with the key vocabulary they mean
+QUERY_EXPANSIONS = {
+    "nome": "name", "chiamo": "name", "chiama": "name", "chiamano": "name",
+    "ragazza": "partner girlfriend", "ragazzo": "partner boyfriend",
+    "fidanzata": "partner girlfriend", "fidanzato": "partner boyfriend",
+    "moglie": "partner wife", "marito": "partner husband",
+    "sorella": "sister", "fratello": "brother", "mamma": "mother", "madre": "mother",
+    "papà": "father", "padre": "father", "figlio": "son child", "figlia": "daughter child",
+    "amico": "friend", "amica": "friend", "cane": "dog pet", "gatto": "cat pet",
+    "cibo": "food", "mangiare": "food", "piatto": "food dish", "musica": "music",
+    "canzone": "music song", "colore": "color", "film": "movie", "libro": "book",
+    "sport": "sport", "squadra": "team", "lavoro": "job work",
+    "città": "city", "vivo": "city home", "abito": "city home", "casa": "home",
+    "compleanno": "birthday", "anni": "age", "età": "age",
+    "sento": "mood emotion", "umore": "mood emotion", "triste": "mood sad",
+    "felice": "mood happy", "stanco": "mood tired", "lingua": "language",
+    "preferito": "favorite", "preferita": "favorite", "piace": "favorite like",
+}
+
+STOPWORDS = {
+    # Italian
+    "il", "lo", "la", "i", "gli", "le", "un", "uno", "una", "di", "a", "da", "in", "con",
+    "su", "per", "tra", "fra", "e", "o", "ma", "che", "chi", "cosa", "come", "del", "della",
+    "dei", "delle", "al", "alla", "nel", "nella", "mi", "ti", "si", "ci", "vi", "mio", "mia",
+    "tuo", "tua", "è", "sono", "ho", "hai", "ha", "qual", "quale", "non", "sai", "ricordi",
+    # English
+    "the", "an", "of", "to", "and", "or", "is", "are", "was", "my", "your", "me", "you", "what",
+    "who", "do", "does", "did", "know", "remember", "value",
+}
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def stem(word: str) -> str:
+    if len(word) > MIN_STEM and word.endswith("s") and not word.endswith("ss"):
+        word = word[:-1]
+    for ending in STEM_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) > MIN_STEM:
+            return word[:-len(ending)]
+    if len(word) > MIN_STEM and word[-1] in STEM_VOWELS:
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word stems without stopwords; snake_case keys split into words."""
+    words = _WORD.findall(str(text).lower().replace("_", " "))
+    return [stem(w) for w in words if w not in STOPWORDS]
+
+
+def query_terms(text: str) -> set[str]:
+    """Tokens of an utterance plus the memory-key words they stand for."""
+    words = _WORD.findall(str(text).lower())
+    expanded = " ".join(QUERY_EXPANSIONS.get(w, "") for w in words)
+    return set(tokenize(text)) | set(tokenize(expanded))
+
+
+def _label(path: str) -> str:
+    return path.replace(SEPARATOR, ".")
+
+
+def _value_text(entry) -> str:
+    value = entry.get("value") if isinstance(entry, dict) else entry
+    if isinstance(value, dict) and "value" in value:
+        value = value["value"]
+    return str(value)
+
+
+class MemoryIndex:
+    """Incremental BM25 index over memory entries."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._docs = {}        # path -> (terms, length, value text)
+        self._postings = {}    # term -> {path: term frequency}
+        self._under = {}       # category path -> set of entry paths below it
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    @staticmethod
+    def _parents(path: str) -> list[str]:
+        parts = path.split(SEPARATOR)
+        return [SEPARATOR.join(parts[:i]) for i in range(1, len(parts))]
+
+    def _remove(self, path: str):
+        doc = self._docs.pop(path, None)
+        if doc is None:
+            return
+        terms, length, _ = doc
+        self._total_length -= length
+        for term in terms:
+            posting = self._postings[term]
+            del posting[path]
+            if not posting:
+                del self._postings[term]
+        for parent in self._parents(path):
+            below = self._under[parent]
+            below.discard(path)
+            if not below:
+                del self._under[parent]
+
+    def _set(self, path: str, entry):
+        # Same tree rules as the stores: a leaf replaces the entries below it
+        for child in list(self._under.get(path, ())):
+            self._remove(child)
+        self._remove(path)
+
+        text = _value_text(entry)
+        terms = tokenize(path) + tokenize(text)
+        tf = {}
+        for term in terms:
+            tf[term] = tf.get(term, 0) + 1
+        for term, f in tf.items():
+            self._postings.setdefault(term, {})[path] = f
+        for parent in self._parents(path):
+            self._under.setdefault(parent, set()).add(path)
+        self._docs[path] = (tuple(tf), len(terms), text)
+        self._total_length += len(terms)
+
+    def rebuild(self, memory: dict):
+        with self._lock:
+            self._docs.clear()
+            self._postings.clear()
+            self._under.clear()
+            self._total_length = 0
+            for path, entry in flatten(memory):
+                self._set(path, entry)
+
+    def on_memory_change(self, memory: dict, changes):
+        """memory_manager change listener."""
+        if changes is None:
+            self.rebuild(memory)
+            return
+        with self._lock:
+            for path, entry in changes:
+                self._set(path, entry)
+
+    def search(self, query: str, k: int = FACTS_TOP_K) -> list[tuple[str, str, float]]:
+        """Top-k (path, value, score) for the query, best first; only entries sharing a term."""
+        terms = query_terms(query)
+        with self._lock:
+            if not terms or not self._docs:
+                return []
+            n = len(self._docs)
+            avg_length = self._total_length / n
+            scores = {}
+            for term in terms:
+                posting = self._postings.get(term)
+                if not posting or len(posting) > MAX_DF_FRACTION * n:
+                    continue
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for path, f in posting.items():
+                    length = self._docs[path][1]
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                    scores[path] = scores.get(path, 0.0) + idf * f * (BM25_K1 + 1) / (f + norm)
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [(path, self._docs[path][2], score) for path, score in best]
+
+    def select(self, query: str, budget_tokens: int = FACTS_BUDGET_TOKENS,
+               k: int = FACTS_TOP_K) -> dict:
+        """{label: value} for the prompt: pinned entries, then the top-k, within the budget."""
+        with self._lock:
+            pinned = [(path, self._docs[path][2]) for path in PINNED_PATHS if path in self._docs]
+        ranked = [(path, text) for path, text, _ in self.search(query, k)]
+
+        facts = {}
+        used = 0
+        for path, text in pinned + ranked:
+            label = _label(path)
+            if label in facts or not text:
+                continue
+            cost = estimate_tokens(f"{label}: {text}")
+            if used + cost > budget_tokens:
+                continue
+            facts[label] = text
+            used += cost
+        return facts
+
+
+memory_index = MemoryIndex()
+_attached = False
+_attach_lock = threading.Lock()
+
+
+def _ensure_attached():
+    global _attached
+    with _attach_lock:
+        if not _attached:
+            memory_manager.add_change_listener(memory_index.on_memory_change)
+            memory_index.rebuild(memory_manager.load_memory())
+            _attached = True
+
+
+def relevant_facts(query: str, budget_tokens: int = FACTS_BUDGET_TOKENS, k: int = FACTS_TOP_K) -> dict:
+    """Long-term memory facts worth sending to the LLM for this utterance."""
+    _ensure_attached()
+    memory_manager.check_for_changes()
+    return memory_index.select(query or "", budget_tokens, k)
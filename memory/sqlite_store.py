@@ -0,0 +1,198 @@
+# memory/sqlite_store.py
+"""
+SQLite storage for long-term memory (enabled with MEMORY_BACKEND=sqlite).
+
+Every leaf of the memory tree (an entry like {"value": ...}) is one row keyed
+by its path, e.g. "relationships/partner_name", so an update touches only the
+rows it changes instead of rewriting the whole document. Rows carry the
+top-level category (indexed) and the time they were last written. The
+database runs in WAL mode: readers never block the writer.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+SEPARATOR = "/"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    path       TEXT PRIMARY KEY,
+    category   TEXT NOT NULL,
+    value      TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_category ON entries(category);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def flatten(updates: dict, prefix: str = "") -> list[tuple[str, dict]]:
+    """
+    (path, entry) pairs for the leaves of an update, with the same rules as
+    memory_manager._recursive_update: empty values are skipped, dicts without
+    "value" are categories, anything else becomes {"value": ...}.
+    """
+    leaves = []
+    for key, value in updates.items():
+        if value is None or (isinstance(value, str) and not value.strip()):
+            continue
+        path = f"{prefix}{key}"
+        if isinstance(value, dict) and "value" not in value:
+            leaves.extend(flatten(value, path + SEPARATOR))
+        else:
+            entry = value if isinstance(value, dict) and "value" in value else {"value": value}
+            leaves.append((path, entry))
+    return leaves
+
+
+class SqliteMemoryStore:
+    """Key-path table of memory entries with incremental upserts."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def data_version(self) -> int:
+        """Changes whenever another connection commits (cheap, no table access)."""
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def _upsert_leaf(self, path: str, entry: dict, now: str) -> bool:
+        parts = path.split(SEPARATOR)
+        before = self._conn.total_changes
+
+        # As in memory_manager._recursive_update: a leaf replaces whatever was
+        # below it, while a leaf at a parent path stays and gets it nested in.
+        # Children of path: the primary-key range [path + "/", path + "0")
+        self._conn.execute(
+            "DELETE FROM entries WHERE path >= ? AND path < ?",
+            (path + SEPARATOR, path + chr(ord(SEPARATOR) + 1))
+        )
+        self._conn.execute(
+            """
+            INSERT INTO entries (path, category, value, updated_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+            WHERE entries.value != excluded.value
+            """,
+            (path, parts[0], json.dumps(entry, ensure_ascii=False, sort_keys=True), now)
+        )
+        return self._conn.total_changes != before
+
+    def upsert(self, updates: dict) -> bool:
+        """Apply a memory update in one transaction. Returns True if anything changed."""
+        leaves = flatten(updates)
+        if not leaves:
+            return False
+
+        now = datetime.utcnow().isoformat() + "Z"
+        changed = False
+        with self._lock, self._conn:
+            for path, entry in leaves:
+                if self._upsert_leaf(path, entry, now):
+                    changed = True
+        return changed
+
+    def replace_all(self, memory: dict):
+        """Make the table hold exactly `memory`."""
+        now = datetime.utcnow().isoformat() + "Z"
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM entries")
+            for path, entry in flatten(memory):
+                self._upsert_leaf(path, entry, now)
+
+    def get(self, path: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entries WHERE path = ?", (path,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _build(self, rows, strip: int = 0) -> dict:
+        # Rows come sorted by path, so a leaf is built before the entries nested in it
+        tree = {}
+        for path, value in rows:
+            parts = path.split(SEPARATOR)[strip:]
+            entry = json.loads(value)
+            if not parts:
+                tree.update(entry)      # the stripped category is itself a leaf
+                continue
+            node = tree
+            for part in parts[:-1]:
+                child = node.get(part)
+                if not isinstance(child, dict):
+                    child = node[part] = {}
+                node = child
+            node[parts[-1]] = entry
+        return tree
+
+    def category(self, name: str) -> dict:
+        """One top-level category as a nested dict (indexed lookup)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, value FROM entries WHERE category = ? ORDER BY path", (name,)
+            ).fetchall()
+        # A top-level leaf (e.g. "user_name") is its own category
+        if len(rows) == 1 and rows[0][0] == name:
+            return json.loads(rows[0][1])
+        return self._build(rows, strip=1)
+
+    def updated_since(self, timestamp: str) -> list[tuple[str, dict, str]]:
+        """(path, entry, updated_at) of rows written after an ISO timestamp."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, value, updated_at FROM entries WHERE updated_at > ? ORDER BY updated_at",
+                (timestamp,)
+            ).fetchall()
+        return [(path, json.loads(value), updated_at) for path, value, updated_at in rows]
+
+    def load(self) -> dict:
+        """The whole memory as the nested dict memory.json would hold."""
+        with self._lock:
+            rows = self._conn.execute("SELECT path, value FROM entries ORDER BY path").fetchall()
+        return self._build(rows)
+
+    def migrate_from_json(self, json_path: str) -> int:
+        """
+        Import memory.json into an empty store (once). The JSON file is left
+        in place as a backup. Returns the number of entries imported.
+        """
+        with self._lock:
+            done = self._conn.execute("SELECT value FROM meta WHERE key = 'migrated_from'").fetchone()
+            empty = self._conn.execute("SELECT 1 FROM entries LIMIT 1").fetchone() is None
+        if done or not empty or not os.path.exists(json_path):
+            return 0
+
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Memory migration skipped: {e}")
+            return 0
+        if not isinstance(data, dict):
+            return 0
+
+        self.replace_all(data)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from', ?)", (json_path,)
+            )
+        count = self.count()
+        print(f"🗄️ Migrated {count} memory entries from {os.path.basename(json_path)}")
+        return count
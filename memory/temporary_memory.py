@@ -1,11 +1,45 @@
 # memory/temporary_memory.py
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import deque
 from typing import Any
 
+from memory.tokens import CHARS_PER_TOKEN, estimate_tokens
+
+# Turns older than the recent window are kept only as short fragments
+SUMMARY_TURN_CHARS = 60
+SUMMARY_MAX_TURNS = 12
+SUMMARY_PREFIX = "Earlier: "
+
+# Session snapshots: written on every change, restored at startup unless stale
+SNAPSHOT_VERSION = 1
+SNAPSHOT_MAX_AGE = 3600  # seconds
+
+
+class HistoryEntry:
+    """One conversation turn, rendered once."""
+
+    __slots__ = ("role", "text", "line", "tokens", "short")
+
+    def __init__(self, role: str, text: str):
+        self.role = role
+        self.text = text
+        self.line = f"{role.capitalize()}: {text}"
+        self.tokens = estimate_tokens(self.line)
+        short = " ".join(str(text).split())
+        if len(short) > SUMMARY_TURN_CHARS:
+            short = short[:SUMMARY_TURN_CHARS - 1].rstrip() + "…"
+        self.short = f"{role.capitalize()}: {short}"
+
 
 class TemporaryMemory:
     """
     Temporary runtime memory (session-only).
-    Resets when program restarts.
+    With a snapshot_path it survives restarts: every change writes a
+    pickled snapshot, and restore_snapshot() brings it back at startup.
 
     Purpose:
       - Track multi-step intents
@@ -15,9 +49,23 @@ class TemporaryMemory:
           "why did he executed?"
     """
 
-    def __init__(self, max_history: int = 5):
+    # Session state, in snapshot order
+    SNAPSHOT_FIELDS = (
+        "pending_intent", "parameters", "current_question",
+        "last_user_text", "last_ai_response",
+        "last_search", "last_opened_app",
+        "waiting_for_whatsapp_contact", "waiting_for_whatsapp_message", "whatsapp_target_contact",
+        "conversation_history", "summary_fragments",
+    )
+    __slots__ = SNAPSHOT_FIELDS + ("max_history", "snapshot_path", "_external", "_history_text", "_snapshot_lock")
+
+    def __init__(self, max_history: int = 12, snapshot_path: str | None = None):
         self.max_history = max_history
+        self.snapshot_path = None
+        self._external: dict[str, dict] = {}
+        self._snapshot_lock = threading.Lock()
         self.reset()
+        self.snapshot_path = snapshot_path
 
 
     def reset(self):
@@ -38,16 +86,100 @@ class TemporaryMemory:
         self.whatsapp_target_contact: str | None = None
 
         # --- Conversation ---
-        self.conversation_history: list[dict[str, str]] = []
+        # Recent turns in full; evicted ones survive as summary fragments
+        self.conversation_history: deque[HistoryEntry] = deque(maxlen=self.max_history)
+        self.summary_fragments: deque[str] = deque(maxlen=SUMMARY_MAX_TURNS)
+        self._history_text: str | None = None
+
+        self._changed()
+
+    # --- Snapshots ---
+    def attach_external_state(self, name: str, state: dict):
+        """
+        Include a module-level state dict (e.g. whatsapp_action.whatsapp_state)
+        in snapshots; restore_snapshot() updates it in place. The owner calls
+        save_snapshot() after changing it.
+        """
+        self._external[name] = state
+
+    def _changed(self):
+        if self.snapshot_path:
+            self.save_snapshot()
+
+    def save_snapshot(self):
+        """
+        Write the session state atomically (a few hundred bytes, no fsync).
+        Callable from any thread: writers are serialized and each uses its own
+        temp file. A snapshot that fails (e.g. a deque changed by another
+        thread while being pickled) is skipped; the next change writes again.
+        """
+        if not self.snapshot_path:
+            return
+        tmp_path = None
+        with self._snapshot_lock:
+            try:
+                data = pickle.dumps((
+                    SNAPSHOT_VERSION,
+                    time.time(),
+                    tuple(getattr(self, field) for field in self.SNAPSHOT_FIELDS),
+                    {name: dict(state) for name, state in self._external.items()},
+                ), protocol=pickle.HIGHEST_PROTOCOL)
+                with tempfile.NamedTemporaryFile(
+                    dir=os.path.dirname(self.snapshot_path) or ".", prefix=".session-",
+                    suffix=".tmp", delete=False
+                ) as f:
+                    tmp_path = f.name
+                    f.write(data)
+                os.replace(tmp_path, self.snapshot_path)
+            except Exception as e:
+                print(f"⚠️ Session snapshot failed: {e}")
+                if tmp_path is not None and os.path.exists(tmp_path):
+                    try:
+                        os.remove(tmp_path)
+                    except OSError:
+                        pass
+
+    def restore_snapshot(self) -> bool:
+        """Load the last snapshot (if recent enough). Returns True if restored."""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+
+        start = time.perf_counter()
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                version, saved_at, values, external = pickle.load(f)
+        except Exception as e:
+            print(f"⚠️ Session snapshot unreadable: {e}")
+            return False
+
+        if version != SNAPSHOT_VERSION or time.time() - saved_at > SNAPSHOT_MAX_AGE:
+            return False
+
+        for field, value in zip(self.SNAPSHOT_FIELDS, values):
+            setattr(self, field, value)
+        if self.conversation_history.maxlen != self.max_history:
+            self.conversation_history = deque(self.conversation_history, maxlen=self.max_history)
+        self._history_text = None
+
+        for name, state in self._external.items():
+            if name in external:
+                state.clear()
+                state.update(external[name])
+
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"💾 Session restored in {elapsed:.1f} ms (pending intent: {self.pending_intent})")
+        return True
 
 
     def set_pending_intent(self, intent: str):
         self.pending_intent = intent
+        self._changed()
 
     def clear_pending_intent(self):
         self.pending_intent = None
         self.parameters = {}
         self.current_question = None
+        self._changed()
 
     def has_pending_intent(self) -> bool:
         return self.pending_intent is not None
@@ -59,6 +191,7 @@ class TemporaryMemory:
         for k, v in new_params.items():
             if v not in (None, ""):
                 self.parameters[k] = v
+        self._changed()
 
     def get_parameters(self) -> dict:
         return self.parameters.copy()
@@ -68,20 +201,24 @@ class TemporaryMemory:
 
     def set_current_question(self, param_name: str):
         self.current_question = param_name
+        self._changed()
 
     def get_current_question(self) -> str | None:
         return self.current_question
 
     def clear_current_question(self):
         self.current_question = None
+        self._changed()
 
     def set_last_user_text(self, text: str):
         self.last_user_text = text
         self._add_to_history("user", text)
+        self._changed()
 
     def set_last_ai_response(self, text: str):
         self.last_ai_response = text
         self._add_to_history("ai", text)
+        self._changed()
 
     def get_last_user_text(self):
         return self.last_user_text
@@ -95,12 +232,14 @@ class TemporaryMemory:
             "query": query,
             "answer": answer
         }
+        self._changed()
 
     def get_last_search(self):
         return self.last_search
 
     def set_open_app(self, app_name: str):
         self.last_opened_app = app_name
+        self._changed()
 
     def get_last_opened_app(self):
         return self.last_opened_app
@@ -110,6 +249,7 @@ class TemporaryMemory:
         self.waiting_for_whatsapp_contact = waiting
         if waiting:
             self.pending_intent = "send_whatsapp"
+        self._changed()
     
     def is_waiting_for_whatsapp_contact(self) -> bool:
         return self.waiting_for_whatsapp_contact
@@ -118,6 +258,7 @@ class TemporaryMemory:
         self.waiting_for_whatsapp_message = True
         self.whatsapp_target_contact = contact_name
         self.pending_intent = "send_whatsapp"
+        self._changed()
     
     def is_waiting_for_whatsapp_message(self) -> bool:
         return self.waiting_for_whatsapp_message
@@ -131,28 +272,64 @@ class TemporaryMemory:
         self.whatsapp_target_contact = None
         if self.pending_intent == "send_whatsapp":
             self.clear_pending_intent()
+        self._changed()
 
     def _add_to_history(self, role: str, text: str):
         if role not in ("user", "ai"):
             return
 
-        self.conversation_history.append({
-            "role": role,
-            "text": text
-        })
-
-        if len(self.conversation_history) > self.max_history:
-            self.conversation_history.pop(0)
+        if len(self.conversation_history) == self.conversation_history.maxlen:
+            self.summary_fragments.append(self.conversation_history[0].short)
+        self.conversation_history.append(HistoryEntry(role, text))
+        self._history_text = None
 
     def get_history_for_prompt(self) -> str:
         """
         Returns compact history for LLM prompt.
         """
-        return "\n".join(
-            f"{m['role'].capitalize()}: {m['text']}"
-            for m in self.conversation_history
-        )
+        if self._history_text is None:
+            self._history_text = "\n".join(e.line for e in self.conversation_history)
+        return self._history_text
 
+    def get_context(self, budget_tokens: int, pending_user_text: str | None = None) -> str:
+        """
+        The most recent turns that fit in budget_tokens, oldest first.
+        Turns that do not fit (and those already evicted) are compacted
+        into one "Earlier: ..." line when there is room left for it.
+        pending_user_text is a user line not yet recorded (speculative calls).
+        """
+        entries = list(self.conversation_history)
+        if pending_user_text:
+            entries.append(HistoryEntry("user", pending_user_text))
+        if not entries:
+            return ""
+
+        window = []
+        used = 0
+        index = len(entries)
+        while index > 0:
+            entry = entries[index - 1]
+            if used + entry.tokens > budget_tokens:
+                break
+            window.append(entry.line)
+            used += entry.tokens
+            index -= 1
+        window.reverse()
+
+        if not window:
+            # Even the last turn alone is too long: keep its beginning
+            return entries[-1].line[:int((budget_tokens - 1) * CHARS_PER_TOKEN)]
+
+        fragments = list(self.summary_fragments) + [e.short for e in entries[:index]]
+        summary = ""
+        while fragments:
+            summary = SUMMARY_PREFIX + " | ".join(fragments)
+            if used + estimate_tokens(summary) <= budget_tokens:
+                break
+            fragments.pop(0)
+            summary = ""
+
+        return "\n".join(filter(None, [summary] + window))
 
     def get_context_summary(self) -> dict:
         """
@@ -0,0 +1,17 @@
+# memory/tokens.py
+"""
+Cheap prompt-size estimate, used to keep memory within a token budget.
+
+No tokenizer is loaded: for the Italian/English text Kira handles, BPE
+tokenizers average roughly CHARS_PER_TOKEN characters per token, and a
+slight overestimate is the safe side for a budget.
+"""
+
+CHARS_PER_TOKEN = 3.5
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate number of LLM tokens in text (0 for empty text)."""
+    if not text:
+        return 0
+    return int(len(text) / CHARS_PER_TOKEN) + 1
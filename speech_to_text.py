@@ -1,90 +1,724 @@
 import sounddevice as sd
 import vosk
-import queue
+import numpy as np
+import os
 import sys
+import time
+import wave
 import json
+import math
+import re
 import threading
+from collections import deque
+
+from audio_mixer import playback_reference
+
+# Optional: pip install webrtcvad
+try:
+    import webrtcvad
+    HAS_WEBRTCVAD = True
+except ImportError:
+    HAS_WEBRTCVAD = False
 
 # Use small model for faster response (download from: https://alphacephei.com/vosk/models)
 # Small model: vosk-model-small-it-0.22 (~40MB, 5-10x faster)
 # Full model: vosk-model-it-0.22 (~1.5GB, more accurate but slower)
-MODEL_PATH = r"C:\Users\loren\Downloads\vosk-model-it-0.22\vosk-model-it-0.22"  # Raw string per Windows path
-# Alternative: usa forward slash che funziona anche su Windows
-# MODEL_PATH = "C:/Users/loren/Downloads/vosk-model-it-0.22/vosk-model-it-0.22"
-model = vosk.Model(MODEL_PATH)
+# Override with VOSK_MODEL_PATH in .env; the model is loaded on first use.
+MODEL_PATH = os.getenv(
+    "VOSK_MODEL_PATH",
+    r"C:\Users\loren\Downloads\vosk-model-it-0.22\vosk-model-it-0.22"  # Raw string per Windows path
+)
+model = None
+
+SAMPLE_RATE = 16000
+BLOCK_SIZE = 960           # samples per block (60 ms, short enough for barge-in)
+RING_SECONDS = 10          # audio kept in the ring buffer; older blocks are dropped
+PRE_ROLL_SECONDS = 0.5     # audio from before record_voice() is fed too, so onsets are never clipped
+                           # (never from before the end of Kira's playback + ECHO_WINDOW)
+BARGE_IN_PRE_ROLL = 0.12   # seconds kept before a barge-in onset (the rest is Kira's echo)
+
+# Voice activity detection: silent blocks never reach Vosk, and the utterance
+# ends after ENDPOINT_SILENCE seconds of measured trailing silence.
+VAD_BACKEND = "energy"     # "energy" (NumPy) or "webrtc" (needs webrtcvad)
+VAD_FRAME_MS = 30
+VAD_THRESHOLD_DB = 12      # energy: speech is this far above the noise floor...
+VAD_MIN_DB = -50           # ...and above this absolute level (dBFS)
+WEBRTC_AGGRESSIVENESS = 2  # 0-3
+MIN_SPEECH_SECONDS = 0.12  # shorter bursts (clicks, taps) do not start an utterance
+ENDPOINT_SILENCE = 0.8     # trailing silence that ends the utterance
+MAX_UTTERANCE_SECONDS = 15
+
+# A partial unchanged for this long (audio time) is reported as "stable"
+STABLE_PARTIAL_SECONDS = 0.3
+
+# Second recognizer restricted to known command phrases (set_command_vocabulary).
+# It hears the same audio as the free-form one and wins when every word of a
+# full phrase is above GRAMMAR_MIN_CONFIDENCE. Needs a model with runtime
+# grammar support, i.e. the GRAMMAR_GRAPH_FILES (the small models): the big
+# vosk-model-it-0.22 ignores grammars, so no second recognizer is built for it.
+GRAMMAR_ENABLED = True
+GRAMMAR_GRAPH_FILES = ("Gr.fst", "HCLr.fst")
+GRAMMAR_MIN_CONFIDENCE = 0.85
+
+# Barge-in (BargeInMonitor, started by main.py): the mic stays open while Kira
+# speaks. Speech well above the expected echo of the playback, or one of
+# BARGE_IN_WORDS, stops the reply.
+BARGE_IN_WORDS = ["stop", "basta", "mute"]
+BARGE_IN_MIN_SPEECH = 0.09     # seconds of echo-gated speech
+BARGE_IN_MARGIN_DB = 6         # mic must exceed the estimated echo by this much
+ECHO_WINDOW = 0.35             # output + input latency span searched in the playback reference
+ECHO_GAIN_DB = -15.0           # initial speaker -> mic coupling, adapted while playing
 
-q = queue.Queue()
 stop_listening_flag = threading.Event()
 
-def callback(indata, frames, time, status):
-    if status:
-        # Handle input overflow by clearing queue
-        if "overflow" in str(status).lower():
-            print("⚠️ Audio buffer overflow - clearing queue", file=sys.stderr)
-            # Clear the queue to prevent backup
-            while not q.empty():
-                try:
-                    q.get_nowait()
-                except queue.Empty:
-                    break
+
+class AudioCapture:
+    """
+    Long-lived microphone capture.
+
+    One input stream stays open across turns and writes int16 blocks into a
+    bounded ring buffer (drop-oldest). Readers keep their own cursor, so
+    several recognizers can consume the same audio, and a new utterance can
+    start a little in the past (pre-roll).
+    """
+
+    def __init__(self, samplerate: int = SAMPLE_RATE, blocksize: int = BLOCK_SIZE,
+                 ring_seconds: float = RING_SECONDS):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.ring_blocks = max(2, math.ceil(ring_seconds * samplerate / blocksize))
+
+        self._blocks = deque(maxlen=self.ring_blocks)   # (seq, bytes, perf_counter at arrival)
+        self._next_seq = 0
+        self._cond = threading.Condition()
+        self._stream = None
+
+        # Counters
+        self.device_overflows = 0   # the driver dropped input before we got it
+        self.dropped_blocks = 0     # a reader fell behind and the ring overwrote its blocks
+        self.total_blocks = 0
+
+    def start(self):
+        if self._stream is not None:
+            return
+        self._stream = sd.RawInputStream(
+            samplerate=self.samplerate,
+            blocksize=self.blocksize,
+            dtype='int16',
+            channels=1,
+            callback=self._callback
+        )
+        self._stream.start()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+    def _callback(self, indata, frames, time_info, status):
+        if status:
+            if status.input_overflow:
+                self.device_overflows += 1
+            else:
+                print(status, file=sys.stderr)
+        self.push(bytes(indata))
+
+    def push(self, data: bytes):
+        """Append one block (called from the audio thread)."""
+        with self._cond:
+            self._blocks.append((self._next_seq, data, time.perf_counter()))
+            self._next_seq += 1
+            self.total_blocks += 1
+            self._cond.notify_all()
+
+    def cursor(self, pre_roll_blocks: int = 0, not_before: float = None) -> int:
+        """
+        Position for a new reader, pre_roll_blocks in the past, skipping
+        blocks whose audio starts before not_before (perf_counter time).
+        """
+        block_seconds = self.blocksize / self.samplerate
+        with self._cond:
+            oldest = self._blocks[0][0] if self._blocks else self._next_seq
+            cursor = max(oldest, self._next_seq - pre_roll_blocks)
+            if not_before is not None:
+                while cursor < self._next_seq and self._blocks[cursor - oldest][2] - block_seconds < not_before:
+                    cursor += 1
+            return cursor
+
+    def read(self, cursor: int, timeout: float) -> tuple[bytes | None, int]:
+        """Block at cursor (waiting up to timeout) and the next cursor."""
+        with self._cond:
+            if cursor >= self._next_seq:
+                self._cond.wait(timeout)
+                if cursor >= self._next_seq:
+                    return None, cursor
+
+            oldest = self._blocks[0][0]
+            if cursor < oldest:
+                self.dropped_blocks += oldest - cursor
+                print(f"⚠️ Audio reader fell behind - dropped {oldest - cursor} blocks", file=sys.stderr)
+                cursor = oldest
+
+            return self._blocks[cursor - oldest][1], cursor + 1
+
+    def exhausted(self, cursor: int) -> bool:
+        """True when no more audio will ever arrive at cursor (never, for a microphone)."""
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "device_overflows": self.device_overflows,
+            "dropped_blocks": self.dropped_blocks,
+            "total_blocks": self.total_blocks,
+            "buffered_blocks": len(self._blocks),
+        }
+
+
+class WavReplayCapture(AudioCapture):
+    """
+    Replays a WAV file through the same ring buffer as the microphone,
+    for offline tests and benchmarks (tools/bench_stt.py).
+
+    speed=1.0 pushes blocks in real time, 2.0 twice as fast, 0 as fast as
+    possible. tail_silence seconds of digital silence are appended so the
+    endpointer can close the utterance like it would on a live input.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, samplerate: int = SAMPLE_RATE,
+                 blocksize: int = BLOCK_SIZE, tail_silence: float = ENDPOINT_SILENCE + 1.0):
+        self.pcm = load_wav(path, samplerate)
+        self.pcm += b"\x00\x00" * int(tail_silence * samplerate)
+        self.duration = len(self.pcm) / 2 / samplerate
+        self.speed = speed
+        # The whole file fits in the ring: a slow reader never loses blocks
+        super().__init__(samplerate, blocksize, ring_seconds=self.duration + 1.0)
+
+        self.block_count = math.ceil(len(self.pcm) / (blocksize * 2))
+        self.push_times = []        # wall clock (perf_counter) at which each block became readable
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._replay, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.speed = 0   # flush what is left without waiting
+
+    def _replay(self):
+        block_bytes = self.blocksize * 2
+        block_seconds = self.blocksize / self.samplerate
+        started = time.perf_counter()
+        for i in range(self.block_count):
+            if self.speed > 0:
+                # A block is readable only once all of it has been "recorded"
+                delay = started + (i + 1) * block_seconds / self.speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            block = self.pcm[i * block_bytes:(i + 1) * block_bytes]
+            block += b"\x00" * (block_bytes - len(block))
+            self.push_times.append(time.perf_counter())
+            self.push(block)
+
+    def exhausted(self, cursor: int) -> bool:
+        return cursor >= self.block_count
+
+    def readable_at(self, audio_seconds: float) -> float | None:
+        """Wall-clock time at which audio up to audio_seconds had been pushed."""
+        index = max(0, math.ceil(audio_seconds * self.samplerate / self.blocksize) - 1)
+        if index >= len(self.push_times):
+            return None
+        return self.push_times[index]
+
+
+def load_wav(path: str, samplerate: int = SAMPLE_RATE) -> bytes:
+    """16-bit PCM WAV as mono int16 bytes at samplerate (channels averaged, linear resampling)."""
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV is supported")
+        channels = wav.getnchannels()
+        rate = wav.getframerate()
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != samplerate and samples.size:
+        positions = np.arange(0, samples.size * samplerate / rate) * rate / samplerate
+        samples = np.interp(positions, np.arange(samples.size), samples)
+    return np.asarray(samples).astype(np.int16).tobytes()
+
+
+class EnergyVAD:
+    """RMS energy against an adaptive noise floor. Cheap enough to run on every frame."""
+
+    def __init__(self, threshold_db: float = VAD_THRESHOLD_DB, min_db: float = VAD_MIN_DB):
+        self.threshold_db = threshold_db
+        self.min_db = min_db
+        self.noise_floor = -60.0
+
+    def is_speech(self, frame: bytes, samplerate: int) -> bool:
+        samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+        rms = np.sqrt(np.mean(samples * samples)) if samples.size else 0.0
+        level = 20 * math.log10(max(rms, 1.0) / 32768.0)
+
+        speech = level > self.noise_floor + self.threshold_db and level > self.min_db
+        if level < self.noise_floor:
+            self.noise_floor = level                                # follow quiet rooms at once
+        elif not speech:
+            self.noise_floor += (level - self.noise_floor) * 0.05   # rise slowly with steady noise
         else:
-            print(status, file=sys.stderr)
-    q.put(bytes(indata))
+            self.noise_floor += (level - self.noise_floor) * 0.002  # a fan switching on can't gate forever
+        return speech
+
+
+class WebRtcVAD:
+    """WebRTC VAD backend (10/20/30 ms frames of 16-bit mono PCM)."""
+
+    def __init__(self, aggressiveness: int = WEBRTC_AGGRESSIVENESS):
+        self._vad = webrtcvad.Vad(aggressiveness)
+
+    def is_speech(self, frame: bytes, samplerate: int) -> bool:
+        return self._vad.is_speech(frame, samplerate)
+
+
+def create_vad():
+    if VAD_BACKEND == "webrtc":
+        if HAS_WEBRTCVAD:
+            return WebRtcVAD()
+        print("⚠️ webrtcvad not installed, using the energy VAD")
+    return EnergyVAD()
+
+
+_vad = None
+
+
+def get_vad():
+    """Shared VAD, so the noise floor learned in one turn carries over to the next."""
+    global _vad
+    if _vad is None:
+        _vad = create_vad()
+    return _vad
+
+
+class Endpointer:
+    """
+    Tracks speech / trailing silence for one utterance, in audio time.
+
+    process(block) returns:
+      "silence" - no utterance yet, the block can skip the recognizer
+      "speech"  - inside an utterance (including short pauses)
+      "end"     - ENDPOINT_SILENCE of trailing silence after speech
+    """
+
+    def __init__(self, vad, samplerate: int = SAMPLE_RATE):
+        self.vad = vad
+        self.samplerate = samplerate
+        self.frame_bytes = int(samplerate * VAD_FRAME_MS / 1000) * 2
+        self.frame_seconds = VAD_FRAME_MS / 1000
+
+        self.in_speech = False
+        self.audio_time = 0.0         # seconds of audio seen
+        self.speech_run = 0.0         # current run of speech frames
+        self.speech_start = None
+        self.last_speech = None
+        self.blocks = 0
+        self.skipped_blocks = 0
+        self._rest = b""
+
+    def process(self, block: bytes) -> str:
+        self.blocks += 1
+        data = self._rest + block
+        usable = len(data) - len(data) % self.frame_bytes
+        self._rest = data[usable:]
+
+        for start in range(0, usable, self.frame_bytes):
+            frame = data[start:start + self.frame_bytes]
+            self.audio_time += self.frame_seconds
+            if self.vad.is_speech(frame, self.samplerate):
+                self.speech_run += self.frame_seconds
+                self.last_speech = self.audio_time
+                if not self.in_speech and self.speech_run >= MIN_SPEECH_SECONDS:
+                    self.in_speech = True
+                    self.speech_start = self.audio_time - self.speech_run
+            else:
+                self.speech_run = 0.0
 
-def record_voice(prompt="🎙 I'm listening, sir..."):
+        if not self.in_speech:
+            self.skipped_blocks += 1
+            return "silence"
+        if self.trailing_silence() >= ENDPOINT_SILENCE:
+            return "end"
+        return "speech"
+
+    def trailing_silence(self) -> float:
+        if self.last_speech is None:
+            return 0.0
+        return self.audio_time - self.last_speech
+
+    def restart(self):
+        """Speech turned out to be noise (empty transcript): wait for the next one."""
+        self.in_speech = False
+        self.speech_run = 0.0
+        self.speech_start = None
+        self.last_speech = None
+
+
+# Endpointing decision of the last record_voice() call
+last_endpoint = {}
+
+
+def _report_endpoint(endpointer: Endpointer, reason: str, text: str):
+    last_endpoint.clear()
+    last_endpoint.update({
+        "reason": reason,
+        "speech_start": endpointer.speech_start,
+        "speech_end": endpointer.last_speech,
+        "trailing_silence": endpointer.trailing_silence(),
+        "blocks": endpointer.blocks,
+        "skipped_blocks": endpointer.skipped_blocks,
+        "text": text,
+    })
+    start = endpointer.speech_start or 0.0
+    end = endpointer.last_speech or 0.0
+    print(
+        f"🎚️ Endpoint: {reason} | speech {start:.2f}s-{end:.2f}s, "
+        f"trailing silence {endpointer.trailing_silence():.2f}s, "
+        f"{endpointer.skipped_blocks}/{endpointer.blocks} blocks skipped by VAD"
+    )
+
+
+_capture = None
+_capture_lock = threading.Lock()
+_recognizer = None
+_grammar_recognizer = None
+_model_has_grammar = False
+_command_phrases = set()
+_barge_in_cursor = None     # where the speech that interrupted the reply began
+
+
+def get_capture() -> AudioCapture:
+    """Shared capture service, started on first use and kept open."""
+    global _capture
+    with _capture_lock:
+        if _capture is None:
+            _capture = AudioCapture()
+            _capture.start()
+        return _capture
+
+
+def load_model(path: str = None) -> vosk.Model:
+    """Load (or switch to) a Vosk model. Without a path, MODEL_PATH is loaded once."""
+    global model, _recognizer, _grammar_recognizer, _model_has_grammar
+    if path is None and model is not None:
+        return model
+    path = path or MODEL_PATH
+    print(f"🧠 Loading Vosk model: {path}")
+    model = vosk.Model(path)
+    _recognizer = None
+    _grammar_recognizer = None
+    _model_has_grammar = all(
+        os.path.exists(os.path.join(path, "graph", name)) for name in GRAMMAR_GRAPH_FILES
+    )
+    if GRAMMAR_ENABLED and not _model_has_grammar:
+        print("ℹ️ Model without runtime grammar graph: command grammar disabled")
+    return model
+
+
+def grammar_supported() -> bool:
+    """Command grammars are on and the loaded model can apply them."""
+    load_model()
+    return GRAMMAR_ENABLED and _model_has_grammar
+
+
+def _normalize_phrase(phrase: str) -> str:
+    phrase = re.sub(r"[^\w\s']", " ", phrase.lower().replace("’", "'"))
+    return " ".join(phrase.split())
+
+
+def set_command_vocabulary(phrases):
+    """Phrases the grammar recognizer can return (replaces the previous set)."""
+    global _command_phrases, _grammar_recognizer
+    _command_phrases = {p for p in map(_normalize_phrase, phrases) if p}
+    _grammar_recognizer = None
+
+
+def _get_grammar_recognizer() -> vosk.KaldiRecognizer | None:
+    global _grammar_recognizer
+    if not _command_phrases or not grammar_supported():
+        return None
+    if _grammar_recognizer is None:
+        # "[unk]" absorbs everything outside the command set
+        grammar = json.dumps(sorted(_command_phrases) + ["[unk]"], ensure_ascii=False)
+        _grammar_recognizer = vosk.KaldiRecognizer(load_model(), SAMPLE_RATE, grammar)
+        _grammar_recognizer.SetWords(True)
+    else:
+        _grammar_recognizer.Reset()
+    return _grammar_recognizer
+
+
+def _grammar_match(result_json: str) -> str | None:
+    """The command phrase in a grammar result, if it is whole and confident."""
+    result = json.loads(result_json)
+    text = result.get("text", "")
+    words = result.get("result", [])
+    if not words or text not in _command_phrases:
+        return None
+    if min(word.get("conf", 0.0) for word in words) < GRAMMAR_MIN_CONFIDENCE:
+        return None
+    return text
+
+
+def _get_recognizer() -> vosk.KaldiRecognizer:
+    global _recognizer
+    if _recognizer is None:
+        _recognizer = vosk.KaldiRecognizer(load_model(), SAMPLE_RATE)
+        _recognizer.SetMaxAlternatives(0)
+        _recognizer.SetWords(False)
+    else:
+        _recognizer.Reset()
+    return _recognizer
+
+class BargeInMonitor:
+    """
+    Listens on the shared capture while Kira speaks (reference.playing).
+
+    Each 30 ms frame is compared with the loudest playback block of the last
+    ECHO_WINDOW seconds: only audio BARGE_IN_MARGIN_DB above the estimated
+    echo (and speech for the VAD) counts as the user. BARGE_IN_MIN_SPEECH of
+    it, or a BARGE_IN_WORDS keyword from a small grammar recognizer (only on
+    models with runtime grammars), calls on_barge_in(). The speaker -> mic
+    coupling is learned from frames where only the playback is heard.
+    """
+
+    def __init__(self, reference, on_barge_in, capture: AudioCapture = None):
+        self.reference = reference
+        self.on_barge_in = on_barge_in
+        self.capture = capture
+        self.vad = EnergyVAD()      # own noise floor: this one hears the speakers
+        self.echo_gain_db = ECHO_GAIN_DB
+        self.triggers = 0
+        self._keyword_rec = None
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="barge-in", daemon=True)
+            self._thread.start()
+
+    def _keyword_recognizer(self):
+        if self._keyword_rec is None and grammar_supported():
+            grammar = json.dumps(BARGE_IN_WORDS + ["[unk]"])
+            self._keyword_rec = vosk.KaldiRecognizer(load_model(), SAMPLE_RATE, grammar)
+        return self._keyword_rec
+
+    def _run(self):
+        capture = self.capture or get_capture()
+        frame_samples = int(capture.samplerate * VAD_FRAME_MS / 1000)
+        frame_bytes = frame_samples * 2
+        frame_seconds = VAD_FRAME_MS / 1000
+        block_seconds = capture.blocksize / capture.samplerate
+
+        cursor = capture.cursor()
+        speech_run = 0.0
+        was_playing = fired = False
+
+        while True:
+            data, cursor = capture.read(cursor, timeout=0.1)
+            if data is None:
+                continue
+
+            playing = self.reference.playing.is_set()
+            if not playing:
+                if was_playing and self._keyword_rec is not None:
+                    self._keyword_rec.Reset()
+                was_playing = fired = False
+                speech_run = 0.0
+                continue
+            was_playing = True
+            if fired:
+                continue    # already interrupted, wait for the playback to stop
+
+            arrived = time.perf_counter()
+            block_start = arrived - block_seconds
+            voiced = False
+            triggered = None
+
+            for i in range(len(data) // frame_bytes):
+                frame = data[i * frame_bytes:(i + 1) * frame_bytes]
+                samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+                mic_db = 20 * math.log10(max(float(np.sqrt(np.mean(samples * samples))), 1.0) / 32768.0)
+
+                frame_time = block_start + (i + 1) * frame_seconds
+                ref_db = self.reference.level_db(frame_time - ECHO_WINDOW, frame_time)
+                above_echo = mic_db > ref_db + self.echo_gain_db + BARGE_IN_MARGIN_DB
+
+                if self.vad.is_speech(frame, capture.samplerate) and above_echo:
+                    voiced = True
+                    speech_run += frame_seconds
+                    if speech_run >= BARGE_IN_MIN_SPEECH and triggered is None:
+                        triggered = ("voice", frame_time - speech_run)
+                else:
+                    speech_run = 0.0
+                    if ref_db > -60 and mic_db > VAD_MIN_DB:
+                        # Only the playback is heard: follow the coupling slowly
+                        self.echo_gain_db += ((mic_db - ref_db) - self.echo_gain_db) * 0.02
+
+            keyword_rec = self._keyword_recognizer() if voiced or speech_run else None
+            if keyword_rec is not None and triggered is None:
+                keyword_rec.AcceptWaveform(data)
+                partial = json.loads(keyword_rec.PartialResult()).get("partial", "")
+                if any(word in BARGE_IN_WORDS for word in partial.split()):
+                    triggered = ("keyword", block_start)
+
+            if triggered:
+                reason, onset = triggered
+                onset_blocks = math.ceil((arrived - onset) / block_seconds)
+                self._trigger(reason, onset, cursor - onset_blocks)
+                speech_run = 0.0
+                fired = True
+
+    def _trigger(self, reason: str, onset: float, onset_cursor: int):
+        global _barge_in_cursor
+        _barge_in_cursor = onset_cursor
+        self.triggers += 1
+        try:
+            self.on_barge_in()
+        except Exception as e:
+            print(f"⚠️ Barge-in callback error: {e}")
+        print(f"✋ Barge-in ({reason}) {(time.perf_counter() - onset) * 1000:.0f} ms after speech onset, "
+              f"echo coupling {self.echo_gain_db:.0f} dB")
+
+
+def _take_barge_in_cursor(capture: AudioCapture, cursor: int) -> int:
+    global _barge_in_cursor
+    onset, _barge_in_cursor = _barge_in_cursor, None
+    if onset is None:
+        return cursor
+    # Kira was still talking before the onset: keep only a short margin of it
+    margin_blocks = math.ceil(BARGE_IN_PRE_ROLL * capture.samplerate / capture.blocksize)
+    return max(capture.cursor(capture.ring_blocks), min(cursor, onset - margin_blocks))
+
+
+def _prefer_command(grammar_rec, text: str) -> str:
+    """At the end of an utterance, a confident command phrase beats the free-form text."""
+    if grammar_rec is None or not grammar_supported():
+        return text
+    command = _grammar_match(grammar_rec.FinalResult())
+    if command and command != _normalize_phrase(text):
+        print(f"🎯 Command grammar: '{text}' -> '{command}'")
+    return command or text
+
+
+def record_voice(prompt="🎙 I'm listening, sir...", on_stable_partial=None, capture: AudioCapture = None):
     """
     Blocking call, returns the first recognized sentence.
-    Optimized for faster response with aggressive silence detection.
+    Silent audio is gated out by the VAD; the utterance ends on measured
+    trailing silence (ENDPOINT_SILENCE) or when Vosk closes it itself.
+
+    on_stable_partial(text) is called (on this thread) once per partial that
+    stays unchanged for STABLE_PARTIAL_SECONDS, e.g. to start work early.
+    capture defaults to the shared microphone; pass a WavReplayCapture to
+    run the same recognition and endpointing on a file.
     """
-    import time
     print(prompt)
-    rec = vosk.KaldiRecognizer(model, 16000)
-    rec.SetMaxAlternatives(0)
-    rec.SetWords(False)
-    
+    if capture is None:
+        capture = get_capture()
+    rec = _get_recognizer()
+    grammar_rec = _get_grammar_recognizer()
+    endpointer = Endpointer(get_vad(), capture.samplerate)
+
+    pre_roll_blocks = math.ceil(PRE_ROLL_SECONDS * capture.samplerate / capture.blocksize)
+    if capture is _capture:
+        # The pre-roll must not replay the tail of Kira's reply (or its echo)
+        cursor = capture.cursor(pre_roll_blocks, not_before=playback_reference.last_end + ECHO_WINDOW)
+        # After a barge-in, start from the words that interrupted the reply
+        cursor = _take_barge_in_cursor(capture, cursor)
+    else:
+        cursor = capture.cursor(pre_roll_blocks)
+    capture.start()     # no-op for the running microphone, starts a file replay
+
     last_partial = ""
-    silence_start = None
-    speech_detected = False
-    SILENCE_TIMEOUT = 1.2  # Balanced timeout - finalize after 1.2s of silence (was 0.6s - too aggressive)
-    
-    with sd.RawInputStream(samplerate=16000, blocksize=6000, dtype='int16',  # Increased to reduce overflow
-                           channels=1, callback=callback):
-        while not stop_listening_flag.is_set():
-            try:
-                data = q.get(timeout=0.05)
-            except queue.Empty:
-                # Force finalize if we have speech and silence timeout reached
-                if speech_detected and last_partial.strip() and silence_start:
-                    if time.time() - silence_start > SILENCE_TIMEOUT:
-                        final = json.loads(rec.FinalResult())
-                        text = final.get("text", "")
-                        if text.strip():
-                            print("👤 You:", text)
-                            return text
-                        # If FinalResult empty, use last partial
-                        if last_partial.strip():
-                            print("👤 You:", last_partial)
-                            return last_partial
-                continue
-            
-            # Process audio
-            if rec.AcceptWaveform(data):
-                result = json.loads(rec.Result())
-                text = result.get("text", "")
-                if text.strip():
-                    print("👤 You:", text)
-                    return text
-            
-            # Monitor partial results for faster detection
-            partial = json.loads(rec.PartialResult())
-            current_partial = partial.get("partial", "")
-            
-            if current_partial:
-                speech_detected = True
-                if current_partial != last_partial:
-                    last_partial = current_partial
-                    silence_start = time.time()  # Reset timer on new words
-                elif not silence_start:
-                    silence_start = time.time()  # Start timer on same partial
-                    
+    partial_since = 0.0
+    reported_partial = ""
+    # Blocks before the onset, fed when it is confirmed: the VAD needs
+    # MIN_SPEECH_SECONDS of speech first, and the pre-roll must reach Vosk too
+    onset_blocks = math.ceil(MIN_SPEECH_SECONDS * capture.samplerate / capture.blocksize) + 1
+    held = deque(maxlen=max(pre_roll_blocks, onset_blocks))
+
+    while not stop_listening_flag.is_set():
+        data, cursor = capture.read(cursor, timeout=0.05)
+        if data is None:
+            if capture.exhausted(cursor):
+                break
+            continue
+
+        state = endpointer.process(data)
+        if state == "silence":
+            held.append(data)
+            continue
+
+        while held:
+            block = held.popleft()
+            rec.AcceptWaveform(block)
+            if grammar_rec is not None:
+                grammar_rec.AcceptWaveform(block)
+
+        # Command grammar first: it can close a known phrase before the free-form model
+        if grammar_rec is not None and grammar_rec.AcceptWaveform(data):
+            command = _grammar_match(grammar_rec.Result())
+            if command:
+                _report_endpoint(endpointer, "grammar", command)
+                print("👤 You (command):", command)
+                return command
+
+        # Process audio
+        if rec.AcceptWaveform(data):
+            result = json.loads(rec.Result())
+            text = result.get("text", "")
+            if text.strip():
+                text = _prefer_command(grammar_rec, text)
+                _report_endpoint(endpointer, "recognizer", text)
+                print("👤 You:", text)
+                return text
+
+        too_long = endpointer.audio_time - (endpointer.speech_start or 0.0) > MAX_UTTERANCE_SECONDS
+        if state == "end" or too_long:
+            final = json.loads(rec.FinalResult())
+            text = _prefer_command(grammar_rec, final.get("text", "") or last_partial)
+            if text.strip():
+                _report_endpoint(endpointer, "max_length" if too_long else "vad_silence", text)
+                print("👤 You:", text)
+                return text
+            # Noise, not words: keep listening
+            _report_endpoint(endpointer, "noise", "")
+            endpointer.restart()
+            last_partial = ""
+            reported_partial = ""
+            continue
+
+        # Partial results only while there is speech
+        partial = json.loads(rec.PartialResult())
+        current_partial = partial.get("partial", "")
+        if current_partial:
+            if current_partial != last_partial:
+                last_partial = current_partial
+                partial_since = endpointer.audio_time
+            elif (on_stable_partial and current_partial != reported_partial
+                  and endpointer.audio_time - partial_since >= STABLE_PARTIAL_SECONDS):
+                reported_partial = current_partial
+                try:
+                    on_stable_partial(current_partial)
+                except Exception as e:
+                    print(f"⚠️ Stable partial callback error: {e}")
+
+    if endpointer.in_speech:
+        # Input ended mid-utterance (file replay): keep what was heard
+        text = _prefer_command(grammar_rec, json.loads(rec.FinalResult()).get("text", "") or last_partial)
+        if text.strip():
+            _report_endpoint(endpointer, "end_of_input", text)
+            print("👤 You:", text)
+            return text
+
     return ""
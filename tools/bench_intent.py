@@ -0,0 +1,155 @@
+# tools/bench_intent.py
+"""
+Hit rate and latency of the local intent fast path (local_intent.py).
+
+Each corpus line is (utterance, expected intent, expected key parameter).
+Expected intent None means the utterance must go to the LLM.
+
+    python tools/bench_intent.py
+"""
+
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_intent import match_intent, MIN_CONFIDENCE  # noqa: E402
+
+CORPUS = [
+    # --- scroll ---
+    ("scorri giù", "screen_action", None),
+    ("Kira, scorri verso il basso", "screen_action", None),
+    ("scendi un po'", "screen_action", None),
+    ("vai giù per favore", "screen_action", None),
+    ("pagina giù", "screen_action", None),
+    ("scorri su", "screen_action", None),
+    ("scorri verso l'alto", "screen_action", None),
+    ("sali", "screen_action", None),
+    ("scroll down", "screen_action", None),
+    ("scroll up please", "screen_action", None),
+    ("scorri giù ancora", "screen_action", None),
+    ("scroll down a bit", "screen_action", None),
+    # --- open app ---
+    ("apri Chrome", "open_app", "Chrome"),
+    ("apri spotify", "open_app", "Spotify"),
+    ("avvia Discord", "open_app", "Discord"),
+    ("lancia steam", "open_app", "Steam"),
+    ("apri visual studio code", "open_app", "Visual Studio Code"),
+    ("apri vs code", "open_app", "Visual Studio Code"),
+    ("apri la calcolatrice", "open_app", "Calcolatrice"),
+    ("apri il blocco note", "open_app", "Notepad"),
+    ("apri opera gx e cerca la gioconda", "open_app", "Opera GX"),
+    ("apri chrome e cerca tutorial python", "open_app", "Chrome"),
+    ("apri firefox", "open_app", "Firefox"),
+    ("apri crome", "open_app", "Chrome"),
+    ("apri spotifi", "open_app", "Spotify"),
+    ("puoi aprire telegram", "open_app", "Telegram"),
+    ("open Spotify", "open_app", "Spotify"),
+    ("launch discord", "open_app", "Discord"),
+    ("open chrome and search for pasta recipes", "open_app", "Chrome"),
+    ("hey kira apri excel", "open_app", "Excel"),
+    # --- weather ---
+    ("che tempo fa a Milano", "weather_report", "Milano"),
+    ("che tempo fa a Roma domani", "weather_report", "Roma"),
+    ("che tempo farà domani a Torino", "weather_report", "Torino"),
+    ("meteo di Napoli", "weather_report", "Napoli"),
+    ("meteo a Bologna oggi", "weather_report", "Bologna"),
+    ("previsioni del tempo per Firenze", "weather_report", "Firenze"),
+    ("com'è il tempo a Venezia", "weather_report", "Venezia"),
+    ("what's the weather in London", "weather_report", "London"),
+    ("weather in New York tomorrow", "weather_report", "New York"),
+    ("che tempo fa a Reggio Emilia sabato", "weather_report", "Reggio Emilia"),
+    ("che tempo fa a Salisburgo", "weather_report", "Salisburgo"),
+    # --- must go to the LLM ---
+    ("ciao come stai", None, None),
+    ("chi ha vinto la champions league nel 2010", None, None),
+    ("raccontami una barzelletta", None, None),
+    ("clicca sul primo link", None, None),
+    ("apri il secondo link", None, None),
+    ("apri chat con marco", None, None),
+    ("che tempo fa", None, None),
+    ("mi chiamo Lorenzo e ho 25 anni", None, None),
+    ("apri quella cosa che usavo ieri", None, None),
+    ("cerca le ultime notizie su Python", None, None),
+    ("scrivi ciao nel campo di ricerca", None, None),
+    ("quanto fa 12 per 7", None, None),
+    ("what time is it in Tokyo", None, None),
+    ("tell me something about the roman empire", None, None),
+    # scroll keywords inside ordinary requests
+    ("vai su youtube", None, None),
+    ("come si fa a salire di livello", None, None),
+    ("discendi", None, None),
+    ("sali sul tetto e dimmi cosa vedi", None, None),
+    ("scendi a comprare il pane", None, None),
+    # weather phrases whose "city" is not a place
+    ("previsioni per il weekend", None, None),
+    ("il meteo per la settimana", None, None),
+    ("che tempo fa a casa mia", None, None),
+    ("che tempo fa in questo momento", None, None),
+    ("meteo per il fine settimana", None, None),
+    ("che tempo fa qui", None, None),
+    ("what's the weather at home", None, None),
+    ("meteo di questa settimana", None, None),
+]
+
+ROUNDS = 200
+
+
+def _key_param(output: dict) -> str | None:
+    params = output.get("parameters", {})
+    intent = output.get("intent")
+    if intent == "open_app":
+        return params.get("app_name")
+    if intent == "weather_report":
+        return params.get("city")
+    return None
+
+
+def main():
+    hits = correct = false_hits = misses_expected = 0
+    latencies = []
+
+    for utterance, expected_intent, expected_param in CORPUS:
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            output, confidence = match_intent(utterance)
+        latencies.append((time.perf_counter() - start) / ROUNDS)
+
+        local = output is not None and confidence >= MIN_CONFIDENCE
+        if expected_intent is None:
+            misses_expected += 1
+            if local:
+                false_hits += 1
+                print(f"  ✗ should go to LLM: {utterance!r} -> {output['intent']} {output['parameters']}")
+            continue
+
+        if not local:
+            print(f"  · LLM fallback: {utterance!r} (confidence {confidence:.2f})")
+            continue
+
+        hits += 1
+        ok = output["intent"] == expected_intent and (
+            expected_param is None or _key_param(output) == expected_param
+        )
+        if ok:
+            correct += 1
+        else:
+            print(f"  ✗ wrong: {utterance!r} -> {output['intent']} {output['parameters']}")
+
+    local_total = len(CORPUS) - misses_expected
+    latencies_ms = sorted(lat * 1000 for lat in latencies)
+    p95 = latencies_ms[int(len(latencies_ms) * 0.95) - 1]
+
+    print()
+    print(f"Utterances:        {len(CORPUS)} ({local_total} local-eligible, {misses_expected} LLM-only)")
+    print(f"Hit rate:          {hits}/{local_total} = {hits / local_total:.1%}")
+    print(f"Precision on hits: {correct}/{hits} = {correct / max(hits, 1):.1%}")
+    print(f"False local hits:  {false_hits}/{misses_expected}")
+    print(f"Latency:           mean {statistics.mean(latencies_ms):.3f} ms, "
+          f"p95 {p95:.3f} ms, max {latencies_ms[-1]:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
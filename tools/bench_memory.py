@@ -0,0 +1,95 @@
+# tools/bench_memory.py
+"""
+Cost of one long-term memory update as memory grows, JSON vs SQLite,
+measured through memory_manager as main.py uses it.
+
+For each size the memory is filled with synthetic entries (spread over the
+usual categories), then single-entry updates are timed:
+
+    update  memory_manager.update_memory (in RAM, the write is debounced)
+    flush   memory_manager.flush_memory of that update: full rewrite of
+            memory.json, or one SQLite upsert of the changed entry (WAL)
+    load    memory_manager.load_memory("preferences"), one category copied
+
+    python tools/bench_memory.py
+    python tools/bench_memory.py --sizes 1000 100000 --rounds 50
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory import memory_manager  # noqa: E402
+
+CATEGORIES = ["identity", "preferences", "relationships", "emotional_state"]
+
+
+def synthetic_memory(size: int) -> dict:
+    memory = {category: {} for category in CATEGORIES}
+    for i in range(size):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        memory[category][f"entry_{i}"] = {"value": f"valore numero {i} per {category}"}
+    return memory
+
+
+def _use_backend(backend: str, directory: str):
+    """Point memory_manager at a fresh directory with the given backend."""
+    if memory_manager._store is not None:
+        memory_manager._store.close()
+    memory_manager.MEMORY_BACKEND = backend
+    memory_manager.MEMORY_PATH = os.path.join(directory, "memory.json")
+    memory_manager.DB_PATH = os.path.join(directory, "memory.db")
+    memory_manager._store = None
+    memory_manager._cache = None
+    memory_manager._file_signature = None
+    memory_manager._dirty = False
+    memory_manager._replace = False
+    memory_manager._pending.clear()
+
+
+def bench(backend: str, memory: dict, rounds: int, directory: str) -> tuple[float, float, float]:
+    """Median seconds of (update, flush, load) with the memory already stored."""
+    _use_backend(backend, directory)
+    memory_manager.save_memory(memory)
+    memory_manager.flush_memory()
+
+    updates, flushes, loads = [], [], []
+    for i in range(rounds):
+        start = time.perf_counter()
+        memory_manager.update_memory({"preferences": {"bench": i}})
+        updates.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        memory_manager.flush_memory()
+        flushes.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        memory_manager.load_memory("preferences")
+        loads.append(time.perf_counter() - start)
+
+    _use_backend("json", directory)
+    return statistics.median(updates), statistics.median(flushes), statistics.median(loads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-term memory update benchmark for Kira")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'entries':>8} {'backend':>8} {'update ms':>10} {'flush ms':>9} {'load ms':>8}")
+    for size in args.sizes:
+        memory = synthetic_memory(size)
+        for backend in ("json", "sqlite"):
+            with tempfile.TemporaryDirectory() as directory:
+                update, flush, load = bench(backend, memory, args.rounds, directory)
+            print(f"{size:>8} {backend:>8} {update * 1000:>10.2f} {flush * 1000:>9.2f} {load * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# tools/bench_ocr.py
+"""
+Wall-clock OCR time of actions/ocr_service.py against the number of worker
+processes (tiled OCR), on screenshots or on a rendered text page.
+
+    python tools/bench_ocr.py                              # rendered 1920x1080 page
+    python tools/bench_ocr.py screen1.png screen4k.png --workers 1 2 4 8 --rounds 3
+
+Workers load their readers before timing starts; the result cache is off.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from actions import ocr_service  # noqa: E402
+
+WORDS = (
+    "risultati ricerca meteo Milano domani previsioni notizie sport calcio "
+    "ricetta carbonara tradizionale ingredienti guanciale pecorino uova pepe "
+    "weather forecast news football recipe traditional ingredients"
+).split()
+
+
+def rendered_page(width: int = 1920, height: int = 1080) -> Image.Image:
+    """White page with lines of dark and blue text, like a result list."""
+    page = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(page)
+    try:
+        font = ImageFont.load_default(size=20)
+    except TypeError:
+        font = ImageFont.load_default()
+    y, i = 40, 0
+    while y < height - 40:
+        words = [WORDS[(i * 7 + k) % len(WORDS)] for k in range(6 + i % 5)]
+        color = (26, 13, 171) if i % 3 == 0 else (32, 33, 36)
+        draw.text((120 + (i % 2) * 40, y), " ".join(words).capitalize(), fill=color, font=font)
+        y += 34
+        i += 1
+    return page
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiled OCR benchmark for Kira")
+    parser.add_argument("images", nargs="*", help="screenshots (default: a rendered page)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    if not ocr_service.HAS_EASYOCR:
+        sys.exit("EasyOCR is not installed")
+
+    images = [(path, Image.open(path).convert("RGB")) for path in args.images] or [("rendered", rendered_page())]
+
+    print(f"{'image':<20} {'workers':>7} {'s':>7} {'speedup':>8} {'boxes':>6}")
+    for name, image in images:
+        baseline = None
+        for workers in args.workers:
+            service = ocr_service.OcrService(workers=workers, cache_entries=0)
+            service.start_pool() or service.reader()
+            service.readtext(image)                      # warm-up run
+            times = []
+            for _ in range(args.rounds):
+                start = time.perf_counter()
+                results = service.readtext(image)
+                times.append(time.perf_counter() - start)
+            service.shutdown()
+
+            elapsed = statistics.median(times)
+            baseline = baseline or elapsed
+            label = os.path.basename(name)[:20]
+            print(f"{label:<20} {workers:>7} {elapsed:>7.2f} {baseline / elapsed:>7.1f}x {len(results):>6}")
+
+
+if __name__ == "__main__":
+    main()
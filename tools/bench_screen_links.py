@@ -0,0 +1,131 @@
+# tools/bench_screen_links.py
+"""
+Speed and accuracy of the blue-link detection used by screen_action
+(actions/link_detection.py) on synthetic Google result pages.
+
+Each page is drawn with NumPy at the given resolutions: a blue navigation
+bar, then results made of a green URL line, a blue title (glyph-like
+strokes with anti-aliased edges) and grey snippet lines. A title counts as
+found when a detected link lies within TOLERANCE px of its centre line.
+
+    python tools/bench_screen_links.py
+    python tools/bench_screen_links.py --pages 20 --rounds 50 --size 2560x1440
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from actions import link_detection  # noqa: E402
+
+LINK_BLUE = (26, 13, 171)
+URL_GREEN = (0, 102, 33)
+SNIPPET_GREY = (77, 81, 86)
+WHITE = (255, 255, 255)
+TOLERANCE = 12
+
+
+def _draw_text(page: np.ndarray, rng, x: int, y: int, width: int, height: int, color: tuple):
+    """Glyph-like strokes in color, with a half-blended 1 px edge like anti-aliased text."""
+    ink = np.zeros((height, width), dtype=bool)
+    cursor = 0
+    while cursor < width - 8:
+        if rng.random() < 0.15:           # space between words
+            cursor += 6
+            continue
+        glyph = rng.integers(6, 10)
+        stem = rng.integers(0, glyph - 2)
+        ink[rng.integers(0, 5):height, cursor + stem:cursor + stem + 2] = True
+        bar = rng.integers(height // 3, height - 2)
+        ink[bar:bar + 2, cursor:cursor + glyph - 1] = True
+        cursor += glyph + 1
+
+    edge = np.zeros_like(ink)
+    edge[1:, :] |= ink[:-1, :]
+    edge[:-1, :] |= ink[1:, :]
+    edge[:, 1:] |= ink[:, :-1]
+    edge[:, :-1] |= ink[:, 1:]
+    edge &= ~ink
+
+    area = page[y:y + height, x:x + width]
+    blend = ((np.array(color) + np.array(WHITE)) // 2).astype(np.uint8)
+    area[edge[:area.shape[0], :area.shape[1]]] = blend
+    area[ink[:area.shape[0], :area.shape[1]]] = color
+
+
+def synthetic_serp(width: int, height: int, seed: int) -> tuple[np.ndarray, list[int]]:
+    """(RGB page, centre y of each result title)."""
+    rng = np.random.default_rng(seed)
+    page = np.full((height, width, 3), 255, dtype=np.uint8)
+
+    # Navigation bar: short blue labels that must not count as results
+    for x in range(180, 700, 90):
+        _draw_text(page, rng, x, 170, 55, 14, LINK_BLUE)
+
+    titles = []
+    y = 240 + int(rng.integers(0, 30))
+    while y + 80 < height:
+        _draw_text(page, rng, 230, y, int(rng.integers(180, 300)), 12, URL_GREEN)
+        title_y = y + 22
+        _draw_text(page, rng, 230, title_y, int(rng.integers(260, 560)), 18, LINK_BLUE)
+        titles.append(title_y + 9)
+        for line in range(2):
+            _draw_text(page, rng, 230, title_y + 28 + line * 20, int(rng.integers(500, 650)), 13, SNIPPET_GREY)
+        y += 130 + int(rng.integers(0, 30))
+    return page, titles
+
+
+def score(found: list[int], expected: list[int], limit: int) -> tuple[int, int, int]:
+    """(true positives, expected titles in the scanned area, detections)."""
+    expected = [y for y in expected if y < limit]
+    hits = sum(any(abs(f - e) <= TOLERANCE for f in found) for e in expected)
+    return hits, len(expected), len(found)
+
+
+def bench(size: tuple[int, int], pages: int, rounds: int):
+    width, height = size
+    times = {"google_links": [], "result_links": []}
+    totals = {name: [0, 0, 0] for name in times}
+    limits = {"google_links": link_detection.GOOGLE_REGION[1], "result_links": link_detection.RESULT_REGION[1]}
+
+    for seed in range(pages):
+        page, titles = synthetic_serp(width, height, seed)
+        for name in times:
+            detect = getattr(link_detection, name)
+            for _ in range(rounds):
+                start = time.perf_counter()
+                links = detect(page)
+                times[name].append(time.perf_counter() - start)
+            for i, value in enumerate(score([link["y"] for link in links], titles, limits[name])):
+                totals[name][i] += value
+
+    for name in times:
+        hits, expected, found = totals[name]
+        recall = hits / expected if expected else 0.0
+        precision = hits / found if found else 0.0
+        print(f"{width}x{height:<6} {name:<13} {statistics.median(times[name]) * 1000:>8.2f} "
+              f"{recall:>7.0%} {precision:>9.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Screen link detection benchmark for Kira")
+    parser.add_argument("--size", action="append",
+                        help="WIDTHxHEIGHT (repeatable, default: 1366x768 1920x1080 2560x1440)")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    sizes = [tuple(int(v) for v in s.lower().split("x")) for s in (args.size or ["1366x768", "1920x1080", "2560x1440"])]
+    print(f"{'size':<11} {'detector':<13} {'ms':>8} {'recall':>7} {'precision':>9}")
+    for size in sizes:
+        bench(size, args.pages, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
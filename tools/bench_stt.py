@@ -0,0 +1,163 @@
+# tools/bench_stt.py
+"""
+Offline speech-to-text benchmark: replays WAV fixtures through
+speech_to_text.record_voice (same VAD, endpointing and Vosk code as the
+microphone path) and reports, per model and utterance:
+
+    WER          word error rate against the reference transcript
+    EOS latency  end of speech in the audio -> record_voice returned (wall clock)
+    RTF          CPU seconds / audio seconds
+    CPU          CPU seconds spent on the utterance
+
+Fixtures are a directory of .wav files with a .txt transcript next to each,
+or a TSV manifest of "path<TAB>reference" lines (paths relative to it):
+
+    python tools/bench_stt.py fixtures/ --model small=C:/vosk/vosk-model-small-it-0.22 ^
+                                        --model large=C:/vosk/vosk-model-it-0.22
+    python tools/bench_stt.py fixtures/manifest.tsv --speed 0 --endpoint-silence 0.6 --block-size 4000
+
+--speed 1 replays in real time (realistic EOS latency), 0 as fast as possible.
+"""
+
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import speech_to_text as stt  # noqa: E402
+
+_WORD_RE = re.compile(r"[\w'’]+")
+
+
+def words(text: str) -> list[str]:
+    return _WORD_RE.findall((text or "").lower())
+
+
+def word_errors(reference: list[str], hypothesis: list[str]) -> int:
+    """Levenshtein distance over words (substitutions + deletions + insertions)."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word)
+            ))
+        previous = current
+    return previous[-1]
+
+
+def load_fixtures(source: str) -> list[tuple[str, str]]:
+    """[(wav path, reference text)] from a directory or a TSV manifest."""
+    fixtures = []
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if not name.lower().endswith(".wav"):
+                continue
+            wav_path = os.path.join(source, name)
+            txt_path = os.path.splitext(wav_path)[0] + ".txt"
+            if not os.path.exists(txt_path):
+                print(f"⚠️ No transcript for {name}, skipped")
+                continue
+            with open(txt_path, encoding="utf-8") as f:
+                fixtures.append((wav_path, f.read().strip()))
+        return fixtures
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            path, _, reference = line.partition("\t")
+            fixtures.append((os.path.join(base, path), reference.strip()))
+    return fixtures
+
+
+def run_utterance(wav_path: str, reference: str, args) -> dict:
+    capture = stt.WavReplayCapture(
+        wav_path, speed=args.speed, blocksize=args.block_size,
+        tail_silence=args.endpoint_silence + 1.0
+    )
+    audio_seconds = capture.duration - (args.endpoint_silence + 1.0)
+    stt._vad = None     # fresh noise floor per file, so results do not depend on order
+
+    cpu_start = time.process_time()
+    text = stt.record_voice(prompt=f"▶ {os.path.basename(wav_path)}", capture=capture)
+    returned = time.perf_counter()
+    cpu = time.process_time() - cpu_start
+
+    speech_end = stt.last_endpoint.get("speech_end")
+    readable = capture.readable_at(speech_end) if speech_end is not None else None
+    ref_words = words(reference)
+
+    return {
+        "file": os.path.basename(wav_path),
+        "text": text,
+        "ref_words": len(ref_words),
+        "errors": word_errors(ref_words, words(text)),
+        "eos_latency": returned - readable if readable is not None else None,
+        "reason": stt.last_endpoint.get("reason"),
+        "cpu": cpu,
+        "rtf": cpu / audio_seconds if audio_seconds > 0 else 0.0,
+    }
+
+
+def bench_model(label: str, path: str, fixtures: list, args):
+    print(f"\n=== {label} ({path}) ===")
+    stt.load_model(path)
+
+    results = []
+    for wav_path, reference in fixtures:
+        result = run_utterance(wav_path, reference, args)
+        results.append(result)
+        latency = f"{result['eos_latency'] * 1000:.0f} ms" if result["eos_latency"] is not None else "n/a"
+        print(f"  {result['file']}: WER {result['errors']}/{result['ref_words']} | "
+              f"EOS {latency} ({result['reason']}) | RTF {result['rtf']:.2f} | CPU {result['cpu']:.2f}s")
+        if result["errors"]:
+            print(f"      ref: {reference}\n      hyp: {result['text']}")
+
+    total_words = sum(r["ref_words"] for r in results)
+    total_errors = sum(r["errors"] for r in results)
+    latencies = sorted(r["eos_latency"] * 1000 for r in results if r["eos_latency"] is not None)
+
+    print(f"\n  WER:         {total_errors}/{total_words} = {total_errors / max(total_words, 1):.1%}")
+    if latencies:
+        p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+        print(f"  EOS latency: median {statistics.median(latencies):.0f} ms, "
+              f"p95 {p95:.0f} ms, max {latencies[-1]:.0f} ms")
+    print(f"  RTF:         mean {statistics.mean(r['rtf'] for r in results):.2f}")
+    print(f"  CPU:         mean {statistics.mean(r['cpu'] for r in results):.2f}s per utterance")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline STT benchmark for Kira")
+    parser.add_argument("fixtures", help="directory of .wav + .txt, or a TSV manifest")
+    parser.add_argument("--model", action="append",
+                        help="label=path of a Vosk model (repeatable, default MODEL_PATH)")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed, 0 = as fast as possible")
+    parser.add_argument("--block-size", type=int, default=stt.BLOCK_SIZE)
+    parser.add_argument("--endpoint-silence", type=float, default=stt.ENDPOINT_SILENCE)
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    if not fixtures:
+        sys.exit("No fixtures found")
+
+    stt.ENDPOINT_SILENCE = args.endpoint_silence
+    print(f"{len(fixtures)} utterances | speed {args.speed or 'max'} | "
+          f"block {args.block_size} samples | endpoint silence {args.endpoint_silence}s")
+
+    models = args.model or [f"default={stt.MODEL_PATH}"]
+    for entry in models:
+        label, _, path = entry.partition("=")
+        bench_model(label, path or label, fixtures, args)
+
+
+if __name__ == "__main__":
+    main()
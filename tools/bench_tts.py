@@ -0,0 +1,91 @@
+# tools/bench_tts.py
+"""
+Time to first audio and real-time factor of the TTS backends in tts.py.
+
+Each text is synthesized (not played, not cached) ROUNDS times per backend:
+
+    TTFA  request start -> first decoded samples
+    RTF   synthesis wall time / seconds of audio produced
+
+    python tools/bench_tts.py                    # every available backend
+    python tools/bench_tts.py --backend espeak --rounds 5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tts  # noqa: E402
+
+TEXTS = {
+    "short": "Apro WhatsApp Web.",
+    "medium": "Ecco il meteo per Milano, domani: sole al mattino e qualche nuvola nel pomeriggio.",
+    "long": (
+        "Il Colosseo, originariamente conosciuto come Anfiteatro Flavio, è il più grande "
+        "anfiteatro del mondo, situato nel centro della città di Roma. Fu costruito in epoca "
+        "flavia su un'area al limite orientale del Foro Romano e poteva contenere fino a "
+        "cinquantamila spettatori."
+    ),
+}
+
+
+async def measure(backend: tts.TTSBackend, text: str) -> tuple[float, float, float]:
+    """(time to first audio, total synthesis time, audio seconds)."""
+    samples = 0
+    first = None
+    start = time.perf_counter()
+
+    def sink(chunk):
+        nonlocal samples, first
+        if first is None and len(chunk):
+            first = time.perf_counter() - start
+        samples += len(chunk)
+
+    await backend.synthesize(tts.normalize_punctuation(text), sink)
+    return first or 0.0, time.perf_counter() - start, samples / tts.SAMPLE_RATE
+
+
+async def bench(backends: list, rounds: int):
+    print(f"{'backend':<8} {'text':<7} {'TTFA ms':>9} {'RTF':>6} {'audio s':>8}")
+    for backend in backends:
+        for label, text in TEXTS.items():
+            results = []
+            for _ in range(rounds):
+                try:
+                    results.append(await measure(backend, text))
+                except Exception as e:
+                    print(f"{backend.name:<8} {label:<7} error: {e}")
+                    break
+            if not results:
+                continue
+            ttfa = statistics.median(r[0] for r in results) * 1000
+            rtf = statistics.median(r[1] / r[2] for r in results if r[2] > 0) if any(r[2] for r in results) else 0.0
+            audio = statistics.median(r[2] for r in results)
+            print(f"{backend.name:<8} {label:<7} {ttfa:>9.0f} {rtf:>6.2f} {audio:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTS backend benchmark for Kira")
+    parser.add_argument("--backend", action="append", choices=sorted(tts.BACKENDS),
+                        help="backend to measure (repeatable, default: all available)")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    names = args.backend or list(tts.BACKENDS)
+    backends = [tts.BACKENDS[name] for name in names if tts.BACKENDS[name].available()]
+    skipped = sorted(set(names) - {b.name for b in backends})
+    if skipped:
+        print(f"Not available here: {', '.join(skipped)}")
+    if not backends:
+        sys.exit("No TTS backend available")
+
+    asyncio.run(bench(backends, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# tools/check_hedging.py
+"""
+Scenario checks for the hedged model chain in llm.get_llm_output.
+
+Starts tools/fake_openrouter.py in-process and runs each scenario in
+streaming and non-streaming mode, checking which model answered and that
+slow or broken models do not cost their full latency. When streaming, what
+the callbacks delivered after the last on_discard must be exactly the
+winner's reply: one intent and its sentences, nothing from a failed model.
+
+    python tools/check_hedging.py
+"""
+
+import os
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+from fake_openrouter import FakeOpenRouterHandler, DEFAULT_REPLY  # noqa: E402
+
+SLOW_DELAY = 3.0
+HEDGE_DELAY = 0.5
+
+# (name, model chain, expected winner or None for "all failed", max seconds)
+SCENARIOS = [
+    ("single fast model", ["fake-good"], "fake-good", 1.5),
+    ("slow first model is hedged", ["fake-slow", "fake-good"], "fake-good", SLOW_DELAY - 0.5),
+    ("empty reply fails over", ["fake-empty", "fake-good"], "fake-good", 1.5 + HEDGE_DELAY),
+    ("non-JSON reply fails over", ["fake-broken", "fake-good"], "fake-good", 2.0 + HEDGE_DELAY),
+    ("HTTP 500 fails over", ["fake-error", "fake-good"], "fake-good", 1.5),
+    ("stream dropped halfway fails over", ["fake-drop", "fake-good"], "fake-good", 2.5),
+    ("two bad models, third answers", ["fake-empty", "fake-error", "fake-good"], "fake-good", 2.0),
+    ("everything broken", ["fake-empty", "fake-broken"], None, 3.0),
+]
+
+
+def expected_callbacks(output: dict) -> list:
+    """Callback events a caller should be left with for this reply."""
+    from llm import SentenceSplitter
+
+    sentences = []
+    splitter = SentenceSplitter(sentences.append)
+    splitter.feed(output["text"])
+    splitter.flush()
+    return [("intent", output["intent"])] + [("sentence", s) for s in sentences]
+
+
+def main():
+    FakeOpenRouterHandler.slow_delay = SLOW_DELAY
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenRouterHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    os.environ["OPENROUTER_URL"] = f"http://127.0.0.1:{server.server_port}/api/v1/chat/completions"
+    os.environ["OPENROUTER_API_KEY"] = "fake"
+
+    import http_client
+    import llm
+
+    http_client.LOG_TIMING = False
+    llm.HEDGE_DELAY = HEDGE_DELAY
+    llm.response_cache.get = lambda *args: None      # always hit the server
+    llm.response_cache.put = lambda *args: None
+
+    failures = 0
+    for stream in (True, False):
+        llm.STREAM = stream
+        print(f"\n=== stream={stream} ===")
+        for name, models, expected, max_seconds in SCENARIOS:
+            llm.MODELS = models
+            heard = []
+            start = time.perf_counter()
+            output = llm.get_llm_output(
+                "apri chrome",
+                on_intent=lambda intent, parameters, settled: heard.append(("intent", intent)),
+                on_sentence=lambda sentence: heard.append(("sentence", sentence)),
+                on_discard=heard.clear
+            )
+            elapsed = time.perf_counter() - start
+            info = llm.get_last_call_info()
+            winner = info.get("model")
+
+            ok = winner == expected and elapsed <= max_seconds
+            if expected is None:
+                ok = ok and output["intent"] == "chat"
+            elif output.get("text") != DEFAULT_REPLY["text"]:
+                # Non-ASCII text must survive the SSE decoding unchanged
+                print(f"   text mangled: {output.get('text')!r}")
+                ok = False
+            elif stream and heard != expected_callbacks(output):
+                print(f"   callbacks out of step with the reply: {heard}")
+                ok = False
+            failures += not ok
+            print(f"{'✅' if ok else '❌'} {name}: winner={winner} in {elapsed:.2f}s "
+                  f"(limit {max_seconds:.1f}s) attempts={info.get('attempts')}")
+
+    server.shutdown()
+    print(f"\n{'All scenarios passed' if not failures else f'{failures} scenario(s) failed'}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# tools/fake_openrouter.py
+"""
+Local fake of the OpenRouter chat completions endpoint.
+
+Serves a canned JSON reply, either in one piece or as an SSE stream
+(when the request has "stream": true), so llm.py can be exercised offline:
+
+    python tools/fake_openrouter.py --port 8765
+    set OPENROUTER_URL=http://127.0.0.1:8765/api/v1/chat/completions
+    set OPENROUTER_API_KEY=fake
+
+The model name selects a misbehaviour, to exercise the fallback chain:
+    "...slow..."   first token after --slow-delay seconds
+    "...empty..."  empty content
+    "...broken..." plain text instead of JSON
+    "...error..."  HTTP 500
+    "...drop..."   connection dropped halfway through the streamed reply
+e.g. set OPENROUTER_MODELS=fake-slow,fake-empty,fake-good
+"""
+
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = {
+    "intent": "open_app",
+    "parameters": {"app_name": "Chrome", "search_query": None},
+    "needs_clarification": False,
+    "text": "Sì, apro Chrome. Dimmi pure se vuoi cercare qualcosa: è già pronto.",
+    "memory_update": None
+}
+
+
+class FakeOpenRouterHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so the client can keep the connection alive between requests
+    protocol_version = "HTTP/1.1"
+    reply_text = json.dumps(DEFAULT_REPLY, ensure_ascii=False)
+    chunk_size = 8          # characters per SSE delta
+    chunk_delay = 0.03      # seconds between deltas
+    first_token_delay = 0.3
+    slow_delay = 5.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            payload = {}
+
+        model = payload.get("model", "fake-model")
+
+        if "error" in model:
+            body = json.dumps({"error": {"code": 500, "message": "fake upstream error"}}).encode("utf-8")
+            self.send_response(500)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        if payload.get("stream"):
+            self._send_stream(model)
+        else:
+            self._send_full(model)
+
+    def _reply_for(self, model: str) -> str:
+        if "empty" in model:
+            return ""
+        if "broken" in model:
+            return "Certo Sir, ecco cosa ho trovato per te."
+        if "drop" in model:
+            return self.reply_text[:len(self.reply_text) * 3 // 4]
+        return self.reply_text
+
+    def _delay_for(self, model: str) -> float:
+        return self.slow_delay if "slow" in model else self.first_token_delay
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _send_full(self, model: str):
+        time.sleep(self._delay_for(model))
+        body = json.dumps({
+            "model": model,
+            "choices": [{"message": {"role": "assistant", "content": self._reply_for(model)}}]
+        }, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, model: str):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        self._write_event(": OPENROUTER PROCESSING")
+        try:
+            time.sleep(self._delay_for(model))
+
+            text = self._reply_for(model)
+            for i in range(0, len(text), self.chunk_size):
+                event = {
+                    "model": model,
+                    "choices": [{"delta": {"content": text[i:i + self.chunk_size]}}]
+                }
+                # Raw UTF-8 like the real API, not \u escapes
+                self._write_event("data: " + json.dumps(event, ensure_ascii=False))
+                time.sleep(self.chunk_delay)
+
+            if "drop" in model:
+                # No [DONE], no final chunk: the client sees a broken stream
+                self.close_connection = True
+                return
+
+            self._write_event("data: [DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client cancelled this (hedged) request
+            pass
+
+    def _write_event(self, line: str):
+        data = (line + "\n\n").encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenRouter server for Kira")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--reply", help="JSON reply the fake model returns")
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--chunk-delay", type=float, default=0.03)
+    parser.add_argument("--slow-delay", type=float, default=5.0)
+    args = parser.parse_args()
+
+    if args.reply:
+        FakeOpenRouterHandler.reply_text = args.reply
+    FakeOpenRouterHandler.first_token_delay = args.first_token_delay
+    FakeOpenRouterHandler.chunk_delay = args.chunk_delay
+    FakeOpenRouterHandler.slow_delay = args.slow_delay
+
+    server = ThreadingHTTPServer((args.host, args.port), FakeOpenRouterHandler)
+    print(f"Fake OpenRouter on http://{args.host}:{args.port}/api/v1/chat/completions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,76 @@
 import io
+import os
+import json
+import hashlib
 import threading
 import asyncio
 import re
+import shutil
+import itertools
+import subprocess
+import time
+from concurrent.futures import Future
+from collections import deque, OrderedDict
+import numpy as np
 import edge_tts
-import sounddevice as sd
 import soundfile as sf
+from audio_mixer import mixer, playback_reference  # noqa: F401  (playback_reference is re-exported)
 
 VOICE = "it-IT-ElsaNeural"
+PITCH = "+2Hz"
+RATE = "+8%"
+
+# Streaming playback: MP3 chunks from edge-tts are decoded by an ffmpeg
+# subprocess while they arrive and played through a jitter buffer.
+# Without ffmpeg (or with STREAMING = False) the whole reply is buffered,
+# decoded once with soundfile and then played.
+STREAMING = True
+FFMPEG_PATH = shutil.which("ffmpeg")
+SAMPLE_RATE = 24000            # edge-tts default output (24 kHz mono MP3), also the mixer rate
+JITTER_PREBUFFER = 0.15        # seconds queued before playback starts
+JITTER_MAX_SECONDS = 3.0       # decoder blocks when this much audio is waiting
+OUTPUT_BLOCK = 2048            # frames per write to the mixer voice channel
+
+# Long replies are synthesized sentence by sentence: the next sentences are
+# requested while the current one plays, so the first one is heard after
+# about the same time whatever the total length.
+PIPELINE_SENTENCES = True
+SYNTH_CONCURRENCY = 2          # segments synthesizing or waiting to play
+MIN_SEGMENT_CHARS = 25         # shorter sentences are merged with a neighbour
+SEGMENT_GAP = 0.08             # seconds of leading silence kept between segments
+SILENCE_LEVEL = 0.01           # |sample| below this counts as silence when joining
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?…])\s+")
+
+# Decoded segments are cached on disk (raw float32 at SAMPLE_RATE), keyed on
+# text + voice settings, so recurring phrases skip the network entirely.
+CACHE_ENABLED = True
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "core", "tts_cache")
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+CACHE_CHUNK = SAMPLE_RATE // 4     # frames per chunk handed to the player on a hit
+
+# Backends: edge-tts (network, neural voices) and a local engine (Piper if
+# configured, else eSpeak NG). TTS_BACKEND = "edge", "local" or "auto";
+# auto sends texts up to LOCAL_MAX_CHARS (short confirmations) to Piper and
+# longer answers to edge-tts; without Piper it is the same as edge (eSpeak
+# is too robotic to alternate with). When edge-tts fails the local engine
+# is tried.
+TTS_BACKEND = os.getenv("TTS_BACKEND", "edge")
+LOCAL_MAX_CHARS = 60
+PIPER_PATH = shutil.which("piper")
+PIPER_MODEL = os.getenv("PIPER_MODEL")          # e.g. it_IT-paola-medium.onnx
+ESPEAK_PATH = shutil.which("espeak-ng") or shutil.which("espeak")
+ESPEAK_VOICE = "it"
+ESPEAK_SPEED = 175                              # words per minute
+
+# Utterance priorities for the speech worker (lower is spoken first)
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
 
 stop_speaking_flag = threading.Event()
 
+# Timing of the last utterance (time to first audio, mode, underruns)
+last_speech_timing = {}
+
 
 def normalize_punctuation(text: str) -> str:
     """Optimize text for better TTS flow."""
@@ -23,78 +84,782 @@ def normalize_punctuation(text: str) -> str:
     return text.strip()
 
 
+class PcmCache:
+    """
+    Content-addressed cache of decoded speech: one .pcm file per
+    (text, backend voice settings, sample rate), evicted least recently used
+    once the directory exceeds max_bytes. Hits are memory-mapped, so
+    playback can start before the file is read.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._index = None          # key -> size, oldest first
+        self._total = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text: str, voice_id: str) -> str:
+        payload = json.dumps([text, voice_id, SAMPLE_RATE], ensure_ascii=False)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".pcm")
+
+    def _load_index(self):
+        if self._index is not None:
+            return
+        entries = []
+        try:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".pcm"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        except FileNotFoundError:
+            pass
+        entries.sort()
+        self._index = OrderedDict((key, size) for _, key, size in entries)
+        self._total = sum(self._index.values())
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            self._load_index()
+            return key in self._index
+
+    def get(self, key: str) -> np.ndarray | None:
+        with self._lock:
+            self._load_index()
+            if not self._index.get(key):
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+        path = self._path(key)
+        try:
+            os.utime(path)          # file mtime is the LRU order across restarts
+            return np.memmap(path, dtype=np.float32, mode="r")
+        except (OSError, ValueError):
+            with self._lock:
+                self._total -= self._index.pop(key, 0)
+            return None
+
+    def put(self, key: str, samples: np.ndarray):
+        data = np.ascontiguousarray(samples, dtype=np.float32).tobytes()
+        if not data or len(data) > self.max_bytes:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = self._path(key) + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"⚠️ TTS cache write failed: {e}")
+            return
+
+        with self._lock:
+            self._load_index()
+            self._total += len(data) - self._index.pop(key, 0)
+            self._index[key] = len(data)
+            while self._total > self.max_bytes and len(self._index) > 1:
+                old_key, size = self._index.popitem(last=False)
+                self._total -= size
+                try:
+                    os.remove(self._path(old_key))
+                except OSError:
+                    pass    # still mapped by a playing utterance (Windows)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._load_index()
+            return {
+                "entries": len(self._index),
+                "bytes": self._total,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+pcm_cache = PcmCache()
+
+
+class SpeechWorker:
+    """
+    One long-lived thread and event loop that speaks every utterance.
+
+    Utterances wait in a priority queue (FIFO within a priority), so
+    edge_speak calls from different action threads are spoken in order
+    instead of racing for the output device. Each speak() returns a
+    concurrent.futures.Future that completes when the utterance has been
+    played (or stopped); cancelling it drops a queued utterance.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self._queue = None
+        self._seq = itertools.count()
+        self._current = None
+        self._ready = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self.loop is None:
+                threading.Thread(target=self._thread, name="speech-worker", daemon=True).start()
+                self._ready.wait()
+
+    def _thread(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._queue = asyncio.PriorityQueue()
+        self.loop.create_task(self._run())
+        self._ready.set()
+        self.loop.run_forever()
+
+    def speak(self, text: str, ui=None, priority: int = PRIORITY_NORMAL, replace: bool = False,
+              backend: "TTSBackend" = None) -> Future:
+        """
+        Queue text and return its future (non-blocking).
+        replace=True drops everything queued and stops the current utterance first.
+        backend overrides route(text), to keep one voice across several utterances.
+        """
+        self.start()
+        future = Future()
+        self.loop.call_soon_threadsafe(self._submit, text, ui, priority, replace, backend, future)
+        return future
+
+    def speak_stream(self, ui=None, priority: int = PRIORITY_NORMAL,
+                     backend: "TTSBackend" = None) -> "SpeechStream":
+        """Queue an utterance whose sentences are added later (see SpeechStream)."""
+        self.start()
+        stream = SpeechStream(self.loop)
+        stream.future = self.speak(stream, ui, priority, backend=backend)
+        return stream
+
+    def _submit(self, text, ui, priority, replace, backend, future):
+        if replace:
+            self._cancel_all()
+        self._queue.put_nowait((priority, next(self._seq), text, ui, backend, future))
+
+    def cancel(self, future: Future):
+        """Drop a queued utterance, or stop it if it is being spoken."""
+        if not future.cancel() and future is self._current:
+            stop_speaking_flag.set()
+
+    def cancel_all(self):
+        """Drop every queued utterance and stop the current one."""
+        stop_speaking_flag.set()
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._cancel_all)
+
+    def _cancel_all(self):
+        while not self._queue.empty():
+            self._queue.get_nowait()[-1].cancel()
+        if self._current is not None:
+            stop_speaking_flag.set()
+
+    async def _run(self):
+        while True:
+            _, _, text, ui, backend, future = await self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            self._current = future
+            if ui:
+                ui.start_speaking()
+            stop_speaking_flag.clear()
+            try:
+                await _async_speak(text, ui, backend)
+                future.set_result(not stop_speaking_flag.is_set())
+            except Exception as e:
+                print("VOICE ERROR:", e)
+                future.set_exception(e)
+            finally:
+                self._current = None
+                if ui:
+                    ui.stop_speaking()
+
+
+class SpeechStream:
+    """
+    One utterance whose text arrives a sentence at a time (a streamed LLM
+    reply). Sentences join the segment pipeline of _async_speak as they are
+    added, so the next one is synthesized while the current one plays and
+    the output is drained once, after close(). add() and close() can be
+    called from any thread; future completes like the one of speak().
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.future = None
+        self._loop = loop
+        self._sentences = asyncio.Queue()
+
+    def add(self, sentence: str):
+        if sentence and sentence.strip():
+            self._loop.call_soon_threadsafe(self._sentences.put_nowait, sentence.strip())
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._sentences.put_nowait, None)
+
+    async def next_sentence(self) -> str | None:
+        """The next sentence; None once closed or when speech is stopped."""
+        while not stop_speaking_flag.is_set():
+            try:
+                return await asyncio.wait_for(self._sentences.get(), 0.05)
+            except asyncio.TimeoutError:
+                continue
+        return None
+
+
+speech_worker = SpeechWorker()
+
+
+def speak_stream(ui=None, priority: int = PRIORITY_NORMAL, backend: "TTSBackend" = None) -> SpeechStream:
+    """Queue a streamed utterance on the speech worker: add() sentences, then close()."""
+    return speech_worker.speak_stream(ui, priority, backend)
+
+
+def speak_async(text: str, ui=None, priority: int = PRIORITY_NORMAL, replace: bool = False,
+                backend: "TTSBackend" = None) -> Future | None:
+    """Queue text on the speech worker; the future resolves to False if it was stopped."""
+    if not text or not text.strip():
+        return None
+    return speech_worker.speak(text, ui, priority, replace, backend)
+
+
 def edge_speak(text: str, ui=None, blocking=True):
-    if not text.strip():
+    future = speak_async(text, ui)
+    if future is None or not blocking:
         return
 
-    finished_event = threading.Event()
+    try:
+        future.result()
+    except Exception:
+        pass    # already reported by the worker
+
+
+class JitterBuffer:
+    """
+    Bounded queue of decoded float32 samples between the decoder and the
+    output stream. Reads are held back until JITTER_PREBUFFER seconds are
+    queued (or the input is complete), so a slow network chunk does not
+    turn into a gap at the start of playback.
+    """
+
+    def __init__(self, samplerate: int = SAMPLE_RATE, prebuffer: float = JITTER_PREBUFFER,
+                 max_seconds: float = JITTER_MAX_SECONDS):
+        self.prebuffer_samples = int(prebuffer * samplerate)
+        self.max_samples = int(max_seconds * samplerate)
+        self._chunks = deque()
+        self._queued = 0
+        self._closed = False
+        self._started = False
+        self._starved = False
+        self._cond = threading.Condition()
+        self.underruns = 0
+
+    def put(self, samples: np.ndarray):
+        with self._cond:
+            while self._queued >= self.max_samples and not stop_speaking_flag.is_set():
+                self._cond.wait(0.05)
+            self._chunks.append(samples)
+            self._queued += len(samples)
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def get(self, frames: int) -> np.ndarray | None:
+        """Up to frames samples; None once closed and drained (or stopped)."""
+        with self._cond:
+            while not stop_speaking_flag.is_set():
+                ready = self._queued >= (self.prebuffer_samples if not self._started else 1)
+                if ready or (self._closed and self._queued):
+                    break
+                if self._closed:
+                    return None
+                if self._started:
+                    self._starved = True
+                    self._started = False   # refill the prebuffer before resuming
+                self._cond.wait(0.05)
+            else:
+                return None
+
+            if self._starved:
+                # Counted on resume: running dry right before close() is not a gap
+                self.underruns += 1
+                self._starved = False
+            self._started = True
+            out = []
+            needed = frames
+            while needed and self._chunks:
+                chunk = self._chunks[0]
+                if len(chunk) <= needed:
+                    out.append(self._chunks.popleft())
+                    needed -= len(chunk)
+                else:
+                    out.append(chunk[:needed])
+                    self._chunks[0] = chunk[needed:]
+                    needed = 0
+            block = np.concatenate(out)
+            self._queued -= len(block)
+            self._cond.notify_all()
+            return block
 
-    def _thread():
-        if ui:
-            ui.start_speaking()
-        stop_speaking_flag.clear()
 
+def _play_from_buffer(buffer: JitterBuffer, timing: dict):
+    """Feed the voice channel of the shared mixer until the buffer is drained."""
+    while True:
+        block = buffer.get(OUTPUT_BLOCK)
+        if block is None:
+            break
+        if "first_audio" not in timing:
+            timing["first_audio"] = time.perf_counter()
+        if not mixer.write_voice(block, abort=stop_speaking_flag):
+            break
+
+    if not mixer.wait_voice_drained(abort=stop_speaking_flag):
+        mixer.clear_voice()
+
+
+def _report_timing(timing: dict, mode: str, underruns: int = 0, segments: int = 1):
+    last_speech_timing.clear()
+    last_speech_timing["mode"] = mode
+    last_speech_timing["underruns"] = underruns
+    last_speech_timing["segments"] = segments
+    if "first_audio" in timing:
+        last_speech_timing["first_audio"] = timing["first_audio"] - timing["start"]
+        print(f"🔊 First audio after {last_speech_timing['first_audio'] * 1000:.0f} ms ({mode}, "
+              f"{segments} segment{'s' if segments != 1 else ''}"
+              f"{f', {underruns} underruns' if underruns else ''})")
+
+
+def split_segments(text: str) -> list[str]:
+    """Sentences to synthesize separately; very short ones stay with their neighbour."""
+    segments = []
+    for sentence in _SENTENCE_SPLIT_RE.split(text.strip()):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if segments and len(segments[-1]) < MIN_SEGMENT_CHARS:
+            segments[-1] = f"{segments[-1]} {sentence}"
+        else:
+            segments.append(sentence)
+    if len(segments) > 1 and len(segments[-1]) < MIN_SEGMENT_CHARS:
+        segments[-2] = f"{segments[-2]} {segments.pop()}"
+    return segments
+
+
+async def _async_speak(text: "str | SpeechStream", ui=None, backend: "TTSBackend" = None):
+    """
+    Internal async function that speaks one utterance.
+
+    The text is split into sentences (or, for a SpeechStream, taken as they
+    are added); up to SYNTH_CONCURRENCY of them are synthesized ahead while
+    earlier ones play, and all of them go, in order, through one
+    JitterBuffer into the output stream. The backend is chosen once per
+    utterance (from the first sentence of a stream, if not passed in), so
+    the voice never changes mid-reply.
+    """
+    if isinstance(text, SpeechStream):
+        stream = text
+    else:
+        stream = SpeechStream(asyncio.get_running_loop())
+        for segment in split_segments(text) if PIPELINE_SENTENCES else [text.strip()]:
+            stream._sentences.put_nowait(segment)
+        stream._sentences.put_nowait(None)
+        backend = backend or route(text)
+
+    timing = {"start": time.perf_counter()}
+    buffer = JitterBuffer()
+    player = threading.Thread(target=_play_from_buffer, args=(buffer, timing), daemon=True)
+    player.start()
+
+    # A segment holds a slot from synthesis start until it is handed to the player
+    slots = asyncio.Semaphore(SYNTH_CONCURRENCY)
+    queues = asyncio.Queue()    # one sample queue per segment, in order, then None
+    tasks = []
+
+    async def _feed():
+        nonlocal backend
         try:
-            # Run async edge_tts in sync context
-            asyncio.run(_async_speak(text, ui))
-        except Exception as e:
-            print("VOICE ERROR:", e)
+            while (segment := await stream.next_sentence()) is not None:
+                backend = backend or route(segment)
+                queue = asyncio.Queue()
+                tasks.append(asyncio.create_task(_synthesize(segment, queue, slots, backend)))
+                queues.put_nowait(queue)
         finally:
-            if ui:
-                ui.stop_speaking()
-            finished_event.set()
+            queues.put_nowait(None)
+
+    feeder = asyncio.create_task(_feed())
+    segments = 0
+
+    try:
+        while (queue := await queues.get()) is not None:
+            trim = segments > 0   # join sentences without the encoder's leading silence
+            segments += 1
+            while True:
+                samples = await queue.get()
+                if samples is None or stop_speaking_flag.is_set():
+                    break
+                if trim:
+                    samples, trim = _trim_leading_silence(samples)
+                    if samples is None:
+                        continue
+                await asyncio.to_thread(buffer.put, samples)
+            slots.release()
+            if stop_speaking_flag.is_set():
+                break
+    finally:
+        buffer.close()
+        feeder.cancel()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(feeder, *tasks, return_exceptions=True)
+
+    await asyncio.to_thread(player.join)
+    if backend is not None:
+        _report_timing(timing, backend.mode(), buffer.underruns, segments)
+
+
+async def _synthesize(segment: str, queue: asyncio.Queue, slots: asyncio.Semaphore, backend: "TTSBackend"):
+    """Synthesize one segment into queue as float32 chunks, then None."""
+    await slots.acquire()
+    try:
+        text = normalize_punctuation(segment)
+        key = pcm_cache.key(text, backend.voice_id()) if CACHE_ENABLED else None
 
-    threading.Thread(target=_thread, daemon=True).start()
+        cached = pcm_cache.get(key) if key else None
+        if cached is not None:
+            for start in range(0, len(cached), CACHE_CHUNK):
+                queue.put_nowait(cached[start:start + CACHE_CHUNK])
+            return
 
-    if blocking:
-        finished_event.wait()
+        decoded = []
 
+        def _sink(samples: np.ndarray):
+            decoded.append(samples)
+            queue.put_nowait(samples)
+
+        try:
+            await backend.synthesize(text, _sink)
+        except Exception as e:
+            fallback = local_backend()
+            if decoded or fallback is None or backend is fallback:
+                raise
+            # Offline or edge-tts down: say it with the local voice (not cached under this key)
+            print(f"⚠️ {backend.name} failed ({e}), using {fallback.name}")
+            key = None
+            await fallback.synthesize(text, _sink)
+
+        # Only complete segments are cached
+        if key and decoded and not stop_speaking_flag.is_set():
+            await asyncio.to_thread(pcm_cache.put, key, np.concatenate(decoded))
+    except Exception as e:
+        print("VOICE ERROR:", e)
+    finally:
+        queue.put_nowait(None)
 
-async def _async_speak(text: str, ui=None):
-    """Internal async function to handle edge-tts with optimized buffering."""
-    optimized_text = normalize_punctuation(text)
 
-    communicate = edge_tts.Communicate(
-        optimized_text,
-        VOICE,
-        pitch="+2Hz",
-        rate="+8%"
+def _trim_leading_silence(samples: np.ndarray):
+    """(rest of chunk from just before the first sound, still_trimming)."""
+    loud = np.flatnonzero(np.abs(samples) > SILENCE_LEVEL)
+    if loud.size == 0:
+        return None, True
+    start = max(0, loud[0] - int(SEGMENT_GAP * SAMPLE_RATE))
+    return samples[start:], False
+
+
+async def _decode_streaming(communicate: edge_tts.Communicate, sink):
+    """Pipe MP3 chunks into ffmpeg as they arrive; decoded PCM goes to sink (on the loop)."""
+    loop = asyncio.get_running_loop()
+    decoder = subprocess.Popen(
+        [FFMPEG_PATH, "-hide_banner", "-loglevel", "error",
+         "-f", "mp3", "-i", "pipe:0",
+         "-f", "f32le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
     )
 
+    def _read_pcm():
+        # Whatever is decoded (up to ~50 ms), without waiting for a full read
+        chunk_bytes = int(SAMPLE_RATE * 0.05) * 4
+        rest = b""
+        while not stop_speaking_flag.is_set():
+            data = decoder.stdout.read1(chunk_bytes)
+            if not data:
+                break
+            data = rest + data
+            usable = len(data) - len(data) % 4
+            rest = data[usable:]
+            if usable:
+                samples = np.frombuffer(data[:usable], dtype=np.float32)
+                loop.call_soon_threadsafe(sink, samples)
+        if stop_speaking_flag.is_set():
+            decoder.kill()   # unblocks a pending stdin write
+
+    reader = threading.Thread(target=_read_pcm, daemon=True)
+    reader.start()
+
+    try:
+        async for chunk in communicate.stream():
+            if stop_speaking_flag.is_set():
+                break
+            if chunk["type"] == "audio":
+                try:
+                    await asyncio.to_thread(decoder.stdin.write, chunk["data"])
+                except OSError:
+                    break   # decoder killed by stop_speaking
+    finally:
+        try:
+            decoder.stdin.close()
+        except OSError:
+            pass
+        if stop_speaking_flag.is_set():
+            decoder.kill()
+        await asyncio.to_thread(reader.join)
+        decoder.wait()
+
+
+async def _decode_buffered(communicate: edge_tts.Communicate, sink):
+    """Collect the whole segment, decode once (fallback without ffmpeg)."""
     # Accumula tutto l'audio - più stabile, evita errori di decodifica
     audio_buffer = bytearray()
 
     async for chunk in communicate.stream():
         if stop_speaking_flag.is_set():
-            break
+            return
         if chunk["type"] == "audio":
             audio_buffer.extend(chunk["data"])
 
-    if stop_speaking_flag.is_set() or len(audio_buffer) == 0:
+    if not audio_buffer:
         return
 
-    # Decodifica una volta sola quando abbiamo tutto l'audio
-    wav_bytes = io.BytesIO(bytes(audio_buffer))
-
     try:
-        data, samplerate = sf.read(wav_bytes, dtype="float32")
+        data, samplerate = sf.read(io.BytesIO(bytes(audio_buffer)), dtype="float32", always_2d=True)
     except Exception as e:
         print(f"Audio decode error: {e}")
         return
 
-    # Riproduci tutto l'audio
-    channels = data.shape[1] if len(data.shape) > 1 else 1
-    with sd.OutputStream(
-        samplerate=samplerate,
-        channels=channels,
-        dtype="float32"
-    ) as stream:
-        block_size = 2048
-        for start in range(0, len(data), block_size):
-            if stop_speaking_flag.is_set():
+    sink(_to_output_format(data, samplerate))
+
+
+def _to_output_format(data: np.ndarray, samplerate: int) -> np.ndarray:
+    """Mono float32 at SAMPLE_RATE (the rate of the shared output stream)."""
+    data = data.mean(axis=1) if data.ndim > 1 else data
+    if samplerate != SAMPLE_RATE and data.size:
+        positions = np.arange(0, data.size * SAMPLE_RATE / samplerate) * samplerate / SAMPLE_RATE
+        data = np.interp(positions, np.arange(data.size), data)
+    return np.ascontiguousarray(data, dtype=np.float32)
+
+
+class TTSBackend:
+    """
+    A speech engine. synthesize() delivers mono float32 PCM at SAMPLE_RATE
+    to sink (called on the event loop) as it is produced.
+    """
+
+    name = "base"
+
+    def available(self) -> bool:
+        return True
+
+    def voice_id(self) -> str:
+        """Everything that changes the audio, for the PCM cache key."""
+        return self.name
+
+    def mode(self) -> str:
+        return self.name
+
+    async def synthesize(self, text: str, sink):
+        raise NotImplementedError
+
+
+class EdgeTTSBackend(TTSBackend):
+    """Microsoft Edge neural voices over the network (edge-tts)."""
+
+    name = "edge"
+
+    def voice_id(self) -> str:
+        return f"edge:{VOICE}:{PITCH}:{RATE}"
+
+    def mode(self) -> str:
+        return "edge streaming" if STREAMING and FFMPEG_PATH else "edge buffered"
+
+    async def synthesize(self, text: str, sink):
+        communicate = edge_tts.Communicate(text, VOICE, pitch=PITCH, rate=RATE)
+        if STREAMING and FFMPEG_PATH:
+            await _decode_streaming(communicate, sink)
+        else:
+            await _decode_buffered(communicate, sink)
+
+
+class _LinearResampler:
+    """Streaming linear resampler (chunk boundaries are interpolated across)."""
+
+    def __init__(self, src_rate: int, dst_rate: int = SAMPLE_RATE):
+        self.step = src_rate / dst_rate
+        self.pos = 0.0
+        self.tail = None
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        if self.step == 1.0:
+            return samples
+        data = samples if self.tail is None else np.concatenate(([self.tail], samples))
+        if len(data) < 2:
+            self.tail = data[-1] if len(data) else self.tail
+            return np.zeros(0, dtype=np.float32)
+        positions = np.arange(self.pos, len(data) - 1, self.step)
+        out = np.interp(positions, np.arange(len(data)), data).astype(np.float32)
+        next_pos = positions[-1] + self.step if len(positions) else self.pos
+        self.pos = next_pos - (len(data) - 1)
+        self.tail = data[-1]
+        return out
+
+
+async def _stream_subprocess(cmd: list, stdin_text: str | None, src_rate: int, sink, skip_bytes: int = 0):
+    """Run a TTS command that writes int16 mono PCM to stdout; resampled chunks go to sink."""
+    loop = asyncio.get_running_loop()
+    process = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE if stdin_text is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    if stdin_text is not None:
+        process.stdin.write(stdin_text.encode("utf-8"))
+        process.stdin.close()
+
+    def _read_pcm():
+        resampler = _LinearResampler(src_rate)
+        to_skip = skip_bytes
+        rest = b""
+        while not stop_speaking_flag.is_set():
+            data = process.stdout.read1(8192)
+            if not data:
                 break
-            stream.write(data[start:start + block_size])
+            if to_skip:
+                skipped = min(to_skip, len(data))
+                data, to_skip = data[skipped:], to_skip - skipped
+            data = rest + data
+            usable = len(data) - len(data) % 2
+            rest = data[usable:]
+            if usable:
+                samples = np.frombuffer(data[:usable], dtype=np.int16).astype(np.float32) / 32768.0
+                loop.call_soon_threadsafe(sink, resampler.process(samples))
+        if stop_speaking_flag.is_set():
+            process.kill()
+
+    await asyncio.to_thread(_read_pcm)
+    returncode = await asyncio.to_thread(process.wait)
+    if returncode and not stop_speaking_flag.is_set():
+        raise RuntimeError(f"{os.path.basename(cmd[0])} exited with code {returncode}")
+
+
+class PiperBackend(TTSBackend):
+    """Piper neural TTS (ONNX, CPU) via its command line, raw PCM on stdout."""
+
+    name = "piper"
+
+    def __init__(self, model_path: str = PIPER_MODEL):
+        self.model_path = model_path
+        self.sample_rate = 22050
+        try:
+            with open(f"{model_path}.json", encoding="utf-8") as f:
+                self.sample_rate = json.load(f)["audio"]["sample_rate"]
+        except (OSError, KeyError, TypeError, ValueError):
+            pass
+
+    def available(self) -> bool:
+        return bool(PIPER_PATH and self.model_path and os.path.exists(self.model_path))
+
+    def voice_id(self) -> str:
+        return f"piper:{os.path.basename(self.model_path or '')}"
+
+    async def synthesize(self, text: str, sink):
+        await _stream_subprocess(
+            [PIPER_PATH, "--model", self.model_path, "--output-raw"],
+            text, self.sample_rate, sink
+        )
+
+
+class EspeakBackend(TTSBackend):
+    """eSpeak NG formant synthesizer: robotic, but instant and always offline."""
+
+    name = "espeak"
+    sample_rate = 22050
+    header_bytes = 44      # WAV header in front of the PCM on --stdout
+
+    def available(self) -> bool:
+        return bool(ESPEAK_PATH)
+
+    def voice_id(self) -> str:
+        return f"espeak:{ESPEAK_VOICE}:{ESPEAK_SPEED}"
+
+    async def synthesize(self, text: str, sink):
+        await _stream_subprocess(
+            [ESPEAK_PATH, "-v", ESPEAK_VOICE, "-s", str(ESPEAK_SPEED), "--stdout", text],
+            None, self.sample_rate, sink, skip_bytes=self.header_bytes
+        )
+
+
+BACKENDS = {
+    "edge": EdgeTTSBackend(),
+    "piper": PiperBackend(),
+    "espeak": EspeakBackend(),
+}
+
+
+def local_backend() -> TTSBackend | None:
+    """Best available local engine (Piper, then eSpeak NG)."""
+    for name in ("piper", "espeak"):
+        if BACKENDS[name].available():
+            return BACKENDS[name]
+    return None
+
+
+def route(text: str) -> TTSBackend:
+    """Backend for one utterance, following TTS_BACKEND."""
+    local = local_backend()
+    if TTS_BACKEND == "local" and local:
+        return local
+    piper = BACKENDS["piper"]
+    if TTS_BACKEND == "auto" and piper.available() and len(text.strip()) <= LOCAL_MAX_CHARS:
+        return piper
+    if TTS_BACKEND in BACKENDS and BACKENDS[TTS_BACKEND].available():
+        return BACKENDS[TTS_BACKEND]
+    return BACKENDS["edge"]
+
+
+def prewarm(phrases):
+    """Synthesize phrases missing from the cache in the background (nothing is played)."""
+    if not CACHE_ENABLED:
+        return
+
+    async def _prewarm():
+        slots = asyncio.Semaphore(1)
+        warmed = 0
+        for phrase in phrases:
+            backend = route(phrase)
+            for segment in split_segments(phrase):
+                if pcm_cache.contains(pcm_cache.key(normalize_punctuation(segment), backend.voice_id())):
+                    continue
+                queue = asyncio.Queue()
+                await _synthesize(segment, queue, slots, backend)
+                slots.release()
+                warmed += 1
+        if warmed:
+            print(f"🔈 TTS cache prewarmed: {warmed} phrases ({pcm_cache.stats()['entries']} cached)")
+
+    # Runs on the speech worker loop, next to (not instead of) speaking
+    speech_worker.start()
+    asyncio.run_coroutine_threadsafe(_prewarm(), speech_worker.loop)
 
 
 def stop_speaking():
-    stop_speaking_flag.set()
+    """Stop the current utterance and drop the queued ones."""
+    speech_worker.cancel_all()
+    mixer.clear_voice()